@@ -2,14 +2,15 @@ from typing import Annotated, Dict, Any, List
 from datetime import datetime
 from typing_extensions import TypedDict
 import os
-from langchain_ollama import ChatOllama
-from langchain_google_genai import ChatGoogleGenerativeAI
+import threading
 from langchain_core.runnables import Runnable, RunnableConfig
 from langgraph.graph.message import add_messages, AnyMessage
 from langchain_core.messages import AIMessage
 from tools import (
     fetch_user_order_information,
     lookup_store_policy,
+    get_product_details,
+    search_products,
     view_cart,
     add_to_cart,
     update_cart_item,
@@ -19,29 +20,16 @@ from tools import (
 )
 from rag_tools import (
     semantic_product_search,
+    multi_product_search,
     get_product_cultural_context,
     get_similar_products
 )
 import logging
 
-from dotenv import load_dotenv, find_dotenv
+from dotenv import load_dotenv
 from utils import debug_log, clean_deepseek_response
 
-# Enhanced debug dotenv loading
-debug_log("=== DOTENV LOADING ===")
-env_file = find_dotenv()
-debug_log(f"Found .env file at: {env_file}")
-
-# Load with verbose to see errors
-loaded = load_dotenv(verbose=True, override=True)
-debug_log(f"Dotenv loaded successfully: {loaded}")
-
-# Print all related environment variables
-debug_log("=== ENVIRONMENT VARIABLES ===")
-debug_log(f"DB_PATH: {os.getenv('DB_PATH', 'NOT FOUND')}")
-debug_log(f"USE_OLLAMA: {os.getenv('USE_OLLAMA', 'NOT FOUND')}")
-debug_log(f"LLM_TEMPERATURE: {os.getenv('LLM_TEMPERATURE', 'NOT FOUND')}")
-debug_log(f"LLM_MODEL: {os.getenv('LLM_MODEL', 'NOT FOUND')}")
+load_dotenv(override=True)
 
 logger = logging.getLogger(__name__)
 
@@ -99,7 +87,17 @@ class Assistant:
         return {"messages": result}
 
 def getLLm():
-    """Get LLM instance based on environment configuration with enhanced Deepseek support"""
+    """Get LLM instance based on environment configuration with enhanced Deepseek support
+
+    The client library of the selected provider is imported here, on first use,
+    so importing this module stays cheap.
+    """
+    debug_log("=== ENVIRONMENT VARIABLES ===")
+    debug_log(f"DB_PATH: {os.getenv('DB_PATH', 'NOT FOUND')}")
+    debug_log(f"USE_OLLAMA: {os.getenv('USE_OLLAMA', 'NOT FOUND')}")
+    debug_log(f"LLM_TEMPERATURE: {os.getenv('LLM_TEMPERATURE', 'NOT FOUND')}")
+    debug_log(f"LLM_MODEL: {os.getenv('LLM_MODEL', 'NOT FOUND')}")
+    
     # Safe boolean parsing
     use_ollama_str = os.getenv("USE_OLLAMA", "0").strip().lower()
     use_ollama = use_ollama_str in ["1", "true", "yes", "on"]
@@ -129,19 +127,22 @@ def getLLm():
         
         debug_log("Ollama configuration", ollama_config)
         
+        from langchain_ollama import ChatOllama
         return ChatOllama(**ollama_config)
     else:
         debug_log("Configuring Google Generative AI")
+        from langchain_google_genai import ChatGoogleGenerativeAI
         return ChatGoogleGenerativeAI(model=llm_model, temperature=temperature)
 
-# Define tool groups with enhanced logging
-debug_log("=== TOOL CONFIGURATION ===")
-
+# Define tool groups
 safe_tools = [
     fetch_user_order_information,
     lookup_store_policy,
     view_cart,
+    get_product_details,
+    search_products,
     semantic_product_search,
+    multi_product_search,
     get_product_cultural_context,
     get_similar_products
 ]
@@ -154,8 +155,32 @@ sensitive_tools = [
     clear_cart
 ]
 
-debug_log(f"Safe tools: {len(safe_tools)}")
-debug_log(f"Sensitive tools: {len(sensitive_tools)}")
+_shared_llm = None
+_tool_llm = None
+_llm_lock = threading.Lock()
+
+def get_shared_llm():
+    """Process-wide LLM client shared by every chatbot session.
+
+    Creating a client per session opened new connections (and TLS handshakes)
+    for each conversation; one client keeps its connection pool alive.
+    """
+    global _shared_llm
+    if _shared_llm is None:
+        with _llm_lock:
+            if _shared_llm is None:
+                _shared_llm = getLLm()
+    return _shared_llm
+
+def get_tool_llm():
+    """Shared LLM with every store tool bound, so tool schemas are converted once."""
+    global _tool_llm
+    if _tool_llm is None:
+        llm = get_shared_llm()
+        with _llm_lock:
+            if _tool_llm is None:
+                _tool_llm = llm.bind_tools(safe_tools + sensitive_tools)
+    return _tool_llm
 
 # Remove the module-level LLM instantiation and assistant_runnable
 # These should be created by the EnhancedChatBot class to ensure consistency
\ No newline at end of file
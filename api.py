@@ -1,22 +1,65 @@
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+import time
 import uvicorn
 import uuid
 import os
 from dotenv import load_dotenv
 
-# Import our enhanced chatbot
-from react_chatbot import ReACTChatBot
-from enhanced_chatbot import EnhancedChatBot
-
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="Handicraft Store Assistant API")
+logger = logging.getLogger(__name__)
+
+# Search run once at startup so index pages and the embedding client are warm
+WARMUP_QUERY = os.getenv("WARMUP_QUERY", "nón lá làm quà tặng")
+
+# Warmup progress reported by /ready
+readiness: Dict[str, Any] = {"ready": False, "error": None, "load_seconds": None, "index_load_seconds": None}
+
+def warmup():
+    """Load everything the first chat request would otherwise pay for.
+
+    Applies pending schema migrations, attaches the search index, constructs
+    the LLM client and compiles the chatbot graph, then runs one search
+    through the whole retrieval path.
+    """
+    start = time.perf_counter()
+    try:
+        from db_setup import migrate_database
+        from rag_search import get_product_rag
+        
+        migrate_database()
+        rag = get_product_rag()
+        rag.initialize()
+        readiness["index_load_seconds"] = round(time.perf_counter() - start, 3)
+        
+        create_chatbot("WARMUP")
+        rag.search(WARMUP_QUERY, top_k=1)
+        
+        readiness["ready"] = True
+        logger.info(f"Warmup finished in {time.perf_counter() - start:.2f}s")
+    except Exception as e:
+        readiness["error"] = str(e)
+        logger.error(f"Warmup failed: {str(e)}")
+    finally:
+        readiness["load_seconds"] = round(time.perf_counter() - start, 3)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so /health answers while /ready still reports not ready
+    app.state.warmup_task = asyncio.create_task(asyncio.to_thread(warmup))
+    yield
+    app.state.warmup_task.cancel()
+
+app = FastAPI(title="Handicraft Store Assistant API", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -36,6 +79,15 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # Store active sessions
 active_sessions = {}
 
+def create_chatbot(customer_id: str, session_id: Optional[str] = None):
+    """Create a chatbot session.
+
+    The chatbot module pulls in LangGraph, the LLM clients and the search
+    stack, so it is imported on first use rather than when the app starts.
+    """
+    from react_chatbot import ReACTChatBot
+    return ReACTChatBot(customer_id=customer_id, thread_id=session_id)
+
 class ChatRequest(BaseModel):
     message: str
     session_id: Optional[str] = None
@@ -52,6 +104,10 @@ class ChatResponse(BaseModel):
     selections: Optional[List[SelectionOption]] = None
     waiting_for_approval: bool = False
     tool_call: Optional[Dict[str, Any]] = None
+    # Every sensitive call awaiting approval; tool_call is the first of them
+    tool_calls: Optional[List[Dict[str, Any]]] = None
+    # LLM follow-up options are being generated; fetch them from /selections/{session_id}
+    selections_pending: bool = False
 
 @app.get("/")
 async def root():
@@ -60,16 +116,21 @@ async def root():
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     try:
+        # Requests that arrive during warmup wait for it instead of loading everything again
+        warmup_task = getattr(app.state, "warmup_task", None)
+        if warmup_task is not None and not warmup_task.done():
+            await asyncio.shield(warmup_task)
+        
         # Create or retrieve session
         session_id = request.session_id or str(uuid.uuid4())
         
         if session_id not in active_sessions:
-            active_sessions[session_id] = ReACTChatBot(customer_id=request.customer_id)
+            active_sessions[session_id] = create_chatbot(request.customer_id, session_id)
         
         chatbot = active_sessions[session_id]
         
-        # Process the message
-        result = chatbot.invoke(request.message)
+        # Process the message; the graph is awaited so other requests keep being served
+        result = await chatbot.ainvoke(request.message)
         
         # Ensure we have valid selections
         if not result.get("selections"):
@@ -81,13 +142,38 @@ async def chat(request: ChatRequest):
             status=result.get("status", "completed"),
             selections=result.get("selections"),
             waiting_for_approval=result.get("waiting_for_approval", False),
-            tool_call=result.get("tool_call")
+            tool_call=result.get("tool_call"),
+            tool_calls=result.get("tool_calls"),
+            selections_pending=result.get("selections_pending", False)
         )
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
 
+class SelectionsResponse(BaseModel):
+    session_id: str
+    selections: List[SelectionOption]
+    # False when the LLM options were not ready in time and these are the defaults
+    generated: bool
+
+# How long /selections waits for options still being generated
+SELECTIONS_WAIT_SECONDS = float(os.getenv("SELECTIONS_WAIT_SECONDS", "15"))
+
+@app.get("/selections/{session_id}", response_model=SelectionsResponse)
+async def get_selections(session_id: str):
+    """Follow-up options generated after the latest answer was returned."""
+    if session_id not in active_sessions:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    chatbot = active_sessions[session_id]
+    selections = await asyncio.to_thread(chatbot.get_selections, SELECTIONS_WAIT_SECONDS)
+    return SelectionsResponse(
+        session_id=session_id,
+        selections=selections or chatbot._default_selections(),
+        generated=bool(selections)
+    )
+
 class ApprovalRequest(BaseModel):
     session_id: str
     approved: bool
@@ -102,7 +188,7 @@ async def approve_action(request: ApprovalRequest):
         chatbot = active_sessions[request.session_id]
         
         # Continue with approval or rejection
-        result = chatbot.handle_approval(approved=request.approved, message=request.message)
+        result = await chatbot.ahandle_approval(approved=request.approved, message=request.message)
         
         # Ensure we have valid selections
         if not result.get("selections"):
@@ -114,7 +200,8 @@ async def approve_action(request: ApprovalRequest):
             status=result.get("status", "completed"),
             selections=result.get("selections"),
             waiting_for_approval=False,
-            tool_call=None
+            tool_call=None,
+            selections_pending=result.get("selections_pending", False)
         )
     except Exception as e:
         import traceback
@@ -125,6 +212,19 @@ async def approve_action(request: ApprovalRequest):
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness for the load balancer: 503 until the warmup has finished successfully."""
+    status = {**readiness, "index_generation": None, "product_count": None}
+    if readiness["ready"]:
+        from rag_search import get_product_rag
+        
+        rag = get_product_rag()
+        status["index_generation"] = rag.generation
+        status["product_count"] = len(rag.store)
+        return status
+    return JSONResponse(status_code=503, content=status)
+
 @app.get("/sessions")
 async def list_sessions():
     return {"active_sessions": list(active_sessions.keys())}
@@ -132,7 +232,7 @@ async def list_sessions():
 @app.delete("/sessions/{session_id}")
 async def delete_session(session_id: str):
     if session_id in active_sessions:
-        del active_sessions[session_id]
+        active_sessions.pop(session_id).close()
         return {"status": "success", "message": f"Session {session_id} deleted"}
     raise HTTPException(status_code=404, detail="Session not found")
 
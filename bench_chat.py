@@ -0,0 +1,131 @@
+"""Latency benchmark of the ReACT modes on scripted conversations.
+
+Runs every conversation in data/bench_conversations.json through a freshly
+compiled graph per ReACT mode (two_call, single_call, auto) and reports LLM
+calls per turn and p50/p95/mean turn latency, one JSON line per mode.
+
+By default the LLM is simulated: each call sleeps --llm-latency seconds and
+answers without tool calls, so the numbers isolate the cost of the serial
+LLM round trips each mode makes before answering. --llm real uses the
+configured model (API key required), including its tool calls.
+
+Usage:
+    python bench_chat.py
+    python bench_chat.py --modes two_call auto --llm-latency 1.5
+    python bench_chat.py --llm real --output chat.json
+"""
+import os
+import io
+import json
+import time
+import argparse
+import contextlib
+from typing import Any, Dict, List
+
+import numpy as np
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable
+
+class SimulatedChatModel(Runnable):
+    """Chat model stand-in with a fixed latency per call and canned replies."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def invoke(self, input, config=None, **kwargs):
+        time.sleep(self.latency)
+        system = input.to_messages()[0].content if hasattr(input, "to_messages") else ""
+        if "<thinking>" in system:
+            return AIMessage(content="<thinking>Khách cần thông tin sản phẩm.</thinking>Dạ, shop gửi bạn thông tin ạ.")
+        return AIMessage(content="Dạ, shop gửi bạn thông tin ạ.")
+
+class CountingChatModel(Runnable):
+    """Counts calls made through a chat model runnable."""
+
+    def __init__(self, model):
+        self.model = model
+        self.calls = 0
+
+    def invoke(self, input, config=None, **kwargs):
+        self.calls += 1
+        return self.model.invoke(input, config, **kwargs)
+
+def load_conversations(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def run(conversations: List[Dict[str, Any]], modes: List[str], llm: str = "simulated",
+        llm_latency: float = 1.0) -> List[Dict[str, Any]]:
+    if llm == "simulated":
+        os.environ.setdefault("GOOGLE_API_KEY", "offline")
+    # Fixed intents would bypass the LLM and hide the difference between modes
+    os.environ["USE_FAST_PATH"] = "false"
+
+    # Imported late so the settings above are picked up
+    from agent import get_shared_llm, get_tool_llm
+    from react_chatbot import ReACTChatBot
+
+    if llm == "simulated":
+        base_llm = base_tool_llm = SimulatedChatModel(llm_latency)
+    else:
+        base_llm, base_tool_llm = get_shared_llm(), get_tool_llm()
+
+    report = []
+    for mode in modes:
+        counter = CountingChatModel(base_llm)
+        tool_counter = CountingChatModel(base_tool_llm)
+        graph = ReACTChatBot._build_graph(mode, llm=counter, tool_llm=tool_counter)
+
+        timings = []
+        analyzed = 0
+        for conversation in conversations:
+            bot = ReACTChatBot(customer_id="CUST001")
+            bot.graph = graph
+            for turn in conversation["turns"]:
+                before = counter.calls
+                start = time.perf_counter()
+                # The chatbot logs every step to stdout; keep the report readable
+                with contextlib.redirect_stdout(io.StringIO()):
+                    bot.invoke(turn)
+                timings.append(time.perf_counter() - start)
+                analyzed += counter.calls > before
+            bot.close()
+
+        turns = len(timings)
+        llm_calls = counter.calls + tool_counter.calls
+        result = {
+            "mode": mode,
+            "llm": llm,
+            "llm_latency_s": llm_latency if llm == "simulated" else None,
+            "conversations": len(conversations),
+            "turns": turns,
+            "analyzed_turns": analyzed,
+            "llm_calls": llm_calls,
+            "llm_calls_per_turn": round(llm_calls / turns, 3),
+            "p50_s": round(float(np.percentile(timings, 50)), 3),
+            "p95_s": round(float(np.percentile(timings, 95)), 3),
+            "mean_s": round(float(np.mean(timings)), 3),
+        }
+        print(json.dumps(result, ensure_ascii=False))
+        report.append(result)
+
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ReACT mode latency on scripted conversations")
+    parser.add_argument("--conversations", default="data/bench_conversations.json", help="Scripted conversations")
+    parser.add_argument("--modes", nargs="+", default=["two_call", "single_call", "auto"],
+                        choices=["two_call", "single_call", "auto"])
+    parser.add_argument("--llm", choices=["simulated", "real"], default="simulated")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Seconds per simulated LLM call")
+    parser.add_argument("--output", help="Optional path to write the full JSON report")
+    args = parser.parse_args()
+
+    report = run(load_conversations(args.conversations), args.modes, args.llm, args.llm_latency)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Benchmark FAISS index types for the product vector store.
+
+Builds every index type from vector_index.py over synthetic clustered vectors
+and reports recall@k against the exact flat index plus p50/p99 single-query
+latency, so the catalog can pick an operating point. For compressed indexes it
+also reports index memory per 100k products, the recall lost to compression,
+and the recall after exact re-ranking of an over-fetched candidate list.
+
+Usage:
+    python bench_index.py --sizes 10000 100000 1000000 --k 10
+    python bench_index.py --sizes 100000 --index-types flat fp16 sq8 pq --pca-dim 256
+"""
+import argparse
+import json
+import time
+from typing import Dict, Any, List
+
+import numpy as np
+
+from vector_index import INDEX_TYPES, build_index, normalize, set_search_params, index_size_bytes
+
+def make_vectors(n: int, dim: int, n_clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Generate normalized vectors around random centroids, like topic-clustered embeddings."""
+    centroids = rng.standard_normal((n_clusters, dim), dtype="float32")
+    assignments = rng.integers(0, n_clusters, size=n)
+    vectors = centroids[assignments] + 0.5 * rng.standard_normal((n, dim), dtype="float32")
+    return normalize(vectors)
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    """Fraction of the true top-k neighbors that the index returned."""
+    k = truth.shape[1]
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+def rerank(vectors: np.ndarray, queries: np.ndarray, candidates: np.ndarray, k: int) -> np.ndarray:
+    """Re-order candidates by exact inner product, as ProductRAG does with its mmap'd vectors."""
+    found = np.full((len(queries), k), -1, dtype="int64")
+    for i, (query, row) in enumerate(zip(queries, candidates)):
+        row = row[row >= 0]
+        order = np.argsort(-(vectors[row] @ query))[:k]
+        found[i, :len(order)] = row[order]
+    return found
+
+def measure_latency(index, queries: np.ndarray, k: int) -> Dict[str, float]:
+    """Time one query at a time, which is how the chatbot issues searches."""
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query[None, :], k)
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p99_ms": float(np.percentile(timings, 99)),
+    }
+
+def run(sizes: List[int], dim: int, n_queries: int, k: int, index_types: List[str], seed: int,
+        pca_dim: int = 0, rerank_factor: int = 4) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    report = []
+
+    for n in sizes:
+        vectors = make_vectors(n, dim, n_clusters=max(8, n // 1000), rng=rng)
+        queries = vectors[rng.choice(n, size=n_queries, replace=False)] + 0.05 * rng.standard_normal((n_queries, dim), dtype="float32")
+        queries = normalize(queries)
+
+        # Ground truth from the exact index
+        exact = build_index(vectors, "flat", pca_dim=0)
+        _, truth = exact.search(queries, k)
+
+        for index_type in index_types:
+            start = time.perf_counter()
+            reuse_exact = index_type == "flat" and not pca_dim
+            index = exact if reuse_exact else build_index(vectors, index_type, pca_dim=pca_dim)
+            build_seconds = 0.0 if reuse_exact else time.perf_counter() - start
+            set_search_params(index)
+
+            _, found = index.search(queries, k)
+            recall = recall_at_k(found, truth)
+            _, candidates = index.search(queries, k * rerank_factor)
+            reranked_recall = recall_at_k(rerank(vectors, queries, candidates, k), truth)
+
+            size = index_size_bytes(index)
+            result = {
+                "n_vectors": n,
+                "dim": dim,
+                "index_type": index_type,
+                "pca_dim": pca_dim or dim,
+                "build_s": round(build_seconds, 3),
+                "bytes_per_vector": round(size / n, 1),
+                "mb_per_100k": round(size / n * 100_000 / 2**20, 2),
+                f"recall@{k}": round(recall, 4),
+                "recall_loss": round(1.0 - recall, 4),
+                f"recall@{k}_reranked": round(reranked_recall, 4),
+                **measure_latency(index, queries, k),
+            }
+            print(json.dumps(result))
+            report.append(result)
+
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index types for product search")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=768, help="Embedding dimension (embedding-001 is 768)")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index-types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pca-dim", type=int, default=0, help="Reduce vectors with PCA before indexing")
+    parser.add_argument("--rerank-factor", type=int, default=4, help="Candidates per result for exact re-ranking")
+    parser.add_argument("--output", help="Optional path to write the full JSON report")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.dim, args.queries, args.k, args.index_types, args.seed,
+                 args.pca_dim, args.rerank_factor)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Retrieval quality and latency benchmark for ProductRAG.
+
+Builds the search indices from the seeded catalog in a scratch directory,
+runs the labelled Vietnamese query set (data/retrieval_queries.json) through
+every search type and reports recall@k, MRR, nDCG@k, p50/p95/p99 search
+latency and embedding API calls, one JSON line per configuration.
+
+The default hashing embedder is deterministic and needs no network, so runs
+are reproducible and comparable; --embedder google uses the real embedding
+model instead (GOOGLE_API_KEY required). With the hashing embedder, latency
+covers only the local index work.
+
+Usage:
+    python bench_retrieval.py
+    python bench_retrieval.py --semantic-weights 0.3 0.5 0.7 0.9 --candidate-factor 3
+    python bench_retrieval.py --index-type hnsw --tfidf-max-ngram 1 --output retrieval.json
+    python bench_retrieval.py --unaccented   # queries typed without diacritics
+"""
+import os
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+import numpy as np
+
+from search_cache import normalize_query
+from fuzzy_index import fold_diacritics
+
+class HashingEmbeddings:
+    """Deterministic offline embedder over hashed words, word bigrams and character trigrams."""
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        words = normalize_query(text).split()
+        features = words + [" ".join(pair) for pair in zip(words, words[1:])]
+        features += [word[i:i + 3] for word in words for i in range(max(1, len(word) - 2))]
+
+        vector = np.zeros(self.dim, dtype="float32")
+        for feature in features:
+            digest = hashlib.md5(feature.encode("utf-8")).digest()
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[int.from_bytes(digest[:4], "little") % self.dim] += sign
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str], **kwargs) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str, **kwargs) -> List[float]:
+        return self._embed(text)
+
+    async def aembed_documents(self, texts: List[str], **kwargs) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str, **kwargs) -> List[float]:
+        return self.embed_query(text)
+
+class CountingEmbeddings:
+    """Forward to another embedder, counting embedding API calls."""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _count(self):
+        with self._lock:
+            self.calls += 1
+
+    def embed_documents(self, texts: List[str], **kwargs) -> List[List[float]]:
+        self._count()
+        return self.embeddings.embed_documents(texts, **kwargs)
+
+    def embed_query(self, text: str, **kwargs) -> List[float]:
+        self._count()
+        return self.embeddings.embed_query(text, **kwargs)
+
+    async def aembed_documents(self, texts: List[str], **kwargs) -> List[List[float]]:
+        self._count()
+        return await self.embeddings.aembed_documents(texts, **kwargs)
+
+    async def aembed_query(self, text: str, **kwargs) -> List[float]:
+        self._count()
+        return await self.embeddings.aembed_query(text, **kwargs)
+
+def recall_at_k(ranked: Sequence[int], relevant: Set[int], k: int) -> float:
+    """Fraction of the relevant products found in the first k results."""
+    return len(set(ranked[:k]) & relevant) / len(relevant)
+
+def reciprocal_rank(ranked: Sequence[int], relevant: Set[int]) -> float:
+    """1 / rank of the first relevant result, 0 if none was returned."""
+    for rank, product_id in enumerate(ranked, start=1):
+        if product_id in relevant:
+            return 1.0 / rank
+    return 0.0
+
+def ndcg_at_k(ranked: Sequence[int], relevant: Set[int], k: int) -> float:
+    """Normalized discounted cumulative gain with binary relevance."""
+    dcg = sum(1.0 / np.log2(rank + 2) for rank, product_id in enumerate(ranked[:k]) if product_id in relevant)
+    ideal = sum(1.0 / np.log2(rank + 2) for rank in range(min(k, len(relevant))))
+    return dcg / ideal
+
+def load_queries(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def run(queries: List[Dict[str, Any]], ks: List[int], search_types: List[str], semantic_weights: List[float],
+        embedder: str = "hashing", index_type: str = "flat", candidate_factor: int = 2,
+        tfidf_max_ngram: int = 2, repeats: int = 3, workdir: Optional[str] = None,
+        unaccented: bool = False) -> List[Dict[str, Any]]:
+    workdir = workdir or tempfile.mkdtemp(prefix="bench_retrieval_")
+    # Build into a scratch directory so the published production indices are never touched
+    os.environ.update({
+        "INDEX_SNAPSHOT_DIR": os.path.join(workdir, "index"),
+        "EMBED_CHECKPOINT_DIR": os.path.join(workdir, "embed_checkpoints"),
+        "VECTOR_INDEX_TYPE": index_type,
+        "HYBRID_CANDIDATE_FACTOR": str(candidate_factor),
+        "TFIDF_MAX_NGRAM": str(tfidf_max_ngram),
+        "SEARCH_CACHE_SIZE": "0",
+    })
+    if embedder == "hashing":
+        os.environ.setdefault("GOOGLE_API_KEY", "offline")
+
+    # Imported late so the settings above are picked up
+    from rag_search import ProductRAG
+
+    rag = ProductRAG()
+    counter = CountingEmbeddings(HashingEmbeddings() if embedder == "hashing" else rag.embeddings)
+    rag.embeddings = counter
+
+    start = time.perf_counter()
+    rag.initialize(force_reload=True)
+    build_seconds = time.perf_counter() - start
+    build_calls = counter.calls
+
+    max_k = max(ks)
+    configs = [(search_type, weight) for search_type in search_types
+               for weight in (semantic_weights if search_type == "hybrid" else [None])]
+    report = []
+
+    for search_type, weight in configs:
+        counter.calls = 0
+        timings = []
+        recalls = {k: [] for k in ks}
+        ndcgs = {k: [] for k in ks}
+        reciprocal_ranks = []
+
+        for item in queries:
+            relevant = set(item["relevant"])
+            query = fold_diacritics(item["query"]) if unaccented else item["query"]
+            for _ in range(repeats):
+                query_start = time.perf_counter()
+                results = rag.search(query, top_k=max_k, search_type=search_type,
+                                     semantic_weight=0.7 if weight is None else weight)
+                timings.append((time.perf_counter() - query_start) * 1000)
+
+            ranked = [product["product_id"] for product in results]
+            reciprocal_ranks.append(reciprocal_rank(ranked, relevant))
+            for k in ks:
+                recalls[k].append(recall_at_k(ranked, relevant, k))
+                ndcgs[k].append(ndcg_at_k(ranked, relevant, k))
+
+        n_searches = len(queries) * repeats
+        result = {
+            "search_type": search_type,
+            "semantic_weight": weight,
+            "embedder": embedder,
+            "index_type": index_type,
+            "candidate_factor": candidate_factor,
+            "tfidf_max_ngram": tfidf_max_ngram,
+            "unaccented": unaccented,
+            "queries": len(queries),
+            **{f"recall@{k}": round(float(np.mean(recalls[k])), 4) for k in ks},
+            "mrr": round(float(np.mean(reciprocal_ranks)), 4),
+            **{f"ndcg@{k}": round(float(np.mean(ndcgs[k])), 4) for k in ks},
+            "p50_ms": round(float(np.percentile(timings, 50)), 3),
+            "p95_ms": round(float(np.percentile(timings, 95)), 3),
+            "p99_ms": round(float(np.percentile(timings, 99)), 3),
+            "embedding_calls": counter.calls,
+            "embedding_calls_per_search": round(counter.calls / n_searches, 3),
+            "build_s": round(build_seconds, 3),
+            "build_embedding_calls": build_calls,
+        }
+        print(json.dumps(result, ensure_ascii=False))
+        report.append(result)
+
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ProductRAG retrieval quality and latency")
+    parser.add_argument("--queries", default="data/retrieval_queries.json", help="Labelled query set")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--search-types", nargs="+", default=["semantic", "keyword", "hybrid"],
+                        choices=["semantic", "keyword", "hybrid"])
+    parser.add_argument("--semantic-weights", type=float, nargs="+", default=[0.7],
+                        help="Hybrid semantic weights to compare")
+    parser.add_argument("--embedder", choices=["hashing", "google"], default="hashing")
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--candidate-factor", type=int, default=2, help="Hybrid over-fetch per retriever")
+    parser.add_argument("--tfidf-max-ngram", type=int, default=2)
+    parser.add_argument("--unaccented", action="store_true", help="Strip diacritics from the queries")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per query")
+    parser.add_argument("--output", help="Optional path to write the full JSON report")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_retrieval_") as workdir:
+        report = run(load_queries(args.queries), args.k, args.search_types, args.semantic_weights, args.embedder,
+                     args.index_type, args.candidate_factor, args.tfidf_max_ngram, args.repeats, workdir,
+                     args.unaccented)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Parallel, resumable, rate-limited embedding of the product catalog."""
+import os
+import glob
+import time
+import random
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "4"))
+EMBED_REQUESTS_PER_MINUTE = float(os.getenv("EMBED_REQUESTS_PER_MINUTE", "600"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+EMBED_CHECKPOINT_DIR = os.getenv("EMBED_CHECKPOINT_DIR", "data/embed_checkpoints")
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` tokens per second, bursts up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until the requested tokens are available, then take them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+class EmbeddingPipeline:
+    """Embed texts in batches over a bounded worker pool.
+
+    Every finished batch is written to the checkpoint directory under a name
+    derived from its position and content, so an interrupted build resumes
+    where it stopped and never reuses vectors for texts that changed.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        batch_size: int = EMBED_BATCH_SIZE,
+        max_workers: int = EMBED_WORKERS,
+        requests_per_minute: float = EMBED_REQUESTS_PER_MINUTE,
+        max_retries: int = EMBED_MAX_RETRIES,
+        checkpoint_dir: str = EMBED_CHECKPOINT_DIR,
+    ):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.checkpoint_dir = checkpoint_dir
+        self.rate_limiter = TokenBucket(requests_per_minute / 60.0, capacity=max_workers)
+
+    def _checkpoint_path(self, batch_no: int, texts: List[str]) -> str:
+        digest = hashlib.sha1("\x1e".join(texts).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.checkpoint_dir, f"batch_{batch_no:06d}_{digest}.npy")
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Embed one batch, retrying with exponential backoff and jitter."""
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                return np.array(self.embeddings.embed_documents(texts), dtype="float32")
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = min(60.0, 2 ** attempt) * (0.5 + random.random())
+                logger.warning(f"Embedding batch failed ({str(e)}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _run_batch(self, path: str, texts: List[str]) -> np.ndarray:
+        vectors = self._embed_batch(texts)
+        # Write then rename so a crash never leaves a truncated checkpoint behind
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, vectors)
+        os.replace(tmp_path, path)
+        return vectors
+
+    def run(self, texts: List[str]) -> np.ndarray:
+        """Embed all texts, reusing checkpointed batches. Returns a (len(texts), dim) matrix."""
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        results: List[Optional[np.ndarray]] = [None] * len(batches)
+
+        pending = []
+        for batch_no, batch in enumerate(batches):
+            path = self._checkpoint_path(batch_no, batch)
+            if os.path.exists(path):
+                results[batch_no] = np.load(path)
+            else:
+                pending.append((batch_no, path, batch))
+
+        if len(pending) < len(batches):
+            logger.info(f"Resuming embedding build: {len(batches) - len(pending)}/{len(batches)} batches checkpointed")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="embed") as executor:
+            futures = {executor.submit(self._run_batch, path, batch): batch_no for batch_no, path, batch in pending}
+            for done, future in enumerate(as_completed(futures), start=1):
+                results[futures[future]] = future.result()
+                if done % 10 == 0 or done == len(futures):
+                    logger.info(f"Embedded {done}/{len(futures)} batches")
+
+        return np.vstack(results) if results else np.zeros((0, 0), dtype="float32")
+
+    def clear(self):
+        """Remove checkpoints once the built index has been persisted."""
+        for path in glob.glob(os.path.join(self.checkpoint_dir, "batch_*.npy*")):
+            os.remove(path)
@@ -100,6 +100,17 @@ MATERIALS = [
     "Đá"
 ]
 
+# Price ranges used for faceted counts: (label, min price inclusive, max price exclusive)
+PRICE_BUCKETS = [
+    ("Dưới 100,000đ", 0, 100000),
+    ("100,000đ - 300,000đ", 100000, 300000),
+    ("300,000đ - 1,000,000đ", 300000, 1000000),
+    ("Trên 1,000,000đ", 1000000, None)
+]
+
+# Reply of the cart tools when the customer has nothing in the cart
+EMPTY_CART_MESSAGE = "Giỏ hàng hiện tại trống."
+
 # Order statuses
 ORDER_STATUSES = [
     "Đang xử lý",
@@ -1,19 +1,106 @@
 
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import sqlite3
 import os
 import logging
+import threading
+import time
+from constants import EMPTY_CART_MESSAGE, PRICE_BUCKETS
+from fuzzy_index import TrigramIndex, FUZZY_MAX_CANDIDATES, FUZZY_MIN_SCORE
 
 logger = logging.getLogger(__name__)
+
+# Seconds between checks whether product names, tags or categories changed
+FUZZY_INDEX_CHECK_INTERVAL = float(os.getenv("FUZZY_INDEX_CHECK_INTERVAL", "30"))
+
 class Database:
     """Handle all SQL operations for the handicraft store."""
     
     def __init__(self):
         self.db_path = os.getenv('DB_PATH')
+        self._fuzzy_index = None
+        self._fuzzy_signature = None
+        self._fuzzy_checked = 0.0
+        self._fuzzy_lock = threading.Lock()
     
     def _get_connection(self) -> sqlite3.Connection:
         return sqlite3.connect(self.db_path)
     
+    def _get_fuzzy_index(self, cursor: sqlite3.Cursor) -> TrigramIndex:
+        """Accent-insensitive trigram index over product names, tags and categories.
+        
+        Built on first use and rebuilt when a cheap aggregate over the indexed
+        columns changes, checked at most every FUZZY_INDEX_CHECK_INTERVAL seconds.
+        """
+        now = time.monotonic()
+        if self._fuzzy_index is not None and now - self._fuzzy_checked < FUZZY_INDEX_CHECK_INTERVAL:
+            return self._fuzzy_index
+        
+        with self._fuzzy_lock:
+            cursor.execute(
+                "SELECT COUNT(*), MAX(product_id), "
+                "TOTAL(LENGTH(name) + LENGTH(category) + LENGTH(COALESCE(tags, ''))) FROM products"
+            )
+            signature = cursor.fetchone()
+            if self._fuzzy_index is None or signature != self._fuzzy_signature:
+                cursor.execute("SELECT product_id, name, category, tags FROM products")
+                self._fuzzy_index = TrigramIndex(
+                    (row[0], {"name": row[1], "category": row[2], "tags": row[3]}) for row in cursor.fetchall()
+                )
+                self._fuzzy_signature = signature
+            self._fuzzy_checked = now
+        return self._fuzzy_index
+    
+    @staticmethod
+    def _product_filter_sql(
+        category: Optional[str] = None,
+        material: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_stock: Optional[int] = None
+    ) -> Tuple[str, List[Any]]:
+        """WHERE clause and parameters shared by product searches and facet counts."""
+        where_sql = " WHERE 1 = 1"
+        params = []
+        
+        if category:
+            where_sql += " AND category = ? COLLATE NOCASE"
+            params.append(category)
+        if material:
+            where_sql += " AND material = ? COLLATE NOCASE"
+            params.append(material)
+        if min_price:
+            where_sql += " AND price >= ?"
+            params.append(min_price)
+        if max_price:
+            where_sql += " AND price <= ?"
+            params.append(max_price)
+        if min_stock:
+            where_sql += " AND stock_quantity >= ?"
+            params.append(min_stock)
+        return where_sql, params
+    
+    def _product_where(self, cursor: sqlite3.Cursor, query: Optional[str] = None, **filters) -> Tuple[str, List[Any], Dict[int, float]]:
+        """WHERE clause, parameters and fuzzy scores for a free-text query plus filters.
+        
+        Free text goes through the accent-insensitive index first ("non la" finds
+        "Nón Lá ...") and restricts the rows to its candidates; without fuzzy
+        matches it falls back to LIKE on name and description. Scores are empty
+        in the fallback and when there is no query.
+        """
+        where_sql, params = self._product_filter_sql(**filters)
+        scores = {}
+        if query:
+            matches = self._get_fuzzy_index(cursor).search(query, FUZZY_MAX_CANDIDATES)
+            scores = {product_id: score for product_id, score in matches if score >= FUZZY_MIN_SCORE}
+            if scores:
+                where_sql += f" AND product_id IN ({','.join('?' * len(scores))})"
+                params.extend(scores)
+            else:
+                where_sql += " AND (name LIKE ? OR description LIKE ?)"
+                params.extend([f"%{query}%"] * 2)
+        return where_sql, params, scores
+    
     def search_products(
         self,
         query: Optional[str] = None,
@@ -28,32 +115,28 @@ class Database:
         conn = self._get_connection()
         cursor = conn.cursor()
         try:
-            query_sql = "SELECT product_id, name, category, material, price, stock_quantity, description FROM products WHERE 1 = 1"
-            params = []
+            where_sql, params, scores = self._product_where(
+                cursor, query, category=category, material=material,
+                min_price=min_price, max_price=max_price, min_stock=min_stock
+            )
+            
+            query_sql = (
+                "SELECT product_id, name, category, material, price, stock_quantity, description, origin_location "
+                "FROM products" + where_sql
+            )
             
-            if category:
-                query_sql += " AND LOWER(category) = LOWER(?)"
-                params.append(category)
-            if material:
-                query_sql += " AND LOWER(material) = LOWER(?)"
-                params.append(material)
-            if min_price:
-                query_sql += " AND price >= ?"
-                params.append(min_price)
-            if max_price:
-                query_sql += " AND price <= ?"
-                params.append(max_price)
-            if min_stock:
-                query_sql += " AND stock_quantity >= ?"
-                params.append(min_stock)
             if sort_by_price:
                 query_sql += " ORDER BY price " + ("ASC" if sort_by_price.lower() == "asc" else "DESC")
             
-            query_sql += " LIMIT ?"
-            params.append(limit)
+            # Fuzzy matches are ranked by score below, so the limit is applied after sorting
+            if not scores or sort_by_price:
+                query_sql += " LIMIT ?"
+                params.append(limit)
             
             cursor.execute(query_sql, params)
             rows = cursor.fetchall()
+            if scores and not sort_by_price:
+                rows = sorted(rows, key=lambda row: scores[row[0]], reverse=True)[:limit]
             results = [
                 {
                     "product_id": row[0],
@@ -62,7 +145,8 @@ class Database:
                     "material": row[3],
                     "price": row[4],
                     "stock_quantity": row[5],
-                    "description": row[6]
+                    "description": row[6],
+                    "origin_location": row[7]
                 }
                 for row in rows
             ]
@@ -74,6 +158,56 @@ class Database:
             cursor.close()
             conn.close()
     
+    def get_product_facets(
+        self,
+        query: Optional[str] = None,
+        category: Optional[str] = None,
+        material: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_stock: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Count the products matching the query and filters per category, material and price range.
+        
+        All three facets come from a single GROUP BY query over the same WHERE
+        clause as search_products, fuzzy candidates included, without the LIMIT.
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            where_sql, params, _ = self._product_where(
+                cursor, query, category=category, material=material,
+                min_price=min_price, max_price=max_price, min_stock=min_stock
+            )
+            bucket_sql = "CASE" + "".join(
+                f" WHEN price < {upper} THEN {i}" for i, (_, _, upper) in enumerate(PRICE_BUCKETS) if upper is not None
+            ) + f" ELSE {len(PRICE_BUCKETS) - 1} END"
+            query_sql = f"""
+                SELECT 'category', category, COUNT(*) FROM products{where_sql} GROUP BY category
+                UNION ALL
+                SELECT 'material', material, COUNT(*) FROM products{where_sql} GROUP BY material
+                UNION ALL
+                SELECT 'price', {bucket_sql}, COUNT(*) FROM products{where_sql} GROUP BY 2
+                ORDER BY 1, 3 DESC
+            """
+            cursor.execute(query_sql, params * 3)
+            
+            facets = {"total": 0, "category": {}, "material": {}, "price": {}}
+            for facet, value, count in cursor.fetchall():
+                if facet == "price":
+                    value = PRICE_BUCKETS[value][0]
+                facets[facet][value] = count
+            # Price ranges read best in ascending order rather than by count
+            facets["price"] = {label: facets["price"][label] for label, _, _ in PRICE_BUCKETS if label in facets["price"]}
+            facets["total"] = sum(facets["category"].values())
+            return facets
+        except Exception as e:
+            logger.error(f"Error counting product facets: {str(e)}")
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+    
     def get_orders(self, customer_id: str) -> List[Dict]:
         conn = self._get_connection()
         cursor = conn.cursor()
@@ -166,7 +300,11 @@ class Database:
         conn = self._get_connection()
         cursor = conn.cursor()
         try:
-            cursor.execute("SELECT product_id, name, price, stock_quantity FROM products WHERE product_id = ?", (product_id,))
+            cursor.execute(
+                "SELECT product_id, name, price, stock_quantity, category, material, description, origin_location "
+                "FROM products WHERE product_id = ?",
+                (product_id,)
+            )
             row = cursor.fetchone()
             if not row:
                 return None
@@ -174,7 +312,11 @@ class Database:
                 "product_id": row[0],
                 "name": row[1],
                 "price": row[2],
-                "stock_quantity": row[3]
+                "stock_quantity": row[3],
+                "category": row[4],
+                "material": row[5],
+                "description": row[6],
+                "origin_location": row[7]
             }
         except Exception as e:
             logger.error(f"Error getting product: {str(e)}")
@@ -235,7 +377,7 @@ class Database:
         
         cart = self.get_cart(customer_id)
         if not cart:
-            return "Giỏ hàng hiện tại trống."
+            return EMPTY_CART_MESSAGE
         
         cart_id = cart["cart_id"]
         item_exists = False
@@ -282,7 +424,7 @@ class Database:
     def view_cart(self, customer_id: str) -> str:
         cart = self.get_cart(customer_id)
         if not cart or not cart["items"]:
-            return "Giỏ hàng hiện tại trống."
+            return EMPTY_CART_MESSAGE
         
         total = sum(item["quantity"] * item["price"] for item in cart["items"])
         cart_summary = "\n".join(
@@ -294,7 +436,7 @@ class Database:
     def clear_cart(self, customer_id: str) -> str:
         cart = self.get_cart(customer_id)
         if not cart:
-            return "Giỏ hàng hiện tại trống."
+            return EMPTY_CART_MESSAGE
         
         conn = self._get_connection()
         cursor = conn.cursor()
@@ -1,5 +1,6 @@
 import os
 import sqlite3
+import logging
 import getpass
 from datetime import datetime
 from dotenv import load_dotenv
@@ -8,6 +9,15 @@ from constants import CATEGORIES, MATERIALS, ORDER_STATUSES
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Indexes behind filtered, price-sorted product queries
+PRODUCT_INDEXES_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_products_category_price ON products(category COLLATE NOCASE, price);
+    CREATE INDEX IF NOT EXISTS idx_products_material_price ON products(material COLLATE NOCASE, price);
+    CREATE INDEX IF NOT EXISTS idx_products_price ON products(price);
+"""
+
 def create_schema(conn):
     """Create database schema for products, orders, order_items, carts, and cart_items."""
     cursor = conn.cursor()
@@ -61,8 +71,33 @@ def create_schema(conn):
         FOREIGN KEY (product_id) REFERENCES products(product_id)
     );
     """)
+    cursor.executescript(PRODUCT_INDEXES_SQL)
     conn.commit()
 
+def migrate_database(db_file=None):
+    """Bring an existing database up to the current schema; run once at startup.
+    
+    Databases created before the product indexes existed get them here instead
+    of on the query path. Never fatal: a missing, read-only or locked database
+    is left as it is and the failure is logged.
+    """
+    db_file = db_file or os.getenv("DB_PATH") or os.path.join(os.getcwd(), "data", "handicraft.sqlite")
+    # sqlite3.connect would create an empty database for a wrong path
+    if not os.path.exists(db_file):
+        logger.warning(f"Database file not found, skipping migration: {db_file}")
+        return False
+    try:
+        conn = sqlite3.connect(db_file)
+        try:
+            conn.executescript(PRODUCT_INDEXES_SQL)
+            conn.commit()
+        finally:
+            conn.close()
+        return True
+    except Exception as e:
+        logger.warning(f"Could not create product indexes in {db_file}: {str(e)}")
+        return False
+
 def generate_products():
     """Generate rich, detailed Vietnamese handicraft products with cultural context."""
     products = [
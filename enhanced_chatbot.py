@@ -3,7 +3,6 @@ from typing_extensions import TypedDict
 from datetime import datetime
 import os
 from langgraph.graph import END, StateGraph, START
-from langgraph.prebuilt import tools_condition
 from langgraph.checkpoint.memory import MemorySaver
 from langchain_core.messages import ToolMessage, AIMessage
 from langchain_core.runnables import RunnableConfig
@@ -11,9 +10,57 @@ from langchain_core.prompts import ChatPromptTemplate
 from langgraph.graph.message import add_messages, AnyMessage
 import logging
 
-from agent import getLLm, safe_tools, sensitive_tools
+from agent import get_shared_llm, get_tool_llm, safe_tools, sensitive_tools
 from constants import CATEGORIES, MATERIALS
 from utils import create_tool_node_with_fallback, debug_log, log_state
+from tool_executor import next_tool_node, pending_tool_calls
+from tool_cache import tool_cache
+
+SENSITIVE_TOOL_NAMES = frozenset(t.name for t in sensitive_tools)
+
+# Prompts are parsed once per process and shared by every session
+CATEGORIES_STR = ", ".join([f"'{cat}'" for cat in CATEGORIES])
+MATERIALS_STR = ", ".join([f"'{mat}'" for mat in MATERIALS])
+
+ASSISTANT_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are a friendly customer support assistant for a Vietnamese handicraft store. "
+     "Respond in Vietnamese if the user speaks Vietnamese, otherwise use English. "
+     f"Store categories: {CATEGORIES_STR}. "
+     f"Store materials: {MATERIALS_STR}. "
+     "\n\nGuidelines:"
+     "\n- Check stock before adding to cart"
+     "\n- Suggest alternatives if out of stock"
+     "\n- Keep responses helpful and concise"
+     "\n- When you need to use tools, use them directly without explaining"
+     "\nCustomer info: {user_info}"
+     "\nCurrent time: {time}"
+    ),
+    ("placeholder", "{messages}")
+])
+
+# Follow-up options for the graph's last answer, and for answers after approval
+SELECTION_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "Generate 2-4 helpful follow-up options for the user based on the conversation. "
+     "Format as short phrases (3-5 words). Use Vietnamese unless user speaks English. "
+     "If possible, try to aim for sales, always try to sell the product. "
+     f"Categories: {CATEGORIES_STR}. Materials: {MATERIALS_STR}. "
+     "Return each option on a new line, no numbering or bullets."
+    ),
+    ("human", "Assistant response: {response}")
+])
+
+RESPONSE_SELECTION_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "Generate 2-3 helpful follow-up options for the user based on the conversation. "
+     "Format as short phrases (3-5 words). Use Vietnamese unless user speaks English. "
+     "If possible, try to aim for sales, always try to sell the product. "
+     f"Categories: {CATEGORIES_STR}. Materials: {MATERIALS_STR}. "
+     "Return each option on a new line, no numbering or bullets."
+    ),
+    ("human", "Assistant response: {response}")
+])
 
 logger = logging.getLogger(__name__)
 
@@ -28,7 +75,10 @@ class ThinkingState(TypedDict):
 class EnhancedChatBot:
     def __init__(self, customer_id="CUST001"):
         self.memory = MemorySaver()
-        self.llm = getLLm()
+        # Clients and the tool-bound runnable are shared process-wide, so
+        # connections stay open across sessions and tool schemas are built once
+        self.llm = get_shared_llm()
+        self.tool_llm = get_tool_llm()
         self.config = {
             "configurable": {
                 "customer_id": customer_id,
@@ -36,9 +86,8 @@ class EnhancedChatBot:
             }
         }
         
-        # Build category strings once
-        self.categories_str = ", ".join([f"'{cat}'" for cat in CATEGORIES])
-        self.materials_str = ", ".join([f"'{mat}'" for mat in MATERIALS])
+        self.categories_str = CATEGORIES_STR
+        self.materials_str = MATERIALS_STR
         
         # Get environment variables for features
         self.use_llm_selections = self._parse_bool_env("USE_LLM_SELECTIONS", False)
@@ -84,31 +133,13 @@ class EnhancedChatBot:
             debug_log("=== ASSISTANT NODE ENTRY ===")
             log_state(state, "ASSISTANT_INPUT")
             
-            assistant_prompt = ChatPromptTemplate.from_messages([
-                ("system",
-                 "You are a friendly customer support assistant for a Vietnamese handicraft store. "
-                 "Respond in Vietnamese if the user speaks Vietnamese, otherwise use English. "
-                 f"Store categories: {self.categories_str}. "
-                 f"Store materials: {self.materials_str}. "
-                 "\n\nGuidelines:"
-                 "\n- Check stock before adding to cart"
-                 "\n- Suggest alternatives if out of stock"
-                 "\n- Keep responses helpful and concise"
-                 "\n- When you need to use tools, use them directly without explaining"
-                 "\nCustomer info: {user_info}"
-                 "\nCurrent time: {time}"
-                ),
-                ("placeholder", "{messages}")
-            ]).partial(time=str(datetime.now()))
-            
-            debug_log("Binding tools to LLM")
-            
-            chain = assistant_prompt | self.llm.bind_tools(safe_tools + sensitive_tools)
+            chain = ASSISTANT_PROMPT | self.tool_llm
             debug_log("Invoking LLM chain")
             
             result = chain.invoke({
                 "messages": state["messages"],
-                "user_info": state.get("user_info", [])
+                "user_info": state.get("user_info", []),
+                "time": str(datetime.now())
             })
             
             debug_log("LLM result received", {
@@ -148,18 +179,7 @@ class EnhancedChatBot:
 
             try:
                 debug_log("Generating selections using LLM")
-                selection_prompt = ChatPromptTemplate.from_messages([
-                    ("system",
-                     "Generate 2-4 helpful follow-up options for the user based on the conversation. "
-                     "Format as short phrases (3-5 words). Use Vietnamese unless user speaks English. "
-                     "If possible, try to aim for sales, always try to sell the product. "
-                     f"Categories: {self.categories_str}. Materials: {self.materials_str}. "
-                     "Return each option on a new line, no numbering or bullets."
-                    ),
-                    ("human", "Assistant response: {response}")
-                ])
-                
-                chain = selection_prompt | self.llm
+                chain = SELECTION_PROMPT | self.llm
                 result = chain.invoke({
                     "response": last_assistant_msg
                 })
@@ -185,40 +205,39 @@ class EnhancedChatBot:
 
         # 4. Handle tool routing with enhanced debugging
         def route_tools(state: ThinkingState):
-            """Route to appropriate tool node based on tool sensitivity"""
-            debug_log("=== ROUTING TOOLS ===")
-            
-            next_node = tools_condition(state)
-            if next_node == END:
-                debug_log("No tool call detected, routing to generate_selections")
-                return "generate_selections"
+            """Route to appropriate tool node based on tool sensitivity
             
-            if not state["messages"] or not hasattr(state["messages"][-1], "tool_calls"):
-                debug_log("No tool calls in last message, routing to generate_selections")
-                return "generate_selections"
+            Every pending call is considered, not just the first: safe calls run
+            first and only the sensitive ones wait for approval.
+            """
+            debug_log("=== ROUTING TOOLS ===")
             
-            ai_message = state["messages"][-1]
-            if not ai_message.tool_calls:
-                debug_log("Empty tool_calls list, routing to generate_selections")
+            next_node = next_tool_node(state["messages"], SENSITIVE_TOOL_NAMES)
+            if next_node is None:
+                debug_log("No pending tool calls, routing to generate_selections")
                 return "generate_selections"
             
-            first_tool_call = ai_message.tool_calls[0]
-            sensitive_tool_names = {t.name for t in sensitive_tools}
-            
-            tool_name = first_tool_call.get("name", "unknown")
-            
-            if tool_name in sensitive_tool_names:
-                debug_log(f"Routing sensitive tool: {tool_name} to sensitive_tools node")
+            debug_log(f"Routing pending tool calls to {next_node} node")
+            return next_node
+        
+        def route_after_safe_tools(state: ThinkingState):
+            """Sensitive calls from the same step wait for approval; otherwise answer with the results"""
+            next_node = next_tool_node(state["messages"], SENSITIVE_TOOL_NAMES)
+            if next_node == "sensitive_tools":
+                debug_log("Sensitive tool calls pending after safe tools, awaiting approval")
                 return "sensitive_tools"
-            
-            debug_log(f"Routing safe tool: {tool_name} to safe_tools node")
-            return "safe_tools"
+            return "assistant"
 
         # Add all nodes
         builder.add_node("fetch_user_info", fetch_customer_info)
         builder.add_node("assistant", assistant)
-        builder.add_node("safe_tools", create_tool_node_with_fallback(safe_tools))
-        builder.add_node("sensitive_tools", create_tool_node_with_fallback(sensitive_tools))
+        # Safe tools run concurrently, reuse cached results and also answer calls
+        # to unknown tools; sensitive tools run in the order the LLM asked for
+        # them and drop the customer's cached cart and orders
+        builder.add_node("safe_tools", create_tool_node_with_fallback(
+            safe_tools, handles=lambda name: name not in SENSITIVE_TOOL_NAMES, cache=tool_cache))
+        builder.add_node("sensitive_tools", create_tool_node_with_fallback(
+            sensitive_tools, parallel=False, cache=tool_cache, invalidates_cache=True))
         builder.add_node("generate_selections", generate_selections)
 
         # Define the flow - CRITICAL: Same structure as working first implementation
@@ -232,8 +251,13 @@ class EnhancedChatBot:
             ["safe_tools", "sensitive_tools", "generate_selections"]
         )
         
-        # Safe tools go back to assistant, then generate selections
-        builder.add_edge("safe_tools", "assistant")
+        # Safe tools go back to assistant, unless sensitive calls from the same
+        # step still wait for approval
+        builder.add_conditional_edges(
+            "safe_tools",
+            route_after_safe_tools,
+            ["sensitive_tools", "assistant"]
+        )
         
         # Sensitive tools go back to assistant, then generate selections
         builder.add_edge("sensitive_tools", "assistant")
@@ -297,9 +321,9 @@ class EnhancedChatBot:
         if snapshot.next and "sensitive_tools" in snapshot.next:
             debug_log("Sensitive tool detected, awaiting approval")
             
-            # Extract the tool call for approval
-            ai_message = final_state["messages"][-1]
-            if not ai_message.tool_calls:
+            # Extract the tool calls for approval
+            tool_calls = self._pending_sensitive_calls(final_state["messages"])
+            if not tool_calls:
                 debug_log("No tool calls found in AI message", level="WARN")
                 return {
                     "response": "Không có hành động nhạy cảm.",
@@ -307,20 +331,20 @@ class EnhancedChatBot:
                     "selections": self._default_selections()
                 }
 
-            tool_call = ai_message.tool_calls[0]
-            debug_log("Tool awaiting approval", {
-                "tool_name": tool_call.get("name", "unknown"),
-                "tool_args": tool_call.get("args", {})
-            })
+            debug_log("Tools awaiting approval", [
+                {"tool_name": tool_call.get("name", "unknown"), "tool_args": tool_call.get("args", {})}
+                for tool_call in tool_calls
+            ])
             
-            # Generate approval message based on tool
-            response = self._generate_approval_message(tool_call)
+            # Generate approval message based on tools
+            response = "\n".join(self._generate_approval_message(tool_call) for tool_call in tool_calls)
             
             return {
                 "response": response,
                 "status": "waiting",
                 "waiting_for_approval": True,
-                "tool_call": tool_call,
+                "tool_call": tool_calls[0],
+                "tool_calls": tool_calls,
                 "selections": [
                     {"text": "Đồng ý", "value": "approve"},
                     {"text": "Từ chối", "value": "reject"}
@@ -350,6 +374,10 @@ class EnhancedChatBot:
             "selections": selections
         }
 
+    def _pending_sensitive_calls(self, messages) -> List[Dict[str, Any]]:
+        """Sensitive tool calls of the latest AI message still waiting for approval"""
+        return [call for call in pending_tool_calls(messages) if call["name"] in SENSITIVE_TOOL_NAMES]
+
     def _generate_approval_message(self, tool_call: Dict[str, Any]) -> str:
         """Generate approval message based on tool call"""
         debug_log("Generating approval message for tool")
@@ -397,11 +425,11 @@ class EnhancedChatBot:
                     "selections": self._default_selections()
                 }
 
-            # Get the tool call that needs approval
+            # Get the tool calls that need approval
             current_state = snapshot.values
-            ai_message = current_state["messages"][-1]
+            tool_calls = self._pending_sensitive_calls(current_state["messages"])
             
-            if not ai_message.tool_calls:
+            if not tool_calls:
                 debug_log("No tool calls found in message needing approval", level="ERROR")
                 return {
                     "response": "Không thể tìm thấy hành động cần xác nhận.",
@@ -409,11 +437,10 @@ class EnhancedChatBot:
                     "selections": self._default_selections()
                 }
 
-            tool_call = ai_message.tool_calls[0]
-            debug_log("Found tool call awaiting approval", {
-                "name": tool_call.get("name"),
-                "args": tool_call.get("args")
-            })
+            debug_log("Found tool calls awaiting approval", [
+                {"name": tool_call.get("name"), "args": tool_call.get("args")}
+                for tool_call in tool_calls
+            ])
 
             if approved:
                 debug_log("Tool approved, continuing execution")
@@ -460,16 +487,18 @@ class EnhancedChatBot:
                 
                 debug_log(f"Rejection message: {reject_message}")
                 
-                tool_message = ToolMessage(
-                    tool_call_id=tool_call["id"],
-                    content=reject_message
-                )
+                tool_messages = [
+                    ToolMessage(tool_call_id=tool_call["id"], content=reject_message)
+                    for tool_call in tool_calls
+                ]
                 
-                # Update the graph with the rejection
+                # Update the graph with the rejection, as if the assistant step had answered,
+                # whether or not safe tools from the same step already ran
                 debug_log("Updating graph state with rejection message")
                 self.graph.update_state(
                     self.config,
-                    {"messages": [tool_message]}
+                    {"messages": tool_messages},
+                    as_node="assistant"
                 )
                 
                 # Continue execution after rejection
@@ -514,18 +543,7 @@ class EnhancedChatBot:
             return self._default_selections()
             
         try:
-            selection_prompt = ChatPromptTemplate.from_messages([
-                ("system",
-                 "Generate 2-3 helpful follow-up options for the user based on the conversation. "
-                 "Format as short phrases (3-5 words). Use Vietnamese unless user speaks English. "
-                 "If possible, try to aim for sales, always try to sell the product. "
-                 f"Categories: {self.categories_str}. Materials: {self.materials_str}. "
-                 "Return each option on a new line, no numbering or bullets."
-                ),
-                ("human", "Assistant response: {response}")
-            ])
-            
-            chain = selection_prompt | self.llm
+            chain = RESPONSE_SELECTION_PROMPT | self.llm
             result = chain.invoke({
                 "response": response
             })
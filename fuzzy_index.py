@@ -0,0 +1,149 @@
+"""Accent-insensitive trigram index over product names, tags and categories.
+
+Customers often type Vietnamese without diacritics ("non la", "gio tre") or
+with small typos. Every indexed word is folded to plain ASCII and split into
+character trigrams; a query word is matched against the indexed words that
+share enough trigrams with it and lie within a small edit distance.
+"""
+import heapq
+import os
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Relative weight of a match in each indexed field
+FIELD_WEIGHTS = {"name": 1.0, "tags": 0.8, "category": 0.8}
+
+# Minimum score for a fuzzy match to count as a candidate
+FUZZY_MIN_SCORE = float(os.getenv("FUZZY_MIN_SCORE", "0.5"))
+
+# Most fuzzy candidates a query restricts product searches and facet counts to
+FUZZY_MAX_CANDIDATES = 500
+
+_TOKEN_RE = re.compile(r"[0-9a-z]+")
+
+def fold_diacritics(text: str) -> str:
+    """Lowercase text with Vietnamese diacritics removed ("Nón lá Đông Hồ" -> "non la dong ho")."""
+    decomposed = unicodedata.normalize("NFD", text.lower().replace("đ", "d"))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+def is_unaccented(text: str) -> bool:
+    """True if the text carries no diacritics, i.e. folding it changes nothing."""
+    return fold_diacritics(text) == unicodedata.normalize("NFC", text).lower()
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Folded words of a text, ignoring single characters."""
+    return [token for token in _TOKEN_RE.findall(fold_diacritics(text or "")) if len(token) > 1]
+
+def max_edits(word: str) -> int:
+    """Edits tolerated for a query word: none for very short words, more for long ones."""
+    if len(word) <= 2:
+        return 0
+    return 1 if len(word) <= 5 else 2
+
+def _trigrams(word: str) -> Set[str]:
+    padded = f"$${word}$$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance between two words, or limit + 1 once it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i] + [0] * len(b)
+        for j, cb in enumerate(b, start=1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous[-1], limit + 1)
+
+class TrigramIndex:
+    """Fuzzy word index mapping folded words to the documents containing them.
+
+    Documents are identified by any hashable key; ProductRAG uses store rows,
+    the database uses product IDs.
+    """
+
+    def __init__(self, documents: Iterable[Tuple[int, Dict[str, Optional[str]]]]):
+        self.words: List[str] = []
+        # Word ID -> {document: weight of the best field containing the word}
+        self.postings: List[Dict[int, float]] = []
+        self._word_ids: Dict[str, int] = {}
+        grams: Dict[str, List[int]] = defaultdict(list)
+
+        for document, fields in documents:
+            for field, text in fields.items():
+                weight = FIELD_WEIGHTS[field]
+                for token in tokenize(text):
+                    word_id = self._word_ids.get(token)
+                    if word_id is None:
+                        word_id = self._word_ids[token] = len(self.words)
+                        self.words.append(token)
+                        self.postings.append({})
+                        for gram in _trigrams(token):
+                            grams[gram].append(word_id)
+                    posting = self.postings[word_id]
+                    if weight > posting.get(document, 0.0):
+                        posting[document] = weight
+        self._grams = dict(grams)
+
+    @classmethod
+    def from_store(cls, store) -> "TrigramIndex":
+        """Index every row of a ProductStore, keyed by row."""
+        return cls((row, {field: store.get(field, row) for field in FIELD_WEIGHTS}) for row in range(len(store)))
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def _matches(self, token: str) -> Dict[int, float]:
+        """Indexed words close enough to a query word, with their similarity in (0, 1]."""
+        limit = max_edits(token)
+        exact = self._word_ids.get(token)
+        if limit == 0:
+            return {exact: 1.0} if exact is not None else {}
+
+        grams = _trigrams(token)
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for word_id in self._grams.get(gram, ()):
+                shared[word_id] += 1
+
+        # One edit changes at most three trigrams, so closer words share at least this many
+        needed = max(1, len(grams) - 3 * limit)
+        matches = {}
+        for word_id, count in shared.items():
+            if count < needed:
+                continue
+            word = self.words[word_id]
+            distance = edit_distance(token, word, limit)
+            if distance <= limit:
+                matches[word_id] = 1.0 - distance / max(len(token), len(word))
+        return matches
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[int, float]]:
+        """Best matching documents for a query, scored in [0, 1].
+
+        A document's score is the average over the query words of its best
+        match (word similarity times field weight), so 1.0 means every query
+        word occurs verbatim, after folding, in the product name.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        scores: Dict[int, float] = defaultdict(float)
+        for token in tokens:
+            best: Dict[int, float] = {}
+            for word_id, similarity in self._matches(token).items():
+                for document, weight in self.postings[word_id].items():
+                    score = similarity * weight
+                    if score > best.get(document, 0.0):
+                        best[document] = score
+            for document, score in best.items():
+                scores[document] += score
+
+        ranked = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [(document, score / len(tokens)) for document, score in ranked]
@@ -0,0 +1,121 @@
+"""Versioned, memory-mappable snapshots of the search indices.
+
+Every build is published as an immutable generation directory. Worker
+processes memory-map the arrays inside it read-only, so all of them share
+the same physical pages instead of each holding a private copy.
+
+Layout:
+    <root>/CURRENT        name of the live generation, replaced atomically
+    <root>/gen_000042/    one directory per published generation
+    <root>/.build.lock    held by the single process building a generation
+"""
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no multi-process coordination, builds are serialized per process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.getenv("INDEX_SNAPSHOT_DIR", "data/index")
+# Older generations are kept briefly so workers still attached to them can finish their requests
+KEEP_GENERATIONS = int(os.getenv("INDEX_KEEP_GENERATIONS", "2"))
+
+def save_array(directory: str, name: str, array: np.ndarray):
+    np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(array))
+
+def load_array(directory: str, name: str, mmap: bool = True) -> np.ndarray:
+    return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None)
+
+class SnapshotStore:
+    """Publishes index generations and tells workers which one is current."""
+
+    def __init__(self, root: str = SNAPSHOT_DIR):
+        self.root = root
+        self._thread_lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, generation: int) -> str:
+        return os.path.join(self.root, f"gen_{generation:06d}")
+
+    def current_generation(self) -> Optional[int]:
+        """Generation named by the CURRENT pointer, or None if nothing was published yet."""
+        try:
+            with open(os.path.join(self.root, "CURRENT")) as f:
+                return int(f.read().strip().rsplit("_", 1)[-1])
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def read_meta(self, generation: int) -> Dict[str, Any]:
+        with open(os.path.join(self.path(generation), "meta.json")) as f:
+            return json.load(f)
+
+    @contextmanager
+    def build_lock(self) -> Iterator[None]:
+        """Hold the exclusive right to build and publish a generation."""
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.root, ".build.lock"), "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def publish(self, meta: Dict[str, Any]) -> Iterator[Tuple[int, str]]:
+        """Write a new generation and make it current. Must be called under build_lock().
+
+        Yields the new generation number and the directory to write files into.
+        The generation only becomes visible once the block exits without error.
+        """
+        generation = (self.current_generation() or 0) + 1
+        final_path = self.path(generation)
+        tmp_path = final_path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        try:
+            yield generation, tmp_path
+            with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+                json.dump({**meta, "generation": generation, "published_at": time.time()}, f)
+            os.replace(tmp_path, final_path)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+        pointer_tmp = os.path.join(self.root, "CURRENT.tmp")
+        with open(pointer_tmp, "w") as f:
+            f.write(os.path.basename(final_path))
+        os.replace(pointer_tmp, os.path.join(self.root, "CURRENT"))
+        logger.info(f"Published index generation {generation}")
+
+        self._prune(generation)
+
+    def _generations(self) -> List[int]:
+        generations = []
+        for name in os.listdir(self.root):
+            if name.startswith("gen_") and not name.endswith(".tmp"):
+                try:
+                    generations.append(int(name[4:]))
+                except ValueError:
+                    continue
+        return sorted(generations)
+
+    def _prune(self, current: int):
+        """Remove old generations; processes that still map them keep their open files."""
+        for generation in self._generations():
+            if generation <= current - KEEP_GENERATIONS:
+                shutil.rmtree(self.path(generation), ignore_errors=True)
@@ -0,0 +1,128 @@
+"""Answer fixed-form requests without going through the LLM.
+
+The suggestion chips ("Tôi muốn xem giỏ hàng", "Tôi muốn xem chính sách") and
+direct questions about a store policy have a single correct answer that is
+read from the cart table or from constants.POLICIES. Matching them with a
+few rules and answering from a template takes milliseconds instead of the
+two to three LLM calls of a graph turn. Anything with words the rules do not
+account for is left to the LLM.
+"""
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from constants import CATEGORIES, POLICIES
+from fuzzy_index import fold_diacritics
+from suggestions import tool_selections
+
+# Vietnamese title and folded trigger phrases of each policy in constants.POLICIES
+POLICY_TOPICS = {
+    "shipping": ("Vận chuyển", ["van chuyen", "giao hang", "phi ship", "ship", "shipping", "delivery"]),
+    "returns": ("Đổi trả", ["doi tra", "tra hang", "doi hang", "hoan tien", "return", "returns", "refund"]),
+    "payment": ("Thanh toán", ["phuong thuc thanh toan", "hinh thuc thanh toan", "thanh toan", "payment"]),
+    "warranty": ("Bảo hành", ["bao hanh", "warranty"]),
+    "order": ("Quy trình đặt hàng", ["quy trinh dat hang", "cach dat hang", "huong dan dat hang", "cach mua hang"]),
+    "wholesale": ("Bán sỉ", ["ban si", "mua si", "gia si", "wholesale"]),
+    "custom": ("Dịch vụ theo yêu cầu", ["dich vu theo yeu cau", "dat hang theo yeu cau", "theo yeu cau",
+                                         "theo mau rieng", "custom"]),
+}
+
+_POLICY_RE = re.compile(r"\b(?:chinh sach|quy dinh|dieu khoan|policy|policies)\b")
+_CART_RE = re.compile(r"\b(?:gio hang|cart)\b")
+_BROWSE_RE = re.compile(r"\b(?:san pham|mat hang|danh muc|products|catalog)\b")
+
+# Words that do not change what is being asked once the intent phrase is found.
+# Verbs acting on the cart (them, xoa, dat, mua...) are deliberately absent so
+# "thêm vào giỏ hàng" or "đặt hàng" still reach the LLM and its tools.
+_FILLER_WORDS = set("""
+    toi minh em anh chi ban shop cua hang muon can xem kiem tra cho hoi biet ve co khong cac nhung gi nao
+    hien tai hien thi bay gio trong dang la the nhu thi a ak ha nhe voi di vay sao ra sao nhu the nao
+    duoc khong dua liet ke tat ca moi day du thong tin chi tiet loai nhieu it
+    show me my view see what is in the all please tell about your list
+""".split())
+
+def _fold(message: str) -> str:
+    return " ".join(fold_diacritics(message).split())
+
+def _only_filler(text: str) -> bool:
+    return all(word in _FILLER_WORDS for word in re.findall(r"[0-9a-z]+", text))
+
+def _take(pattern: re.Pattern, text: str) -> Tuple[bool, str]:
+    """Whether a pattern occurs, and the text with every occurrence blanked out."""
+    rest, count = pattern.subn(" ", text)
+    return count > 0, rest
+
+def _take_policy_topic(text: str) -> Tuple[Optional[str], str]:
+    """Policy key named in the text, trying longer trigger phrases first."""
+    phrases = sorted(
+        ((phrase, key) for key, (_, triggers) in POLICY_TOPICS.items() for phrase in triggers),
+        key=lambda item: -len(item[0]),
+    )
+    for phrase, key in phrases:
+        match = re.search(rf"\b{re.escape(phrase)}\b", text)
+        if match:
+            return key, text[:match.start()] + " " + text[match.end():]
+    return None, text
+
+def route_intent(message: str) -> Optional[Dict[str, Any]]:
+    """Fixed intent of a message, or None if it needs the LLM.
+
+    Returns {"intent": "view_cart"}, {"intent": "policy", "policy": key}
+    for a single policy, {"intent": "policy", "policy": None} for the
+    overview, or {"intent": "browse"} for a bare request to see products.
+    """
+    text = _fold(message)
+    if not text:
+        return None
+
+    found, rest = _take(_CART_RE, text)
+    if found and _only_filler(rest):
+        return {"intent": "view_cart"}
+
+    has_policy, rest = _take(_POLICY_RE, text)
+    topic, rest = _take_policy_topic(rest)
+    # "giao hàng" alone is ambiguous ("giao hàng khi nào?"), so bare topics need
+    # the word "chính sách" unless the topic is the whole message
+    if (has_policy or topic) and _only_filler(rest):
+        if has_policy or not rest.strip():
+            return {"intent": "policy", "policy": topic}
+
+    found, rest = _take(_BROWSE_RE, text)
+    if found and _only_filler(rest):
+        return {"intent": "browse"}
+    return None
+
+def policy_overview() -> str:
+    lines = ["Cửa hàng có các chính sách sau:"]
+    lines.extend(f"- {title}" for title, _ in POLICY_TOPICS.values())
+    lines.append("Bạn muốn xem chi tiết chính sách nào?")
+    return "\n".join(lines)
+
+def policy_selections() -> List[Dict[str, str]]:
+    return [
+        {"text": title, "value": f"Chính sách {title.lower()}"}
+        for key, (title, _) in POLICY_TOPICS.items() if key in POLICIES
+    ]
+
+def category_overview() -> str:
+    return (
+        "Cửa hàng có các danh mục sản phẩm: " + ", ".join(CATEGORIES) + ".\n"
+        "Bạn quan tâm đến loại sản phẩm nào? Bạn cũng có thể mô tả sản phẩm mình cần, "
+        "ví dụ chất liệu, mức giá hoặc dịp sử dụng."
+    )
+
+def answer_intent(intent: Dict[str, Any], db, customer_id: str) -> Optional[Dict[str, Any]]:
+    """Templated response and selections for a routed intent, or None to fall back to the LLM."""
+    if intent["intent"] == "view_cart":
+        cart = db.view_cart(customer_id)
+        return {"response": cart, "selections": tool_selections("view_cart", cart)}
+    if intent["intent"] == "policy":
+        key = intent.get("policy")
+        if key is None:
+            return {"response": policy_overview(), "selections": policy_selections()}
+        if key in POLICIES:
+            return {"response": POLICIES[key], "selections": None}
+        return None
+    if intent["intent"] == "browse":
+        selections = [{"text": category, "value": f"Tôi muốn xem {category.lower()}"} for category in CATEGORIES]
+        return {"response": category_overview(), "selections": selections}
+    return None
@@ -0,0 +1,125 @@
+"""Precomputed item-to-item nearest neighbors for similar-product lookups."""
+import logging
+from typing import Iterable, List, Tuple
+
+import numpy as np
+import faiss
+
+from index_snapshot import save_array, load_array
+
+logger = logging.getLogger(__name__)
+
+class NeighborTable:
+    """Top-k most similar rows for every row of the product vector matrix.
+
+    Row ``i`` of ``ids`` holds the index rows of the products most similar to
+    product row ``i`` (best first, padded with -1), and ``scores`` holds their
+    cosine similarities.
+    """
+
+    def __init__(self, ids: np.ndarray, scores: np.ndarray):
+        self.ids = ids
+        self.scores = scores
+
+    @property
+    def k(self) -> int:
+        return self.ids.shape[1]
+
+    def __len__(self) -> int:
+        return self.ids.shape[0]
+
+    @staticmethod
+    def _search(index: faiss.Index, vectors: np.ndarray, rows: np.ndarray, k: int,
+                batch_size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Search the neighbors of the given rows, dropping each row from its own list."""
+        ids = np.full((len(rows), k), -1, dtype="int32")
+        scores = np.zeros((len(rows), k), dtype="float32")
+
+        for start in range(0, len(rows), batch_size):
+            block = rows[start:start + batch_size]
+            block_scores, block_ids = index.search(np.ascontiguousarray(vectors[block]), k + 1)
+            for offset, (row, row_ids, row_scores) in enumerate(zip(block, block_ids, block_scores)):
+                keep = (row_ids >= 0) & (row_ids != row)
+                row_ids, row_scores = row_ids[keep][:k], row_scores[keep][:k]
+                ids[start + offset, :len(row_ids)] = row_ids
+                scores[start + offset, :len(row_scores)] = row_scores
+
+        return ids, scores
+
+    @classmethod
+    def build(cls, index: faiss.Index, vectors: np.ndarray, k: int = 10,
+              batch_size: int = 1024) -> "NeighborTable":
+        """Compute the table for every row with batched index searches.
+
+        Args:
+            index: Inner-product index over ``vectors``
+            vectors: Normalized product vectors, one row per product
+            k: Number of neighbors kept per product
+            batch_size: Rows searched per FAISS call
+        """
+        n = len(vectors)
+        k = max(0, min(k, n - 1))
+        ids, scores = cls._search(index, vectors, np.arange(n), k, batch_size)
+        logger.info(f"Built neighbor table for {n} products (k={k})")
+        return cls(ids, scores)
+
+    def update(self, index: faiss.Index, vectors: np.ndarray, changed_rows: Iterable[int],
+               batch_size: int = 1024):
+        """Patch the table after the vectors of some rows changed or rows were appended.
+
+        Changed rows, and rows whose lists mention a changed row, are searched
+        again. Every other row only needs the changed rows merged into its list.
+        """
+        changed = np.unique(np.fromiter(changed_rows, dtype="int64"))
+        if not len(changed):
+            return
+
+        n, k = len(vectors), self.k
+        if not self.ids.flags.writeable:
+            # Tables opened from a shared snapshot are read-only; patch a private copy
+            self.ids, self.scores = np.array(self.ids), np.array(self.scores)
+        appended = n - len(self)
+        if appended > 0:
+            # Appended products start with empty lists
+            self.ids = np.vstack([self.ids, np.full((appended, k), -1, dtype="int32")])
+            self.scores = np.vstack([self.scores, np.zeros((appended, k), dtype="float32")])
+
+        stale = np.nonzero(np.isin(self.ids, changed).any(axis=1))[0]
+        affected = np.union1d(changed, stale)
+        self.ids[affected], self.scores[affected] = self._search(index, vectors, affected, k, batch_size)
+
+        others = np.setdiff1d(np.arange(n), affected)
+        if not len(others):
+            return
+
+        candidate_ids = np.hstack([self.ids[others], np.broadcast_to(changed, (len(others), len(changed)))])
+        candidate_scores = np.hstack([self.scores[others], vectors[others] @ vectors[changed].T])
+        candidate_scores[candidate_ids < 0] = -np.inf
+
+        order = np.argsort(-candidate_scores, axis=1)[:, :k]
+        merged_ids = np.take_along_axis(candidate_ids, order, axis=1)
+        merged_scores = np.take_along_axis(candidate_scores, order, axis=1)
+        empty = merged_ids < 0
+        merged_scores[empty] = 0.0
+
+        self.ids[others] = merged_ids
+        self.scores[others] = merged_scores
+        logger.info(f"Updated neighbor table for {len(changed)} changed products ({len(affected)} re-searched)")
+
+    def lookup(self, row: int, top_k: int) -> List[Tuple[int, float]]:
+        """Neighbors of a row as (row, similarity) pairs, best first."""
+        return [
+            (int(neighbor), float(score))
+            for neighbor, score in zip(self.ids[row, :top_k], self.scores[row, :top_k])
+            if neighbor >= 0
+        ]
+
+    def save(self, directory: str):
+        """Write the table into a snapshot directory."""
+        save_array(directory, "neighbor_ids", self.ids)
+        save_array(directory, "neighbor_scores", self.scores)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "NeighborTable":
+        """Open a table saved with save(), memory-mapped read-only by default."""
+        return cls(load_array(directory, "neighbor_ids", mmap), load_array(directory, "neighbor_scores", mmap))
@@ -0,0 +1,224 @@
+"""Compact columnar storage for the product catalog used by the search indices."""
+from collections.abc import Mapping, Sequence
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from index_snapshot import save_array, load_array
+
+# Column order matches the products table
+FIELDS = (
+    "product_id",
+    "name",
+    "category",
+    "material",
+    "price",
+    "stock_quantity",
+    "description",
+    "origin_location",
+    "crafting_technique",
+    "cultural_significance",
+    "dimensions",
+    "care_instructions",
+    "tags",
+)
+
+NUMERIC_FIELDS = ("product_id", "price", "stock_quantity")
+
+class StringTable(Sequence):
+    """Distinct values of a string column packed into one UTF-8 buffer.
+
+    Backed by plain arrays so a snapshot can be memory-mapped and shared
+    between processes instead of unpickled into per-process Python strings.
+    """
+
+    __slots__ = ("blob", "offsets", "nulls")
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray, nulls: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+        self.nulls = nulls
+
+    @classmethod
+    def pack(cls, values: List[Optional[str]]) -> "StringTable":
+        encoded = [(value or "").encode("utf-8") for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype="int64")
+        np.cumsum([len(item) for item in encoded], out=offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype="uint8")
+        nulls = np.array([value is None for value in values], dtype=bool)
+        return cls(blob, offsets, nulls)
+
+    def __getitem__(self, code: int) -> Optional[str]:
+        if self.nulls[code]:
+            return None
+        return self.blob[self.offsets[code]:self.offsets[code + 1]].tobytes().decode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self.nulls)
+
+class StringColumn:
+    """Dictionary-encoded string column: each distinct value is stored once."""
+
+    __slots__ = ("values", "codes")
+
+    def __init__(self, items: Iterable[Optional[str]]):
+        lookup: Dict[Optional[str], int] = {}
+        self.values: List[Optional[str]] = []
+        codes = []
+        for item in items:
+            code = lookup.get(item)
+            if code is None:
+                code = lookup[item] = len(self.values)
+                self.values.append(item)
+            codes.append(code)
+        self.codes = np.array(codes, dtype="int32")
+
+    @classmethod
+    def from_arrays(cls, values: StringTable, codes: np.ndarray) -> "StringColumn":
+        column = cls.__new__(cls)
+        column.values = values
+        column.codes = codes
+        return column
+
+    def __getitem__(self, row: int) -> Optional[str]:
+        return self.values[self.codes[row]]
+
+    def code_of(self, value: Optional[str]) -> int:
+        """Code of a value, or -1 if it never occurs in the column."""
+        try:
+            return self.values.index(value)
+        except ValueError:
+            return -1
+
+class ProductStore:
+    """The product catalog as numpy columns plus dictionary-encoded string tables.
+
+    Rows are addressed by position, which is also the product's row in the
+    vector index and TF-IDF matrix.
+    """
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        self.numbers: Dict[str, np.ndarray] = {
+            field: np.asarray([record[field] for record in records]) for field in NUMERIC_FIELDS
+        }
+        self.strings: Dict[str, StringColumn] = {
+            field: StringColumn(record[field] for record in records)
+            for field in FIELDS if field not in NUMERIC_FIELDS
+        }
+        self._id_order = np.argsort(self.numbers["product_id"], kind="stable")
+
+    def __len__(self) -> int:
+        return len(self.numbers["product_id"])
+
+    def row_of(self, product_id: int) -> Optional[int]:
+        """Row of a product ID, or None if the product is unknown."""
+        ids = self.numbers["product_id"]
+        position = int(np.searchsorted(ids, product_id, sorter=self._id_order))
+        if position < len(ids) and ids[self._id_order[position]] == product_id:
+            return int(self._id_order[position])
+        return None
+
+    def rows_of(self, product_ids: np.ndarray) -> np.ndarray:
+        """Rows of many product IDs at once, -1 where the product is unknown."""
+        ids = self.numbers["product_id"]
+        product_ids = np.asarray(product_ids, dtype=ids.dtype)
+        if not len(ids):
+            return np.full(len(product_ids), -1, dtype="int64")
+        positions = np.minimum(np.searchsorted(ids, product_ids, sorter=self._id_order), len(ids) - 1)
+        rows = self._id_order[positions]
+        return np.where(ids[rows] == product_ids, rows, -1)
+
+    def get(self, field: str, row: int) -> Any:
+        """Value of one field as a plain Python object."""
+        column = self.strings.get(field)
+        if column is not None:
+            return column[row]
+        return self.numbers[field][row].item()
+
+    def value_counts(self, field: str, rows: np.ndarray) -> Dict[Optional[str], int]:
+        """Occurrences of each value of a string column among the given rows, most frequent first."""
+        column = self.strings[field]
+        counts = np.bincount(column.codes[rows], minlength=len(column.values))
+        order = np.argsort(-counts, kind="stable")
+        return {column.values[code]: int(counts[code]) for code in order if counts[code]}
+    
+    def view(self, row: int, similarity: Optional[float] = None) -> "ProductView":
+        return ProductView(self, row, similarity)
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Materialize every row as a dict (used when rebuilding the store)."""
+        return [{field: self.get(field, row) for field in FIELDS} for row in range(len(self))]
+
+    def save(self, directory: str):
+        """Write every column as a .npy array into a snapshot directory."""
+        for field, values in self.numbers.items():
+            save_array(directory, f"num_{field}", values)
+        for field, column in self.strings.items():
+            table = column.values if isinstance(column.values, StringTable) else StringTable.pack(column.values)
+            save_array(directory, f"str_{field}_codes", column.codes)
+            save_array(directory, f"str_{field}_blob", table.blob)
+            save_array(directory, f"str_{field}_offsets", table.offsets)
+            save_array(directory, f"str_{field}_nulls", table.nulls)
+        save_array(directory, "product_id_order", self._id_order)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "ProductStore":
+        """Open a store saved with save(), memory-mapping its columns by default."""
+        store = cls.__new__(cls)
+        store.numbers = {field: load_array(directory, f"num_{field}", mmap) for field in NUMERIC_FIELDS}
+        store.strings = {}
+        for field in FIELDS:
+            if field in NUMERIC_FIELDS:
+                continue
+            table = StringTable(
+                load_array(directory, f"str_{field}_blob", mmap),
+                load_array(directory, f"str_{field}_offsets", mmap),
+                load_array(directory, f"str_{field}_nulls", mmap),
+            )
+            store.strings[field] = StringColumn.from_arrays(table, load_array(directory, f"str_{field}_codes", mmap))
+        store._id_order = load_array(directory, "product_id_order", mmap)
+        return store
+
+class ProductView(Mapping):
+    """Read-only, dict-like view of one product row, optionally carrying a search score.
+
+    ``live`` holds values read from the database after the index was built
+    (price and stock); they take precedence over the stored columns.
+    """
+
+    __slots__ = ("store", "row", "similarity", "live")
+
+    def __init__(self, store: ProductStore, row: int, similarity: Optional[float] = None,
+                 live: Optional[Mapping[str, Any]] = None):
+        self.store = store
+        self.row = row
+        self.similarity = similarity
+        self.live = live
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "similarity" and self.similarity is not None:
+            return self.similarity
+        if key not in FIELDS:
+            raise KeyError(key)
+        if self.live is not None and key in self.live:
+            return self.live[key]
+        return self.store.get(key, self.row)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from FIELDS
+        if self.similarity is not None:
+            yield "similarity"
+
+    def __len__(self) -> int:
+        return len(FIELDS) + (self.similarity is not None)
+
+    def __repr__(self) -> str:
+        return f"ProductView({dict(self)!r})"
+
+    def with_similarity(self, similarity: float) -> "ProductView":
+        """Same row with a different score."""
+        return ProductView(self.store, self.row, similarity, self.live)
+
+    def with_live(self, live: Mapping[str, Any]) -> "ProductView":
+        """Same row and score with live values overlaid."""
+        return ProductView(self.store, self.row, self.similarity, live)
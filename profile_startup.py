@@ -0,0 +1,70 @@
+"""Report how long importing a module takes, broken down per imported module.
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter, so
+nothing is cached from this process, and summarizes the timings.
+
+Usage:
+    python profile_startup.py                  # cold start of the API app
+    python profile_startup.py --module react_chatbot --top 30
+    python profile_startup.py --json > startup.json
+"""
+import argparse
+import json
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+def profile_imports(module: str) -> List[Dict[str, Any]]:
+    """Import a module in a fresh interpreter and collect per-module import timings."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+
+    timings = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+    return timings
+
+def summarize(module: str, timings: List[Dict[str, Any]], top: int) -> Dict[str, Any]:
+    top_level = [t for t in timings if t["depth"] == 0]
+    return {
+        "module": module,
+        "total_ms": round(sum(t["cumulative_ms"] for t in top_level), 1),
+        "modules_imported": len(timings),
+        "slowest_cumulative": sorted(timings, key=lambda t: t["cumulative_ms"], reverse=True)[:top],
+        "slowest_self": sorted(timings, key=lambda t: t["self_ms"], reverse=True)[:top],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile import time of the API process")
+    parser.add_argument("--module", default="api", help="Module to import (default: api)")
+    parser.add_argument("--top", type=int, default=20, help="Number of slowest modules to show")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    summary = summarize(args.module, profile_imports(args.module), args.top)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    print(f"import {summary['module']}: {summary['total_ms']:.1f} ms, {summary['modules_imported']} modules")
+    print(f"{'cumulative ms':>14} {'self ms':>10}  module")
+    for timing in summary["slowest_cumulative"]:
+        indent = "  " * timing["depth"]
+        print(f"{timing['cumulative_ms']:>14.1f} {timing['self_ms']:>10.1f}  {indent}{timing['module']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Route purely structural product queries to SQL instead of semantic search.
+
+Much of catalog browsing is structural: "giỏ mây dưới 300k, rẻ nhất trước",
+"tranh trên 1 triệu", "sản phẩm 12". Such queries are fully described by a
+category, material, price range, stock and sort order, or by a product ID, so
+they are answered from the products table without an embedding round trip.
+Only queries with descriptive words left over go to semantic search.
+"""
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from constants import CATEGORIES, MATERIALS
+from fuzzy_index import fold_diacritics
+
+_AMOUNT = r"(\d+(?:[.,]\d+)*)\s*(k|nghin|ngan|tr|trieu|cu|d|dong|vnd)?\b"
+
+_PRODUCT_ID_RE = re.compile(
+    r"\b(?:san pham|sp|ma|id|product)\s*(?:so\s*)?#?(\d+)\b(?!\s*(?:k|nghin|ngan|tr|trieu|d|dong|vnd)\b)"
+)
+_RANGE_RE = re.compile(rf"\b(?:tu|gia)?\s*{_AMOUNT}\s*(?:-|den|toi|to)\s*{_AMOUNT}")
+_MAX_PRICE_RE = re.compile(rf"\b(?:duoi|it hon|khong qua|toi da|re hon|under|below|less than|max)\s*{_AMOUNT}")
+_MIN_PRICE_RE = re.compile(rf"\b(?:tren|hon|tu|it nhat|toi thieu|dat hon|over|above|more than|min)\s*{_AMOUNT}")
+
+_SORT_PHRASES = [
+    ("asc", re.compile(r"\b(?:re nhat|gia thap nhat|thap nhat|gia re|thap den cao|tang dan|cheapest|lowest price)\b")),
+    ("desc", re.compile(r"\b(?:dat nhat|gia cao nhat|cao nhat|cao den thap|giam dan|most expensive|highest price)\b")),
+]
+_IN_STOCK_RE = re.compile(r"\b(?:con hang|co san|in stock|available)\b")
+
+# Words that carry no product description once the filters are extracted
+_FILLER_WORDS = set("""
+    toi minh em anh chi ban shop cua hang muon can tim kiem xem cho hoi co khong cac nhung mot vai it nhieu
+    san pham sp mon do hang loai nao gi bang lam tu gia tien voi va hay hoac thi o tai nhe a ak ha di
+    danh sach liet ke tat ca moi trong duoc truoc sau len xuong theo sap xep hien thi dang ban
+    show me find all any list the a an of in with made from price prices item items product products
+    sort by first please
+""".split())
+
+def _fold_terms(values: List[str]) -> List[Tuple[str, str]]:
+    """Canonical values with their folded form, longest first so "la co" wins over shorter terms."""
+    return sorted(((fold_diacritics(value), value) for value in values), key=lambda item: -len(item[0]))
+
+_CATEGORY_TERMS = _fold_terms(CATEGORIES)
+_MATERIAL_TERMS = _fold_terms(MATERIALS)
+
+def parse_amount(number: str, unit: Optional[str]) -> float:
+    """VND amount of "300k", "1,5 triệu", "300.000đ" or a bare "300" (read as thousands)."""
+    if unit in ("k", "nghin", "ngan", "tr", "trieu", "cu"):
+        value = float(number.replace(",", "."))
+        return value * (1000 if unit in ("k", "nghin", "ngan") else 1000000)
+    value = float(re.sub(r"[.,]", "", number))
+    return value if unit or value >= 1000 else value * 1000
+
+def _take(pattern: re.Pattern, text: str) -> Tuple[Optional[re.Match], str]:
+    """First match of a pattern and the text with the match blanked out."""
+    match = pattern.search(text)
+    if not match:
+        return None, text
+    return match, text[:match.start()] + " " + text[match.end():]
+
+def _take_term(terms: List[Tuple[str, str]], text: str) -> Tuple[Optional[str], str]:
+    for folded, value in terms:
+        match = re.search(rf"\b{re.escape(folded)}\b", text)
+        if match:
+            return value, text[:match.start()] + " " + text[match.end():]
+    return None, text
+
+def route_product_query(query: str) -> Optional[Dict[str, Any]]:
+    """Structured form of a product query, or None if it needs semantic search.
+
+    Returns {"product_id": id} for ID lookups, or {"filters": {...},
+    "sort_by_price": "asc" | "desc" | None} when the query is nothing but
+    category, material, price, stock and ordering constraints.
+    """
+    text = " ".join(fold_diacritics(query).split())
+
+    match, rest = _take(_PRODUCT_ID_RE, text)
+    if match and not _descriptive_words(rest):
+        return {"product_id": int(match.group(1))}
+
+    filters: Dict[str, Any] = {}
+    sort_by_price = None
+    for order, pattern in _SORT_PHRASES:
+        match, text = _take(pattern, text)
+        if match:
+            sort_by_price = sort_by_price or order
+
+    match, text = _take(_RANGE_RE, text)
+    if match:
+        low, high = parse_amount(*match.group(1, 2)), parse_amount(*match.group(3, 4))
+        filters["min_price"], filters["max_price"] = min(low, high), max(low, high)
+    match, text = _take(_MAX_PRICE_RE, text)
+    if match:
+        filters["max_price"] = parse_amount(*match.group(1, 2))
+    match, text = _take(_MIN_PRICE_RE, text)
+    if match:
+        filters["min_price"] = parse_amount(*match.group(1, 2))
+
+    match, text = _take(_IN_STOCK_RE, text)
+    if match:
+        filters["min_stock"] = 1
+
+    category, text = _take_term(_CATEGORY_TERMS, text)
+    if category:
+        filters["category"] = category
+    material, text = _take_term(_MATERIAL_TERMS, text)
+    if material:
+        filters["material"] = material
+
+    if (not filters and not sort_by_price) or _descriptive_words(text):
+        return None
+    return {"filters": filters, "sort_by_price": sort_by_price}
+
+def _descriptive_words(text: str) -> List[str]:
+    """Words left in a folded query that are not filler."""
+    return [word for word in re.findall(r"[0-9a-z]+", text) if word not in _FILLER_WORDS]
@@ -1,25 +1,86 @@
 import os
+import asyncio
+import functools
+import heapq
 import sqlite3
-from typing import List, Dict, Any, Optional, Union, Callable
+from collections.abc import Mapping
+from typing import List, Dict, Any, Optional, Union, Callable, Tuple
 from dotenv import load_dotenv
 import logging
 import pickle
+import string
+import time
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_core.documents import Document
+import faiss
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
+from scipy.sparse import csr_matrix
+
+from vector_index import build_index, normalize, set_search_params, is_cosine, is_exact
+from search_cache import SearchCache
+from neighbor_table import NeighborTable
+from product_store import ProductStore, ProductView
+from fuzzy_index import TrigramIndex, is_unaccented, FUZZY_MAX_CANDIDATES, FUZZY_MIN_SCORE
+from build_pipeline import EmbeddingPipeline
+from index_snapshot import SnapshotStore, save_array, load_array
+from constants import PRICE_BUCKETS
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Define paths for persisting data
+# Files written before indices were published as shared snapshots; migrated on first start
 VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", "data/vector_store")
-TFIDF_PATH = os.getenv("TFIDF_PATH", "data/tfidf_model.pkl")
+INDEX_FILE = os.path.join(VECTOR_STORE_PATH, "index.faiss")
 PRODUCT_DATA_PATH = os.getenv("PRODUCT_DATA_PATH", "data/product_data.pkl")
+VECTORS_PATH = os.getenv("VECTORS_PATH", "data/vectors.npy")
+
+# Seconds between checks for a generation published by another process
+SNAPSHOT_CHECK_INTERVAL = float(os.getenv("SNAPSHOT_CHECK_INTERVAL", "2"))
+
+# FAISS index type used when (re)building: flat, hnsw, ivf_flat or ivf_pq
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "flat")
+
+# Compressed/approximate indexes fetch this many times top_k candidates, re-ranked exactly
+VECTOR_RERANK_FACTOR = int(os.getenv("VECTOR_RERANK_FACTOR", "4"))
+
+# Hybrid search fetches this many times top_k candidates from each retriever before fusing
+HYBRID_CANDIDATE_FACTOR = int(os.getenv("HYBRID_CANDIDATE_FACTOR", "2"))
+
+# Longest word n-gram indexed by TF-IDF
+TFIDF_MAX_NGRAM = int(os.getenv("TFIDF_MAX_NGRAM", "2"))
+
+# Maximum number of cached search results (0 disables the cache)
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+
+# Number of precomputed neighbors kept per product for get_similar_products
+SIMILAR_PRODUCTS_K = int(os.getenv("SIMILAR_PRODUCTS_K", "10"))
+
+# Scale of fuzzy match scores for queries typed with diacritics
+FUZZY_ACCENTED_WEIGHT = float(os.getenv("FUZZY_ACCENTED_WEIGHT", "0.1"))
+
+# Unaccented hybrid queries whose best fuzzy match scores at least this skip the embedding call
+FUZZY_SHORTCUT_SCORE = float(os.getenv("FUZZY_SHORTCUT_SCORE", "0.9"))
+
+# Product IDs per bulk query when overlaying live price and stock
+LIVE_VALUES_CHUNK = 500
+
+# SQLite's LIKE folds the case of ASCII letters only
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+# Threads running the CPU-bound part of async searches (FAISS releases the GIL while searching)
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "4"))
+
+def _read_shared_index(path: str) -> faiss.Index:
+    """Read a FAISS index memory-mapped read-only so worker processes share its pages."""
+    try:
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except Exception:
+        # Not every index type supports mmap; fall back to a private copy
+        return faiss.read_index(path)
 
 class ProductRAG:
     """Retrieval Augmented Generation for product metadata with hybrid search capabilities."""
@@ -46,32 +107,35 @@ class ProductRAG:
         self.db_path = os.path.normpath(self.db_path)
             
         self.embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-        self.vector_store = None
-        self.product_data = []
+        self.index = None
+        self.cosine_scores = False  # Legacy indexes store L2 distances
+        self.store = None  # Columnar product data; row i is row i of every index
+        self.vectors = None  # Normalized full-precision embeddings (memory-mapped), one row per product
+        self.neighbors = None
         self.initialized = False
+        self.snapshots = SnapshotStore()
+        self.generation = 0  # Published snapshot generation currently attached
+        self._generation_checked = 0.0
+        self.search_cache = SearchCache(SEARCH_CACHE_SIZE)
+        self.search_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="search")
         self.tfidf_vectorizer = None
         self.tfidf_matrix = None
-        self.product_texts = []
-        
-        # Create directories if they don't exist
-        os.makedirs(os.path.dirname(VECTOR_STORE_PATH), exist_ok=True)
-        os.makedirs(os.path.dirname(TFIDF_PATH), exist_ok=True)
-        os.makedirs(os.path.dirname(PRODUCT_DATA_PATH), exist_ok=True)
+        self.fuzzy_index = None  # Accent-insensitive trigram index over names, tags and categories
     
     def _get_connection(self) -> sqlite3.Connection:
         """Get a database connection."""
-        logger.info(f"Connecting to database: {self.db_path}")
+        logger.debug(f"Connecting to database: {self.db_path}")
         if not os.path.exists(self.db_path):
             logger.error(f"Database file does not exist: {self.db_path}")
             raise FileNotFoundError(f"Database file not found: {self.db_path}")
         return sqlite3.connect(self.db_path)
     
-    def _extract_products(self) -> List[Dict[str, Any]]:
-        """Extract all products with their metadata from the database."""
+    def _extract_products(self, product_ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        """Extract all products (or only the given IDs) with their metadata from the database."""
         conn = self._get_connection()
         cursor = conn.cursor()
         try:
-            cursor.execute("""
+            query = """
                 SELECT 
                     product_id, 
                     name, 
@@ -87,7 +151,12 @@ class ProductRAG:
                     care_instructions,
                     tags
                 FROM products
-            """)
+            """
+            params = []
+            if product_ids is not None:
+                query += f" WHERE product_id IN ({','.join('?' * len(product_ids))})"
+                params = list(product_ids)
+            cursor.execute(query, params)
             
             columns = [col[0] for col in cursor.description]
             products = [dict(zip(columns, row)) for row in cursor.fetchall()]
@@ -99,19 +168,17 @@ class ProductRAG:
             cursor.close()
             conn.close()
     
-    def _create_documents(self, products: List[Dict[str, Any]]) -> List[Document]:
-        """Convert products to Document objects for vector storage."""
-        documents = []
-        self.product_texts = []
+    @staticmethod
+    def _product_text(product: Mapping) -> str:
+        """Rich text representation of a product, used for embedding and TF-IDF.
         
-        for product in products:
-            # Create a rich text representation for embedding
-            content = f"""Sản phẩm: {product['name']}
+        Price and stock are left out on purpose: they change with every sale and
+        are overlaid from the database at query time instead.
+        """
+        return f"""Sản phẩm: {product['name']}
 
 Danh mục: {product['category']}
 Chất liệu: {product['material']}
-Giá: {product['price']} đồng
-Số lượng trong kho: {product['stock_quantity']}
 
 Mô tả: {product['description']}
 
@@ -121,125 +188,197 @@ Kỹ thuật chế tác: {product['crafting_technique']}
 Kích thước: {product['dimensions']}
 Hướng dẫn bảo quản: {product['care_instructions']}
 Từ khóa: {product['tags']}"""
-            
-            # Store text for TF-IDF
-            self.product_texts.append(content)
-            
-            # Create metadata for filtering and additional context
-            metadata = {
-                "product_id": product["product_id"],
-                "name": product["name"],
-                "category": product["category"],
-                "material": product["material"],
-                "price": product["price"],
-                "stock_quantity": product["stock_quantity"],
-                "origin_location": product["origin_location"],
-                "tags": product["tags"]
-            }
-            
-            documents.append(Document(page_content=content, metadata=metadata))
+    
+    def _product_texts(self, rows: Optional[List[int]] = None) -> List[str]:
+        """Texts of the given rows (all rows by default), generated on demand from the store."""
+        rows = range(len(self.store)) if rows is None else rows
+        return [self._product_text(self.store.view(row)) for row in rows]
+    
+    def _embed_texts(self, texts: List[str], pipeline: Optional[EmbeddingPipeline] = None) -> np.ndarray:
+        """Embed product texts into normalized float32 vectors through the batched pipeline."""
+        pipeline = pipeline or EmbeddingPipeline(self.embeddings)
+        return normalize(pipeline.run(texts))
+    
+    def _configure_index(self):
+        """Match query handling to the metric of the loaded index."""
+        # Inner-product indexes hold normalized vectors, so queries are normalized too
+        self.cosine_scores = is_cosine(self.index)
+        set_search_params(self.index)
+    
+    def _load_legacy_files(self) -> bool:
+        """Load indices persisted by versions that predate shared snapshots.
+        
+        Legacy files were built from product text that still contained price
+        and stock. The TF-IDF model is refitted from the current text, which
+        needs no embedding API; the vectors are kept until the next --rebuild.
+        """
+        if not all(os.path.exists(path) for path in (INDEX_FILE, PRODUCT_DATA_PATH)):
+            return False
+        try:
+            with open(PRODUCT_DATA_PATH, 'rb') as f:
+                store = pickle.load(f)
+            # Oldest files are plain lists of product dicts
+            self.store = ProductStore(store.records() if isinstance(store, ProductStore) else store)
+            self.index = faiss.read_index(INDEX_FILE)
+            self._configure_index()
+        except Exception as e:
+            logger.error(f"Error loading legacy index files: {str(e)}")
+            return False
         
-        return documents
+        self.tfidf_vectorizer, self.tfidf_matrix = self._setup_tfidf(self._product_texts())
+        logger.warning(
+            "Legacy vectors were embedded from text that includes price and stock; "
+            "run `python rag_search.py --rebuild` to re-embed the catalog"
+        )
+        
+        n = len(self.store)
+        self.vectors = np.load(VECTORS_PATH) if os.path.exists(VECTORS_PATH) else None
+        if self.vectors is None or len(self.vectors) != n:
+            # Indexes built before vectors were persisted can still reconstruct them
+            self.vectors = normalize(self.index.reconstruct_n(0, n))
+        self._build_neighbors()
+        logger.info("Loaded legacy index files")
+        return True
     
-    def _setup_tfidf(self):
-        """Set up TF-IDF vectorizer for keyword search."""
-        self.tfidf_vectorizer = TfidfVectorizer(
+    def _build_neighbors(self):
+        """Precompute the similar-product table from the stored vectors."""
+        # Legacy L2 indexes hold unnormalized vectors, so search an exact cosine index instead
+        index = self.index if self.cosine_scores else build_index(self.vectors, "flat")
+        self.neighbors = NeighborTable.build(index, self.vectors, SIMILAR_PRODUCTS_K)
+    
+    def _setup_tfidf(self, texts: List[str]):
+        """Fit a TF-IDF vectorizer for keyword search; returns the vectorizer and document matrix."""
+        tfidf_vectorizer = TfidfVectorizer(
             lowercase=True,
             stop_words='english',  # We could add Vietnamese stop words here
-            ngram_range=(1, 2)  # Use unigrams and bigrams
+            ngram_range=(1, TFIDF_MAX_NGRAM)  # Unigrams and bigrams by default
         )
-        self.tfidf_matrix = self.tfidf_vectorizer.fit_transform(self.product_texts)
+        tfidf_matrix = tfidf_vectorizer.fit_transform(texts)
         logger.info("TF-IDF vectorizer initialized")
+        return tfidf_vectorizer, tfidf_matrix
+    
+    def _publish(self):
+        """Write the in-memory indices as a new snapshot generation and attach to it.
         
-        # Save TF-IDF model to disk
-        with open(TFIDF_PATH, 'wb') as f:
-            pickle.dump((self.tfidf_vectorizer, self.tfidf_matrix, self.product_texts), f)
-        logger.info(f"TF-IDF model saved to {TFIDF_PATH}")
+        Must be called under the snapshot build lock.
+        """
+        meta = {
+            "product_count": len(self.store),
+            "index_type": VECTOR_INDEX_TYPE,
+            "tfidf_shape": list(self.tfidf_matrix.shape),
+        }
+        with self.snapshots.publish(meta) as (generation, path):
+            self.store.save(path)
+            faiss.write_index(self.index, os.path.join(path, "index.faiss"))
+            save_array(path, "vectors", self.vectors)
+            self.neighbors.save(path)
+            tfidf_matrix = self.tfidf_matrix.tocsr()
+            save_array(path, "tfidf_data", tfidf_matrix.data)
+            save_array(path, "tfidf_indices", tfidf_matrix.indices)
+            save_array(path, "tfidf_indptr", tfidf_matrix.indptr)
+            with open(os.path.join(path, "tfidf_vectorizer.pkl"), 'wb') as f:
+                pickle.dump(self.tfidf_vectorizer, f)
+        # Drop the private copies in favour of the shared, memory-mapped files
+        self._attach(generation)
     
-    def _load_tfidf(self) -> bool:
-        """Load TF-IDF model from disk if available."""
-        if os.path.exists(TFIDF_PATH):
-            try:
-                with open(TFIDF_PATH, 'rb') as f:
-                    self.tfidf_vectorizer, self.tfidf_matrix, self.product_texts = pickle.load(f)
-                logger.info(f"TF-IDF model loaded from {TFIDF_PATH}")
-                return True
-            except Exception as e:
-                logger.error(f"Error loading TF-IDF model: {str(e)}")
-        return False
-    
-    def _save_product_data(self):
-        """Save product data to disk."""
-        with open(PRODUCT_DATA_PATH, 'wb') as f:
-            pickle.dump(self.product_data, f)
-        logger.info(f"Product data saved to {PRODUCT_DATA_PATH}")
-    
-    def _load_product_data(self) -> bool:
-        """Load product data from disk if available."""
-        if os.path.exists(PRODUCT_DATA_PATH):
+    def _attach(self, generation: int):
+        """Memory-map a published generation and swap it in."""
+        path = self.snapshots.path(generation)
+        meta = self.snapshots.read_meta(generation)
+        store = ProductStore.load(path)
+        index = _read_shared_index(os.path.join(path, "index.faiss"))
+        vectors = load_array(path, "vectors")
+        neighbors = NeighborTable.load(path)
+        tfidf_matrix = csr_matrix(
+            (load_array(path, "tfidf_data"), load_array(path, "tfidf_indices"), load_array(path, "tfidf_indptr")),
+            shape=tuple(meta["tfidf_shape"]),
+        )
+        with open(os.path.join(path, "tfidf_vectorizer.pkl"), 'rb') as f:
+            tfidf_vectorizer = pickle.load(f)
+        fuzzy_index = TrigramIndex.from_store(store)
+        
+        # Swap everything at once so concurrent searches never mix generations
+        (self.store, self.index, self.vectors, self.neighbors, self.tfidf_vectorizer, self.tfidf_matrix,
+         self.fuzzy_index) = (store, index, vectors, neighbors, tfidf_vectorizer, tfidf_matrix, fuzzy_index)
+        self._configure_index()
+        self.generation = generation
+        self.initialized = True
+        self._generation_checked = time.monotonic()
+        logger.info(f"Attached to index generation {generation} ({len(store)} products)")
+    
+    def _sync_generation(self):
+        """Pick up a generation published by another process, checking at most every few seconds."""
+        now = time.monotonic()
+        if now - self._generation_checked < SNAPSHOT_CHECK_INTERVAL:
+            return
+        self._generation_checked = now
+        latest = self.snapshots.current_generation()
+        if latest is not None and latest != self.generation:
             try:
-                with open(PRODUCT_DATA_PATH, 'rb') as f:
-                    self.product_data = pickle.load(f)
-                logger.info(f"Product data loaded from {PRODUCT_DATA_PATH}")
-                return True
+                self._attach(latest)
             except Exception as e:
-                logger.error(f"Error loading product data: {str(e)}")
-        return False
+                # Keep serving the attached generation; the next check retries
+                logger.error(f"Error attaching to index generation {latest}: {str(e)}")
+    
+    def _rebuild(self):
+        """Rebuild every index from the database into memory."""
+        # Extract products from database
+        self.store = ProductStore(self._extract_products())
+        logger.info(f"Extracted {len(self.store)} products from database")
+        
+        # Embed product texts, fitting the keyword index while the embedding API works
+        texts = self._product_texts()
+        pipeline = EmbeddingPipeline(self.embeddings)
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="tfidf") as executor:
+            tfidf_future = executor.submit(self._setup_tfidf, texts)
+            self.vectors = self._embed_texts(texts, pipeline)
+            self.tfidf_vectorizer, self.tfidf_matrix = tfidf_future.result()
+        
+        # Build the vector index
+        self.index = build_index(self.vectors, VECTOR_INDEX_TYPE)
+        self._configure_index()
+        logger.info(f"Built {VECTOR_INDEX_TYPE} vector index")
+        
+        # Precompute similar products from the stored vectors
+        self._build_neighbors()
+        self._publish()
+        
+        # Everything is persisted, so the embedding checkpoints are no longer needed
+        pipeline.clear()
     
     def initialize(self, force_reload=False):
-        """Initialize or reload the vector store with product data."""
+        """Attach to the current index generation, building it first if needed.
+        
+        Only one process builds at a time; the others wait for the build lock
+        and then attach to what it published instead of building again.
+        """
         if self.initialized and not force_reload:
             return
         
         try:
             logger.info("Initializing product RAG system...")
-            
-            # Check if we can load from disk first
-            vector_store_exists = os.path.exists(VECTOR_STORE_PATH)
-            product_data_loaded = self._load_product_data()
-            tfidf_loaded = self._load_tfidf()
-            
-            # If all data is available and no force reload, load from disk
-            if vector_store_exists and product_data_loaded and tfidf_loaded and not force_reload:
-                # Load vector store from disk
-                self.vector_store = FAISS.load_local(
-                    VECTOR_STORE_PATH,
-                    self.embeddings,
-                    allow_dangerous_deserialization=True
-                )
-                logger.info(f"Vector store loaded from {VECTOR_STORE_PATH}")
-                self.initialized = True
-                logger.info("Product RAG system initialized from disk")
+            seen = self.snapshots.current_generation()
+            if seen is not None and not force_reload:
+                self._attach(seen)
                 return
             
-            # Otherwise, rebuild everything
-            # Extract products from database
-            self.product_data = self._extract_products()
-            logger.info(f"Extracted {len(self.product_data)} products from database")
-            
-            # Save product data
-            self._save_product_data()
-            
-            # Convert to documents
-            documents = self._create_documents(self.product_data)
-            
-            # Create vector store
-            self.vector_store = FAISS.from_documents(documents, self.embeddings)
-            
-            # Save vector store to disk
-            self.vector_store.save_local(VECTOR_STORE_PATH)
-            logger.info(f"Vector store saved to {VECTOR_STORE_PATH}")
-            
-            # Set up TF-IDF for keyword search
-            self._setup_tfidf()
-            
-            self.initialized = True
+            with self.snapshots.build_lock():
+                latest = self.snapshots.current_generation()
+                if latest is not None and latest != seen:
+                    # Another process published while we waited for the lock
+                    self._attach(latest)
+                    return
+                
+                if not force_reload and self._load_legacy_files():
+                    self._publish()
+                else:
+                    self._rebuild()
             logger.info("Product RAG system initialized successfully")
         except Exception as e:
             logger.error(f"Error initializing RAG system: {str(e)}")
             raise
     
-    def _apply_filters(self, results: List[Dict[str, Any]], filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def _apply_filters(self, results: List[ProductView], filters: Dict[str, Any]) -> List[ProductView]:
         """Apply filters to search results."""
         if not filters:
             return results
@@ -267,8 +406,8 @@ Từ khóa: {product['tags']}"""
                 
         return filtered_results
     
-    def _keyword_search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Perform keyword-based search using TF-IDF."""
+    def _keyword_search(self, query: str, top_k: int = 5) -> List[ProductView]:
+        """Perform keyword-based search using TF-IDF and the accent-insensitive trigram index."""
         if not self.initialized:
             self.initialize()
             
@@ -278,45 +417,111 @@ Từ khóa: {product['tags']}"""
         # Calculate cosine similarity
         similarities = cosine_similarity(query_vector, self.tfidf_matrix)[0]
         
-        # Get top-k indices
-        top_indices = similarities.argsort()[-top_k:][::-1]
+        return self._merge_fuzzy_matches(query, similarities, top_k)
+    
+    def _merge_fuzzy_matches(self, query: str, similarities: np.ndarray, top_k: int) -> List[ProductView]:
+        """Top keyword matches, scoring each row by the better of its TF-IDF and fuzzy match.
         
-        results = []
-        for idx in top_indices:
-            if similarities[idx] > 0.0:  # Only include if there's some similarity
-                product = self.product_data[idx].copy()
-                product["similarity"] = float(similarities[idx])
-                product["content"] = self.product_texts[idx]
-                results.append(product)
-                
-        return results
+        TF-IDF only matches exact (accented) words; the trigram index also finds
+        products for queries typed without diacritics or with small typos. Rows
+        with the same score, e.g. every "Nón lá ..." for "non la", are ordered
+        by their TF-IDF similarity.
+        """
+        k = max(1, min(top_k, len(similarities)))
+        scores = {int(idx): float(similarities[idx])
+                  for idx in np.argpartition(-similarities, k - 1)[:k] if similarities[idx] > 0.0}
+        
+        # With diacritics TF-IDF is precise, so fuzzy matches only fill in behind it
+        weight = 1.0 if is_unaccented(query) else FUZZY_ACCENTED_WEIGHT
+        for row, score in self.fuzzy_index.search(query, top_k):
+            if score >= FUZZY_MIN_SCORE and score * weight > scores.get(row, 0.0):
+                scores[row] = score * weight
+        
+        ranked = heapq.nlargest(top_k, scores, key=lambda row: (scores[row], similarities[row]))
+        return [self.store.view(row, scores[row]) for row in ranked]
     
-    def _semantic_search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    def _effective_search_type(self, query: str, search_type: str) -> str:
+        """Search type actually run for a query.
+        
+        Hybrid queries typed without diacritics that clearly name products are
+        answered from the keyword indices alone: the trigram index resolves them
+        in one lookup, and embeddings of unaccented Vietnamese add little.
+        """
+        if search_type != "hybrid" or not is_unaccented(query):
+            return search_type
+        best = self.fuzzy_index.search(query, 1)
+        return "keyword" if best and best[0][1] >= FUZZY_SHORTCUT_SCORE else search_type
+    
+    def _group_by_search_type(self, queries: List[str], indices: List[int], search_type: str) -> Dict[str, List[int]]:
+        """Indices of the given queries grouped by the search type that will run for each."""
+        groups: Dict[str, List[int]] = {}
+        for i in indices:
+            groups.setdefault(self._effective_search_type(queries[i], search_type), []).append(i)
+        return groups
+    
+    def _semantic_search(self, query: str, top_k: int = 5) -> List[ProductView]:
         """Perform semantic search using embeddings."""
         if not self.initialized:
             self.initialize()
-            
-        # Search the vector store
-        search_results = self.vector_store.similarity_search_with_score(query, k=top_k)
         
-        results = []
-        for doc, score in search_results:
-            # Convert score to similarity (FAISS returns L2 distance)
-            similarity = 1.0 / (1.0 + score)
-            
-            # Find the corresponding product
-            product_id = doc.metadata["product_id"]
-            product = next((p.copy() for p in self.product_data if p["product_id"] == product_id), None)
-            
-            if product:
-                product["similarity"] = similarity
-                product["content"] = doc.page_content
-                results.append(product)
-                
-        return results
+        query_vector = np.array([self.embeddings.embed_query(query)], dtype="float32")
+        if self.cosine_scores:
+            query_vector = normalize(query_vector)
+        return self._vector_search(query_vector, top_k)[0]
+    
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed several queries with a single embedding API call."""
+        try:
+            vectors = self.embeddings.embed_documents(queries, task_type="retrieval_query")
+        except TypeError:
+            # Embedders without task types embed queries and documents the same way
+            vectors = self.embeddings.embed_documents(queries)
+        matrix = np.array(vectors, dtype="float32")
+        return normalize(matrix) if self.cosine_scores else matrix
+    
+    def _vector_search(self, query_matrix: np.ndarray, top_k: int = 5) -> List[List[ProductView]]:
+        """Search the vector index for every row of the query matrix in one call."""
+        rerank = self.cosine_scores and not is_exact(self.index) and VECTOR_RERANK_FACTOR > 1
+        fetch = top_k * VECTOR_RERANK_FACTOR if rerank else top_k
+        scores, indices = self.index.search(query_matrix, min(fetch, len(self.store)))
+        
+        if rerank:
+            scores, indices = self._rerank(query_matrix, indices, top_k)
+        
+        batch = []
+        for row_scores, row_indices in zip(scores, indices):
+            results = []
+            for score, idx in zip(row_scores, row_indices):
+                if idx < 0:  # Approximate indexes pad missing hits with -1
+                    continue
+                # Inner-product indexes return cosine similarity, legacy flat indexes L2 distance
+                similarity = float(score) if self.cosine_scores else 1.0 / (1.0 + float(score))
+                results.append(self.store.view(int(idx), similarity))
+            batch.append(results)
+        return batch
+    
+    def _rerank(self, query_matrix: np.ndarray, indices: np.ndarray, top_k: int):
+        """Re-score candidates of a compressed index with the full-precision vectors."""
+        scores = np.zeros((len(indices), top_k), dtype="float32")
+        reranked = np.full((len(indices), top_k), -1, dtype="int64")
+        for i, (query, candidates) in enumerate(zip(query_matrix, indices)):
+            candidates = candidates[candidates >= 0]
+            exact_scores = self.vectors[candidates] @ query
+            order = np.argsort(-exact_scores)[:top_k]
+            scores[i, :len(order)] = exact_scores[order]
+            reranked[i, :len(order)] = candidates[order]
+        return scores, reranked
+    
+    def _keyword_search_many(self, queries: List[str], top_k: int = 5) -> List[List[ProductView]]:
+        """Perform keyword search for a batch of queries with one sparse matrix product."""
+        query_matrix = self.tfidf_vectorizer.transform(queries)
+        
+        # TF-IDF rows are L2-normalized, so the dot product is the cosine similarity
+        similarities = (query_matrix @ self.tfidf_matrix.T).toarray()
+        return [self._merge_fuzzy_matches(query, row, top_k) for query, row in zip(queries, similarities)]
     
     def search(self, query: str, top_k: int = 5, filters: Optional[Dict[str, Any]] = None, 
-               search_type: str = "hybrid", semantic_weight: float = 0.7) -> List[Dict[str, Any]]:
+               search_type: str = "hybrid", semantic_weight: float = 0.7) -> List[ProductView]:
         """Search for products based on semantic similarity, keywords, and optional filters.
         
         Args:
@@ -327,88 +532,446 @@ Từ khóa: {product['tags']}"""
             semantic_weight: Weight for semantic search results in hybrid search (0.0-1.0)
             
         Returns:
-            List of matching products with similarity scores
+            List of matching products with similarity scores and live price and stock
         """
         if not self.initialized:
             self.initialize()
+        self._sync_generation()
         
-        try:
-            results = []
-            
-            if search_type == "semantic" or search_type == "hybrid":
-                semantic_results = self._semantic_search(query, top_k=top_k*2 if search_type == "hybrid" else top_k)
+        generation = self.generation
+        cache_key = SearchCache.make_key(query, top_k, filters, search_type, semantic_weight)
+        candidates = self.search_cache.get(cache_key, generation)
+        
+        if candidates is None:
+            try:
+                semantic_results, keyword_results = [], []
+                effective_type = self._effective_search_type(query, search_type)
+                fetch = top_k*HYBRID_CANDIDATE_FACTOR if effective_type == "hybrid" else top_k
                 
-                if search_type == "semantic":
-                    results = semantic_results
-                    
-            if search_type == "keyword" or search_type == "hybrid":
-                keyword_results = self._keyword_search(query, top_k=top_k*2 if search_type == "hybrid" else top_k)
+                if effective_type == "semantic" or effective_type == "hybrid":
+                    semantic_results = self._semantic_search(query, top_k=fetch)
+                        
+                if effective_type == "keyword" or effective_type == "hybrid":
+                    keyword_results = self._keyword_search(query, top_k=fetch)
                 
-                if search_type == "keyword":
-                    results = keyword_results
+                candidates = self._fuse_results(semantic_results, keyword_results, effective_type, semantic_weight)
+                
+            except Exception as e:
+                logger.error(f"Error searching products: {str(e)}")
+                return []
             
-            # Combine results for hybrid search
-            if search_type == "hybrid":
-                # Create a dictionary to store combined results
-                combined_results = {}
+            self.search_cache.put(cache_key, generation, candidates)
+        
+        return self._finalize_results([candidates], filters, top_k)[0]
+    
+    def search_many(self, queries: List[str], top_k: int = 5, filters: Optional[Dict[str, Any]] = None,
+                    search_type: str = "hybrid", semantic_weight: float = 0.7) -> List[List[ProductView]]:
+        """Search several queries at once, sharing the embedding call and index passes.
+        
+        Args:
+            queries: The search queries in natural language
+            top_k: Number of results to return per query
+            filters: Optional filters applied to every query
+            search_type: Type of search to perform ("semantic", "keyword", or "hybrid")
+            semantic_weight: Weight for semantic search results in hybrid search (0.0-1.0)
+            
+        Returns:
+            One list of matching products per query, in the order of the queries
+        """
+        if not self.initialized:
+            self.initialize()
+        self._sync_generation()
+        
+        if not queries:
+            return []
+        
+        # Serve what we can from the cache and only search the misses
+        generation = self.generation
+        cache_keys = [SearchCache.make_key(q, top_k, filters, search_type, semantic_weight) for q in queries]
+        batch_candidates = [self.search_cache.get(key, generation) for key in cache_keys]
+        missing = [i for i, candidates in enumerate(batch_candidates) if candidates is None]
+        
+        try:
+            for effective_type, group in self._group_by_search_type(queries, missing, search_type).items():
+                group_queries = [queries[i] for i in group]
+                query_matrix = None
+                if effective_type == "semantic" or effective_type == "hybrid":
+                    query_matrix = self._embed_queries(group_queries)
                 
-                # Add semantic results with weight
-                for product in semantic_results:
-                    product_id = product["product_id"]
-                    combined_results[product_id] = {
-                        **product,
-                        "similarity": product["similarity"] * semantic_weight
-                    }
+                scored = self._score_batch(group_queries, query_matrix, top_k, effective_type, semantic_weight)
+                for i, candidates in zip(group, scored):
+                    batch_candidates[i] = candidates
+                    self.search_cache.put(cache_keys[i], generation, candidates)
+            
+        except Exception as e:
+            logger.error(f"Error batch searching products: {str(e)}")
+            batch_candidates = [candidates or [] for candidates in batch_candidates]
+        
+        return self._finalize_results(batch_candidates, filters, top_k)
+    
+    def _score_batch(self, queries: List[str], query_matrix: Optional[np.ndarray], top_k: int,
+                     search_type: str, semantic_weight: float) -> List[List[ProductView]]:
+        """CPU-bound part of a batch search, given the already embedded queries."""
+        semantic_batch = [[] for _ in queries]
+        keyword_batch = [[] for _ in queries]
+        fetch = top_k*HYBRID_CANDIDATE_FACTOR if search_type == "hybrid" else top_k
+        
+        if query_matrix is not None:
+            semantic_batch = self._vector_search(query_matrix, top_k=fetch)
+        
+        if search_type == "keyword" or search_type == "hybrid":
+            keyword_batch = self._keyword_search_many(queries, top_k=fetch)
+        
+        return [
+            self._fuse_results(semantic_results, keyword_results, search_type, semantic_weight)
+            for semantic_results, keyword_results in zip(semantic_batch, keyword_batch)
+        ]
+    
+    async def _run_in_executor(self, func: Callable, *args):
+        """Run blocking work on the search executor without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.search_executor, functools.partial(func, *args))
+    
+    def _ensure_current(self):
+        """Initialize on first use and pick up newly published generations."""
+        if not self.initialized:
+            self.initialize()
+        self._sync_generation()
+    
+    async def _aembed_query(self, query: str) -> np.ndarray:
+        """Embed one query through the embedder's async API."""
+        query_vector = np.array([await self.embeddings.aembed_query(query)], dtype="float32")
+        return normalize(query_vector) if self.cosine_scores else query_vector
+    
+    async def _aembed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed several queries with a single async embedding API call."""
+        try:
+            vectors = await self.embeddings.aembed_documents(queries, task_type="retrieval_query")
+        except TypeError:
+            # Embedders without task types embed queries and documents the same way
+            vectors = await self.embeddings.aembed_documents(queries)
+        matrix = np.array(vectors, dtype="float32")
+        return normalize(matrix) if self.cosine_scores else matrix
+    
+    async def asearch(self, query: str, top_k: int = 5, filters: Optional[Dict[str, Any]] = None,
+                      search_type: str = "hybrid", semantic_weight: float = 0.7) -> List[ProductView]:
+        """Async variant of search() for callers running on an event loop.
+        
+        The embedding request is awaited through the embedder's async API and the
+        index passes and live-value lookup run on the search executor, so neither
+        a slow embedding call nor a large scoring pass holds up other sessions.
+        """
+        await self._run_in_executor(self._ensure_current)
+        
+        generation = self.generation
+        cache_key = SearchCache.make_key(query, top_k, filters, search_type, semantic_weight)
+        candidates = self.search_cache.get(cache_key, generation)
+        
+        if candidates is None:
+            try:
+                effective_type = self._effective_search_type(query, search_type)
+                query_matrix = None
+                if effective_type == "semantic" or effective_type == "hybrid":
+                    query_matrix = await self._aembed_query(query)
                 
-                # Add or update with keyword results
-                for product in keyword_results:
-                    product_id = product["product_id"]
-                    if product_id in combined_results:
-                        # Update existing entry
-                        combined_results[product_id]["similarity"] += product["similarity"] * (1 - semantic_weight)
-                    else:
-                        # Add new entry
-                        combined_results[product_id] = {
-                            **product,
-                            "similarity": product["similarity"] * (1 - semantic_weight)
-                        }
+                candidates = (await self._run_in_executor(
+                    self._score_batch, [query], query_matrix, top_k, effective_type, semantic_weight))[0]
+            except Exception as e:
+                logger.error(f"Error searching products: {str(e)}")
+                return []
+            
+            self.search_cache.put(cache_key, generation, candidates)
+        
+        return (await self._run_in_executor(self._finalize_results, [candidates], filters, top_k))[0]
+    
+    async def asearch_many(self, queries: List[str], top_k: int = 5, filters: Optional[Dict[str, Any]] = None,
+                           search_type: str = "hybrid", semantic_weight: float = 0.7) -> List[List[ProductView]]:
+        """Async variant of search_many()."""
+        await self._run_in_executor(self._ensure_current)
+        
+        if not queries:
+            return []
+        
+        generation = self.generation
+        cache_keys = [SearchCache.make_key(q, top_k, filters, search_type, semantic_weight) for q in queries]
+        batch_candidates = [self.search_cache.get(key, generation) for key in cache_keys]
+        missing = [i for i, candidates in enumerate(batch_candidates) if candidates is None]
+        
+        try:
+            for effective_type, group in self._group_by_search_type(queries, missing, search_type).items():
+                group_queries = [queries[i] for i in group]
+                query_matrix = None
+                if effective_type == "semantic" or effective_type == "hybrid":
+                    query_matrix = await self._aembed_queries(group_queries)
                 
-                # Convert back to list and sort by similarity
-                results = list(combined_results.values())
+                scored = await self._run_in_executor(
+                    self._score_batch, group_queries, query_matrix, top_k, effective_type, semantic_weight)
+                for i, candidates in zip(group, scored):
+                    batch_candidates[i] = candidates
+                    self.search_cache.put(cache_keys[i], generation, candidates)
             
-            # Sort by similarity score
-            results = sorted(results, key=lambda x: x["similarity"], reverse=True)
+        except Exception as e:
+            logger.error(f"Error batch searching products: {str(e)}")
+            batch_candidates = [candidates or [] for candidates in batch_candidates]
+        
+        return await self._run_in_executor(self._finalize_results, batch_candidates, filters, top_k)
+    
+    def _fuse_results(self, semantic_results: List[ProductView], keyword_results: List[ProductView],
+                      search_type: str, semantic_weight: float) -> List[ProductView]:
+        """Fuse and sort the candidate lists of one query.
+        
+        The output depends only on the indexed content, so it can be cached for
+        the whole index generation; price and stock are applied afterwards.
+        """
+        if search_type == "semantic":
+            results = semantic_results
+        elif search_type == "keyword":
+            results = keyword_results
+        else:
+            # Weighted score per row
+            combined_scores = {}
+            
+            # Add semantic results with weight
+            for product in semantic_results:
+                combined_scores[product.row] = product.similarity * semantic_weight
+            
+            # Add or update with keyword results
+            for product in keyword_results:
+                combined_scores[product.row] = (combined_scores.get(product.row, 0.0)
+                                                 + product.similarity * (1 - semantic_weight))
+            
+            results = [self.store.view(row, score) for row, score in combined_scores.items()]
+        
+        # Sort by similarity score
+        return sorted(results, key=lambda x: x.similarity, reverse=True)
+    
+    def _finalize_results(self, batch_candidates: List[List[ProductView]], filters: Optional[Dict[str, Any]],
+                          top_k: int) -> List[List[ProductView]]:
+        """Overlay live price and stock, apply filters and truncate, for a whole batch at once."""
+        live = self._live_values({product["product_id"] for candidates in batch_candidates for product in candidates})
+        
+        batch_results = []
+        for candidates in batch_candidates:
+            results = self._overlay_live_values(candidates, live)
             
-            # Apply filters
+            # Apply filters against the live values
             if filters:
                 results = self._apply_filters(results, filters)
             
             # Return top-k results
-            return results[:top_k]
-            
+            batch_results.append(results[:top_k])
+        return batch_results
+    
+    def _live_values(self, product_ids) -> Optional[Dict[int, Dict[str, Any]]]:
+        """Current price and stock of the given products, read with bulk IN (...) queries.
+        
+        Returns None if the database cannot be read, in which case callers keep
+        the values captured when the index was built.
+        """
+        product_ids = list(product_ids)
+        if not product_ids:
+            return {}
+        
+        try:
+            conn = self._get_connection()
         except Exception as e:
-            logger.error(f"Error searching products: {str(e)}")
-            return []
+            logger.error(f"Error reading live product values: {str(e)}")
+            return None
+        
+        cursor = conn.cursor()
+        try:
+            live = {}
+            # Stay below SQLite's limit on bound parameters
+            for start in range(0, len(product_ids), LIVE_VALUES_CHUNK):
+                chunk = product_ids[start:start + LIVE_VALUES_CHUNK]
+                cursor.execute(
+                    f"SELECT product_id, price, stock_quantity FROM products "
+                    f"WHERE product_id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                for product_id, price, stock_quantity in cursor.fetchall():
+                    live[product_id] = {"price": price, "stock_quantity": stock_quantity}
+            return live
+        except Exception as e:
+            logger.error(f"Error reading live product values: {str(e)}")
+            return None
+        finally:
+            cursor.close()
+            conn.close()
+    
+    @staticmethod
+    def _overlay_live_values(products: List[ProductView],
+                             live: Optional[Dict[int, Dict[str, Any]]]) -> List[ProductView]:
+        """Attach live values to product views, dropping products no longer in the database."""
+        if live is None:
+            return list(products)
+        return [
+            product.with_live(live[product["product_id"]])
+            for product in products
+            if product["product_id"] in live
+        ]
+    
+    def _with_live_values(self, products: List[ProductView]) -> List[ProductView]:
+        """Overlay live price and stock on a list of product views with one query."""
+        return self._overlay_live_values(products, self._live_values({p["product_id"] for p in products}))
+    
+    def _live_columns(self) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Store rows of every product still in the database, with current price and stock.
+        
+        One full-table query; returns None if the database cannot be read.
+        """
+        try:
+            conn = self._get_connection()
+        except Exception as e:
+            logger.error(f"Error reading live product values: {str(e)}")
+            return None
+        
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT product_id, price, stock_quantity FROM products")
+            table = cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Error reading live product values: {str(e)}")
+            return None
+        finally:
+            cursor.close()
+            conn.close()
+        
+        if not table:
+            return np.empty(0, dtype="int64"), np.empty(0, dtype="float64"), np.empty(0, dtype="float64")
+        product_ids, prices, stock = (np.asarray(column, dtype="float64") for column in zip(*table))
+        rows = self.store.rows_of(product_ids.astype("int64"))
+        known = rows >= 0
+        return rows[known], prices[known], stock[known]
+    
+    def _count_facets(self, store: ProductStore, rows: np.ndarray, prices: np.ndarray) -> Dict[str, Any]:
+        """Counts per category, material and price range of the given rows."""
+        bounds = [upper for _, _, upper in PRICE_BUCKETS if upper is not None]
+        buckets = np.bincount(np.searchsorted(bounds, prices, side="right"), minlength=len(PRICE_BUCKETS))
+        return {
+            "total": len(rows),
+            "category": store.value_counts("category", rows),
+            "material": store.value_counts("material", rows),
+            "price": {label: int(count) for (label, _, _), count in zip(PRICE_BUCKETS, buckets) if count},
+        }
+    
+    def facet_counts(self, products: List[ProductView]) -> Dict[str, Any]:
+        """Count the given products per category, material and price range.
+        
+        Category and material counts come from the store's dictionary-encoded
+        columns, so they are bincounts over the matched rows; price ranges use
+        the (live) prices carried by the views.
+        """
+        store = products[0].store if products else self.store
+        rows = np.fromiter((product.row for product in products), dtype="int64", count=len(products))
+        prices = np.fromiter((product["price"] for product in products), dtype="float64", count=len(products))
+        return self._count_facets(store, rows, prices)
+    
+    def _query_rows(self, query: str) -> np.ndarray:
+        """Store rows matching a query's words, the candidates Database.search_products restricts to.
+        
+        Fuzzy matches scoring at least FUZZY_MIN_SCORE, or without any, rows
+        whose name or description contains the query like SQL's LIKE '%query%'
+        (case-insensitive for ASCII letters only).
+        """
+        matches = self.fuzzy_index.search(query, FUZZY_MAX_CANDIDATES)
+        rows = [row for row, score in matches if score >= FUZZY_MIN_SCORE]
+        if rows:
+            return np.asarray(rows, dtype="int64")
+        
+        needle = query.translate(_ASCII_LOWER)
+        names, descriptions = self.store.strings["name"], self.store.strings["description"]
+        return np.asarray([
+            row for row in range(len(self.store))
+            if needle in (names[row] or "").translate(_ASCII_LOWER)
+            or needle in (descriptions[row] or "").translate(_ASCII_LOWER)
+        ], dtype="int64")
+    
+    def matching_facet_counts(self, query: Optional[str] = None,
+                              filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Count the products matching the query and filters per category, material and price range.
+        
+        The matching set is the one Database.get_product_facets counts: the
+        query's keyword candidates (see _query_rows) that pass the filters. The
+        filters are evaluated as a mask over the store's columns, with current
+        price and stock read from the database (the stored values if it cannot
+        be read).
+        """
+        self._ensure_current()
+        store = self.store
+        live = self._live_columns()
+        if live is None:
+            rows = np.arange(len(store))
+            prices = store.numbers["price"].astype("float64")
+            stock = store.numbers["stock_quantity"].astype("float64")
+        else:
+            rows, prices, stock = live
+        
+        mask = np.isin(rows, self._query_rows(query)) if query else np.ones(len(rows), dtype=bool)
+        for key, value in (filters or {}).items():
+            if key == "min_price":
+                mask &= prices >= value
+            elif key == "max_price":
+                mask &= prices <= value
+            elif key == "min_stock":
+                mask &= stock >= value
+            elif key in store.strings:
+                column = store.strings[key]
+                mask &= column.codes[rows] == column.code_of(value)
+            elif key in store.numbers:
+                mask &= store.numbers[key][rows] == value
+        return self._count_facets(store, rows[mask], prices[mask])
+    
+    def search_with_facets(self, query: str, top_k: int = 5, filters: Optional[Dict[str, Any]] = None,
+                           search_type: str = "hybrid",
+                           semantic_weight: float = 0.7) -> Tuple[List[ProductView], Dict[str, Any]]:
+        """Search, and count facets over the products matching the query's words and the filters.
+        
+        Semantic search ranks the whole catalog, so the facets use the same
+        keyword matching set as the SQL search_products facets. A descriptive
+        query that names no product can therefore report fewer matches (even
+        none) than the ``top_k`` results returned.
+        """
+        matches = self.search(query, top_k=top_k, filters=filters,
+                              search_type=search_type, semantic_weight=semantic_weight)
+        return matches, self.matching_facet_counts(query, filters)
+    
+    async def asearch_with_facets(self, query: str, top_k: int = 5, filters: Optional[Dict[str, Any]] = None,
+                                  search_type: str = "hybrid",
+                                  semantic_weight: float = 0.7) -> Tuple[List[ProductView], Dict[str, Any]]:
+        """Async variant of search_with_facets()."""
+        matches = await self.asearch(query, top_k=top_k, filters=filters,
+                                     search_type=search_type, semantic_weight=semantic_weight)
+        return matches, await self._run_in_executor(self.matching_facet_counts, query, filters)
     
-    def get_product_by_id(self, product_id: int) -> Optional[Dict[str, Any]]:
-        """Get a product by its ID."""
+    def get_product_by_id(self, product_id: int) -> Optional[ProductView]:
+        """Get a product by its ID, with live price and stock."""
         if not self.initialized:
             self.initialize()
+        self._sync_generation()
         
-        for product in self.product_data:
-            if product["product_id"] == product_id:
-                return product
-        
-        return None
+        row = self.store.row_of(product_id)
+        if row is None:
+            return None
+        products = self._with_live_values([self.store.view(row)])
+        return products[0] if products else None
     
-    def get_similar_products(self, product_id: int, top_k: int = 5) -> List[Dict[str, Any]]:
+    def get_similar_products(self, product_id: int, top_k: int = 5) -> List[ProductView]:
         """Get products similar to the given product ID."""
         if not self.initialized:
             self.initialize()
+        self._sync_generation()
             
-        product = self.get_product_by_id(product_id)
-        if not product:
+        row = self.store.row_of(product_id)
+        if row is None:
             return []
+        
+        # Serve from the precomputed neighbor table when it is deep enough
+        if self.neighbors is not None and top_k <= self.neighbors.k:
+            return self._with_live_values(
+                [self.store.view(neighbor, score) for neighbor, score in self.neighbors.lookup(row, top_k)])
+        
+        product = self.store.view(row)
             
         # Use product name and description as query
         query = f"{product['name']} {product['description']}"
@@ -417,11 +980,84 @@ Từ khóa: {product['tags']}"""
         results = self.search(query, top_k=top_k+1)
         return [p for p in results if p["product_id"] != product_id][:top_k]
     
+    async def aget_similar_products(self, product_id: int, top_k: int = 5) -> List[ProductView]:
+        """Async variant of get_similar_products()."""
+        await self._run_in_executor(self._ensure_current)
+        
+        row = self.store.row_of(product_id)
+        if row is None:
+            return []
+        
+        # Neighbor table lookups are cheap; only the live-value query leaves the event loop
+        if self.neighbors is not None and top_k <= self.neighbors.k:
+            neighbors = [self.store.view(neighbor, score) for neighbor, score in self.neighbors.lookup(row, top_k)]
+            return await self._run_in_executor(self._with_live_values, neighbors)
+        
+        product = self.store.view(row)
+        query = f"{product['name']} {product['description']}"
+        results = await self.asearch(query, top_k=top_k+1)
+        return [p for p in results if p["product_id"] != product_id][:top_k]
+    
     def refresh_data(self):
         """Refresh data from database and rebuild indices."""
         logger.info("Refreshing RAG data from database...")
         self.initialize(force_reload=True)
         logger.info("RAG data refreshed successfully")
+    
+    def refresh_products(self, product_ids: List[int]):
+        """Re-embed only the given products and patch the indices in place.
+        
+        Updated products keep their row, new products are appended. Deleted
+        products still need a full refresh_data().
+        """
+        if not self.initialized:
+            self.initialize()
+        
+        products = self._extract_products(product_ids)
+        if not products:
+            return
+        
+        with self.snapshots.build_lock():
+            # Patch the newest generation, which another process may have published
+            latest = self.snapshots.current_generation()
+            if latest is not None and latest != self.generation:
+                self._attach(latest)
+            
+            logger.info(f"Refreshing {len(products)} products...")
+            records = self.store.records()
+            rows = []
+            for product in products:
+                row = self.store.row_of(product["product_id"])
+                if row is None:
+                    row = len(records)
+                    records.append(product)
+                else:
+                    records[row] = product
+                rows.append(row)
+            store = ProductStore(records)
+            
+            # Only the changed products go through the embedding API
+            vectors = np.zeros((len(store), self.vectors.shape[1]), dtype="float32")
+            vectors[:len(self.vectors)] = self.vectors
+            vectors[rows] = self._embed_texts([self._product_text(store.view(row)) for row in rows])
+            
+            index = build_index(vectors, VECTOR_INDEX_TYPE)
+            neighbors = NeighborTable(self.neighbors.ids, self.neighbors.scores)
+            neighbors.update(index, vectors, rows)
+            tfidf_vectorizer, tfidf_matrix = self._setup_tfidf(
+                [self._product_text(store.view(row)) for row in range(len(store))])
+            
+            # Searches keep using the attached generation until everything is swapped at once
+            (self.store, self.vectors, self.index, self.neighbors,
+             self.tfidf_vectorizer, self.tfidf_matrix) = (store, vectors, index, neighbors, tfidf_vectorizer, tfidf_matrix)
+            self._configure_index()
+            self._publish()
+        
+        logger.info("Products refreshed successfully")
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters of the search result cache."""
+        return self.search_cache.stats()
 
 # Function to get pre-initialized instance
 def get_product_rag():
@@ -429,9 +1065,22 @@ def get_product_rag():
     return ProductRAG.get_instance()
 
 if __name__ == "__main__":
-    # Set the DB_PATH explicitly for testing
-    os.environ["DB_PATH"] = os.path.join(os.getcwd(), "data", "handicraft.sqlite")
+    import argparse
+    
+    # Run this as the single index coordinator; API workers attach to what it publishes
+    parser = argparse.ArgumentParser(description="Build and publish product search index generations")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild every index from the database")
+    parser.add_argument("--products", type=int, nargs="+", help="Re-embed only these product IDs")
+    args = parser.parse_args()
+    
+    # Default to the bundled database
+    os.environ.setdefault("DB_PATH", os.path.join(os.getcwd(), "data", "handicraft.sqlite"))
     
     product_rag = ProductRAG.get_instance()
     product_rag.initialize()
+    if args.rebuild:
+        product_rag.refresh_data()
+    elif args.products:
+        product_rag.refresh_products(args.products)
+    print(f"Index generation {product_rag.generation} with {len(product_rag.store)} products")
     print(product_rag.search("Tìm sản phẩm làm quà tặng cho người nước ngoài"))
\ No newline at end of file
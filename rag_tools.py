@@ -1,28 +1,136 @@
-from typing import Optional, List, Dict, Any
-from langchain_core.tools import tool
+from typing import Optional, List, Dict, Any, Mapping, Sequence, Union
+from langchain_core.tools import StructuredTool, tool
 from langchain_core.runnables import RunnableConfig
+import asyncio
 import logging
+import os
 
-from rag_search import get_product_rag
+from constants import CATEGORIES, MATERIALS
+from tool_output import TOOL_OUTPUT_FORMAT, format_products, format_facets
+from query_router import route_product_query
+from tools import db
 
 logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger(__name__)
 
-@tool
-def semantic_product_search(
-    query: str,
+# Token budget of each tool's output; descriptions and then results are trimmed to fit
+SEARCH_TOKEN_BUDGET = int(os.getenv("SEARCH_TOKEN_BUDGET", "600"))
+MULTI_SEARCH_TOKEN_BUDGET = int(os.getenv("MULTI_SEARCH_TOKEN_BUDGET", "900"))
+SIMILAR_PRODUCTS_TOKEN_BUDGET = int(os.getenv("SIMILAR_PRODUCTS_TOKEN_BUDGET", "400"))
+
+def get_product_rag():
+    """Shared ProductRAG instance; rag_search (FAISS, sklearn, embeddings) is imported on first use."""
+    from rag_search import get_product_rag as _get_product_rag
+    return _get_product_rag()
+
+def _search_filters(
     category: Optional[str] = None,
     material: Optional[str] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
     min_stock: Optional[int] = None,
     top_k: int = 5
-) -> List[Dict[str, Any]]:
+) -> Dict[str, Any]:
+    """Validate the arguments shared by the search tools and collect the filters actually provided."""
+    if category and category not in CATEGORIES:
+        raise ValueError(f"Category must be one of: {', '.join(CATEGORIES)}")
+    if material and material not in MATERIALS:
+        raise ValueError(f"Material must be one of: {', '.join(MATERIALS)}")
+    if top_k < 1:
+        raise ValueError("top_k must be at least 1")
+    
+    filters = {}
+    if category:
+        filters["category"] = category
+    if material:
+        filters["material"] = material
+    if min_price is not None:
+        filters["min_price"] = min_price
+    if max_price is not None:
+        filters["max_price"] = max_price
+    if min_stock is not None:
+        filters["min_stock"] = min_stock
+    return filters
+
+def _format_search_output(
+    results: Sequence[Mapping[str, Any]],
+    fields: Optional[List[str]] = None,
+    facets: Optional[Dict[str, Any]] = None
+) -> Union[str, List[Dict[str, Any]], Dict[str, Any]]:
+    """Format search results, and optionally facet counts, for the LLM."""
+    products = format_products(results, fields, "relevance_score", SEARCH_TOKEN_BUDGET)
+    if facets is None:
+        return products
+    if TOOL_OUTPUT_FORMAT == "table":
+        return f"{products}\n\nFacets:\n{format_facets(facets)}"
+    return {"products": products, "facets": facets}
+
+def _structured_search(
+    query: str,
+    filters: Dict[str, Any],
+    top_k: int,
+    include_facets: bool = False,
+    fields: Optional[List[str]] = None
+) -> Optional[Union[str, List[Dict[str, Any]], Dict[str, Any]]]:
+    """Answer a filter-only or product-ID query from SQL, or None if it needs semantic search."""
+    route = route_product_query(query)
+    if route is None:
+        return None
+    
+    facets = None
+    if "product_id" in route:
+        product = db.get_product(route["product_id"])
+        products = [product] if product else []
+    else:
+        # Filters passed explicitly to the tool take precedence over the parsed ones
+        filters = {**route["filters"], **filters}
+        products = db.search_products(sort_by_price=route["sort_by_price"], limit=top_k, **filters)
+        if include_facets:
+            facets = db.get_product_facets(**filters)
+    
+    logger.info(f"Structured query answered from SQL: {route}")
+    return _format_search_output(products, fields, facets)
+
+def _format_similar_output(
+    products: Sequence[Mapping[str, Any]],
+    fields: Optional[List[str]] = None
+) -> Union[str, List[Dict[str, Any]]]:
+    """Format similar products compactly, within the tool's token budget."""
+    return format_products(products, fields, "similarity_score", SIMILAR_PRODUCTS_TOKEN_BUDGET)
+
+def _format_multi_search_output(
+    queries: List[str],
+    batch: List[Sequence[Mapping[str, Any]]],
+    fields: Optional[List[str]] = None
+) -> Union[str, Dict[str, Any]]:
+    """Format per-query results, sharing the token budget evenly between the queries."""
+    budget = MULTI_SEARCH_TOKEN_BUDGET // max(1, len(queries))
+    formatted = {
+        query: format_products(results, fields, "relevance_score", budget)
+        for query, results in zip(queries, batch)
+    }
+    if TOOL_OUTPUT_FORMAT == "table":
+        return "\n\n".join(f"## {query}\n{table}" for query, table in formatted.items())
+    return formatted
+
+def _semantic_product_search(
+    query: str,
+    category: Optional[str] = None,
+    material: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_stock: Optional[int] = None,
+    top_k: int = 5,
+    include_facets: bool = False,
+    fields: Optional[List[str]] = None
+) -> Union[str, List[Dict[str, Any]], Dict[str, Any]]:
     """
     Searches for products using semantic understanding of the query and product descriptions.
     
     Use this tool when the user is looking for products with specific features, cultural significance,
     crafting techniques, or other detailed attributes that might not be captured by simple keyword matching.
+    Queries that only name a category, material, price range or sort order (e.g. "giỏ mây dưới 300k,
+    rẻ nhất trước") or a product ID are answered directly from the catalog, sorted by price if asked.
     
     Examples:
     - "Tìm sản phẩm làm quà tặng cho người nước ngoài" (Find products suitable as gifts for foreigners)
@@ -37,46 +145,134 @@ def semantic_product_search(
         max_price: Maximum price in VND
         min_stock: Minimum stock quantity available
         top_k: Number of results to return (default: 5)
+        include_facets: Also count the products that match the query's words and pass the filters
+            per category, material and price range, the same counts search_products gives.
+            Use this when the user is browsing ("what materials do you have in Tranh under 300k?")
+            instead of searching again with different filters.
+        fields: Optional product fields to return, among: product_id, name, category, material, price,
+            stock_quantity, origin_location, description. Ask only for what the answer needs
+            (e.g., ["name", "price"] to compare prices); default: all.
         
     Returns:
-        A list of matching products with their details and relevance scores
+        A table of matching products with the requested fields and relevance scores,
+        followed by the facet counts with include_facets
     """
     logger.info(f"Semantic product search: {query}")
     
     # Prepare filters
-    filters = {}
-    if category:
-        filters["category"] = category
-    if material:
-        filters["material"] = material
-    if min_price is not None:
-        filters["min_price"] = min_price
-    if max_price is not None:
-        filters["max_price"] = max_price
-    if min_stock is not None:
-        filters["min_stock"] = min_stock
+    filters = _search_filters(category, material, min_price, max_price, min_stock, top_k)
+    
+    # Purely structural queries never need the embedding round trip
+    structured = _structured_search(query, filters, top_k, include_facets, fields)
+    if structured is not None:
+        return structured
     
     # Get RAG instance and search
     rag = get_product_rag()
     # Use hybrid search for better results
+    if include_facets:
+        results, facets = rag.search_with_facets(query, top_k=top_k, filters=filters, search_type="hybrid")
+        return _format_search_output(results, fields, facets)
     results = rag.search(query, top_k=top_k, filters=filters, search_type="hybrid")
     
-    # Format results for better readability
-    formatted_results = []
-    for product in results:
-        formatted_results.append({
-            "product_id": product["product_id"],
-            "name": product["name"],
-            "category": product["category"],
-            "material": product["material"],
-            "price": product["price"],
-            "stock_quantity": product["stock_quantity"],
-            "origin_location": product["origin_location"],
-            "relevance_score": f"{product['similarity']:.2f}",
-            "description_preview": product["content"].split('\n\n')[5].replace('Mô tả: ', '')[:100] + '...' if len(product["content"].split('\n\n')) > 5 else ""
-        })
-    
-    return formatted_results
+    # Format results compactly, within the tool's token budget
+    return _format_search_output(results, fields)
+
+async def _asemantic_product_search(
+    query: str,
+    category: Optional[str] = None,
+    material: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_stock: Optional[int] = None,
+    top_k: int = 5,
+    include_facets: bool = False,
+    fields: Optional[List[str]] = None
+) -> Union[str, List[Dict[str, Any]], Dict[str, Any]]:
+    """Async implementation of semantic_product_search, used when the graph runs asynchronously."""
+    logger.info(f"Semantic product search (async): {query}")
+    filters = _search_filters(category, material, min_price, max_price, min_stock, top_k)
+    structured = await asyncio.to_thread(_structured_search, query, filters, top_k, include_facets, fields)
+    if structured is not None:
+        return structured
+    rag = get_product_rag()
+    if include_facets:
+        results, facets = await rag.asearch_with_facets(query, top_k=top_k, filters=filters, search_type="hybrid")
+        return _format_search_output(results, fields, facets)
+    results = await rag.asearch(query, top_k=top_k, filters=filters, search_type="hybrid")
+    return _format_search_output(results, fields)
+
+semantic_product_search = StructuredTool.from_function(
+    func=_semantic_product_search,
+    coroutine=_asemantic_product_search,
+    name="semantic_product_search",
+)
+
+def _multi_product_search(
+    queries: List[str],
+    category: Optional[str] = None,
+    material: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_stock: Optional[int] = None,
+    top_k: int = 3,
+    fields: Optional[List[str]] = None
+) -> Union[str, Dict[str, Any]]:
+    """
+    Searches for several product ideas at once, returning results for each query.
+    
+    Use this tool instead of calling semantic_product_search several times when the user
+    wants to explore multiple ideas in one request. The same filters apply to every query.
+    
+    Examples:
+    - ["quà tặng cho người nước ngoài", "đồ trang trí bằng tre", "tượng gỗ"]
+    - ["nón lá", "giỏ mây đựng đồ"]
+    
+    Args:
+        queries: The natural language queries to search for
+        category: Optional category filter (e.g., "Nón", "Giỏ", "Tranh")
+        material: Optional material filter (e.g., "Tre", "Gỗ", "Mây")
+        min_price: Minimum price in VND
+        max_price: Maximum price in VND
+        min_stock: Minimum stock quantity available
+        top_k: Number of results to return per query (default: 3)
+        fields: Optional product fields to return, among: product_id, name, category, material, price,
+            stock_quantity, origin_location, description. Ask only for what the answer needs
+            (e.g., ["name", "price"] to compare prices); default: all.
+        
+    Returns:
+        One table of matching products per query, each headed by the query
+    """
+    logger.info(f"Multi product search: {queries}")
+    
+    filters = _search_filters(category, material, min_price, max_price, min_stock, top_k)
+    
+    rag = get_product_rag()
+    batch = rag.search_many(queries, top_k=top_k, filters=filters, search_type="hybrid")
+    
+    return _format_multi_search_output(queries, batch, fields)
+
+async def _amulti_product_search(
+    queries: List[str],
+    category: Optional[str] = None,
+    material: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_stock: Optional[int] = None,
+    top_k: int = 3,
+    fields: Optional[List[str]] = None
+) -> Union[str, Dict[str, Any]]:
+    """Async implementation of multi_product_search."""
+    logger.info(f"Multi product search (async): {queries}")
+    filters = _search_filters(category, material, min_price, max_price, min_stock, top_k)
+    batch = await get_product_rag().asearch_many(queries, top_k=top_k, filters=filters, search_type="hybrid")
+    return _format_multi_search_output(queries, batch, fields)
+
+multi_product_search = StructuredTool.from_function(
+    func=_multi_product_search,
+    coroutine=_amulti_product_search,
+    name="multi_product_search",
+)
 
 @tool
 def get_product_cultural_context(product_id: int) -> Dict[str, Any]:
@@ -117,8 +313,11 @@ def get_product_cultural_context(product_id: int) -> Dict[str, Any]:
         "care_instructions": product["care_instructions"]
     }
 
-@tool
-def get_similar_products(product_id: int, top_k: int = 3) -> List[Dict[str, Any]]:
+def _get_similar_products(
+    product_id: int,
+    top_k: int = 3,
+    fields: Optional[List[str]] = None
+) -> Union[str, List[Dict[str, Any]]]:
     """
     Finds products similar to the specified product.
     
@@ -132,31 +331,29 @@ def get_similar_products(product_id: int, top_k: int = 3) -> List[Dict[str, Any]
     Args:
         product_id: The ID of the reference product
         top_k: Number of similar products to return (default: 3)
+        fields: Optional product fields to return, among: product_id, name, category, material, price,
+            stock_quantity, origin_location, description. Ask only for what the answer needs
+            (e.g., ["name", "price"] to compare prices); default: all.
         
     Returns:
-        A list of similar products with their details
+        A table of similar products with the requested fields and similarity scores
     """
     logger.info(f"Finding similar products to ID: {product_id}")
-    
-    # Get RAG instance
-    rag = get_product_rag()
-    
-    # Get similar products
-    similar_products = rag.get_similar_products(product_id, top_k=top_k)
-    
-    # Format results
-    formatted_results = []
-    for product in similar_products:
-        formatted_results.append({
-            "product_id": product["product_id"],
-            "name": product["name"],
-            "category": product["category"],
-            "material": product["material"],
-            "price": product["price"],
-            "stock_quantity": product["stock_quantity"],
-            "origin_location": product["origin_location"],
-            "similarity_score": f"{product['similarity']:.2f}",
-            "description_preview": product["content"].split('\n\n')[5].replace('Mô tả: ', '')[:100] + '...' if len(product["content"].split('\n\n')) > 5 else ""
-        })
-    
-    return formatted_results
+    similar_products = get_product_rag().get_similar_products(product_id, top_k=top_k)
+    return _format_similar_output(similar_products, fields)
+
+async def _aget_similar_products(
+    product_id: int,
+    top_k: int = 3,
+    fields: Optional[List[str]] = None
+) -> Union[str, List[Dict[str, Any]]]:
+    """Async implementation of get_similar_products."""
+    logger.info(f"Finding similar products to ID (async): {product_id}")
+    similar_products = await get_product_rag().aget_similar_products(product_id, top_k=top_k)
+    return _format_similar_output(similar_products, fields)
+
+get_similar_products = StructuredTool.from_function(
+    func=_get_similar_products,
+    coroutine=_aget_similar_products,
+    name="get_similar_products",
+)
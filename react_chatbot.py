@@ -1,22 +1,147 @@
 from typing import Annotated, Dict, Any, List, Optional
 from typing_extensions import TypedDict
 from datetime import datetime
+import asyncio
 import os
+import re
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
 from langgraph.graph import END, StateGraph, START
-from langgraph.prebuilt import tools_condition
 from langgraph.checkpoint.memory import MemorySaver
-from langchain_core.messages import ToolMessage, AIMessage
-from langchain_core.runnables import RunnableConfig
+from langchain_core.messages import ToolMessage, AIMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain_core.prompts import ChatPromptTemplate
 from langgraph.graph.message import add_messages, AnyMessage
 import logging
 
-from agent import getLLm, safe_tools, sensitive_tools
+from agent import get_shared_llm, get_tool_llm, safe_tools, sensitive_tools
 from constants import CATEGORIES, MATERIALS
 from utils import create_tool_node_with_fallback, debug_log, log_state
+from tool_executor import next_tool_node, pending_tool_calls
+from tool_cache import tool_cache
+from intent_router import answer_intent, route_intent
+from tools import db
+from fuzzy_index import fold_diacritics
+from suggestions import suggest_selections
+
+SENSITIVE_TOOL_NAMES = frozenset(t.name for t in sensitive_tools)
+
+# Prompts are parsed once per process and shared by every session
+CATEGORIES_STR = ", ".join([f"'{cat}'" for cat in CATEGORIES])
+MATERIALS_STR = ", ".join([f"'{mat}'" for mat in MATERIALS])
+
+THINKING_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are analyzing a customer's request for a Vietnamese handicraft store. "
+     "Think step by step about what the customer wants and how to help them best.\n"
+     f"Store categories: {CATEGORIES_STR}\n"
+     f"Store materials: {MATERIALS_STR}\n"
+     "Tools available: "
+        f"{', '.join([tool.name for tool in safe_tools + sensitive_tools])}\n\n"
+     "Customer info: {user_info}\n\n"
+     "THINKING PROCESS:\n"
+     "1. What is the customer asking for?\n"
+     "2. What information do I need to gather? (vague question should collect more data instead of calling tool - like product recommend)\n"
+     "3. What tools might I need to use?\n"
+     "4. What would be the most helpful response?\n"
+     "5. Are there any sales opportunities?\n\n"
+     "Respond with your thinking process in Vietnamese, be concise but thorough. Dont use markdown formatting.\n"
+    ),
+    ("human", "Customer request: {user_message}")
+])
+
+ACTION_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are a friendly customer support assistant for a Vietnamese handicraft store. "
+     "Respond in Vietnamese if the user speaks Vietnamese, otherwise use English. "
+     f"Store categories: {CATEGORIES_STR}. "
+     f"Store materials: {MATERIALS_STR}. "
+     "\n\nYou have already thought about the customer's request: {thinking}"
+     "\n\nNow take ACTION based on your thinking:"
+     "\n- Use tools when necessary (view cart, add to cart, etc.)"
+     "\n- Provide helpful information"
+     "\n- Suggest products when appropriate"
+     "\n- Keep responses helpful and concise"
+     "\nCustomer info: {user_info}"
+     "\nCurrent time: {time}"
+    ),
+    ("placeholder", "{messages}")
+])
+
+# Action prompt when no separate analysis ran: the model reasons and acts in one call
+SINGLE_CALL_ACTION_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are a friendly customer support assistant for a Vietnamese handicraft store. "
+     "Respond in Vietnamese if the user speaks Vietnamese, otherwise use English. "
+     f"Store categories: {CATEGORIES_STR}. "
+     f"Store materials: {MATERIALS_STR}. "
+     "\n\nFirst think briefly about the customer's request: what they want, what information you need "
+     "(ask for more details on vague requests instead of calling tools), which tools might help and any "
+     "sales opportunity. Write this reasoning in Vietnamese between <thinking> and </thinking>, without markdown."
+     "\n\nThen take ACTION based on your thinking:"
+     "\n- Use tools when necessary (view cart, add to cart, etc.)"
+     "\n- Provide helpful information"
+     "\n- Suggest products when appropriate"
+     "\n- Keep responses helpful and concise"
+     "\nCustomer info: {user_info}"
+     "\nCurrent time: {time}"
+    ),
+    ("placeholder", "{messages}")
+])
+
+# Follow-up options for an answer, generated after the answer is returned
+SELECTION_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "Generate 2-3 helpful follow-up options for the user based on the conversation. "
+     "Format as short phrases (3-5 words). Use Vietnamese unless user speaks English. "
+     "Consider the thinking process: {thinking} "
+     "If possible, try to aim for sales, always try to sell the product. "
+     f"Categories: {CATEGORIES_STR}. Materials: {MATERIALS_STR}. "
+     "Return each option on a new line, no numbering or bullets."
+    ),
+    ("human", "Assistant response: {response}")
+])
 
 logger = logging.getLogger(__name__)
 
+# "two_call": analyze_request then action (two LLM round trips before any tool);
+# "single_call": action reasons and acts in one call;
+# "auto": analyze only requests that need planning, single call for the rest
+REACT_MODES = ("two_call", "single_call", "auto")
+REACT_MODE = os.getenv("REACT_MODE", "two_call").strip().lower()
+
+# Threads generating LLM follow-up options after the answer has been returned
+SELECTION_WORKERS = int(os.getenv("SELECTION_WORKERS", "4"))
+
+_selection_pool = ThreadPoolExecutor(max_workers=SELECTION_WORKERS, thread_name_prefix="selections")
+
+# Requests longer than this many words get a separate analysis in "auto" mode
+ANALYZE_MIN_WORDS = int(os.getenv("ANALYZE_MIN_WORDS", "12"))
+
+# Folded phrases marking open-ended requests that benefit from planning
+_PLANNING_CUES = re.compile(
+    r"\b(?:so sanh|tu van|goi y|de xuat|qua tang|lam qua|nen mua|nen chon|phu hop|sau do|roi|"
+    r"compare|recommend|suggest|gift|which one)\b"
+)
+_THINKING_RE = re.compile(r"<thinking>(.*?)</thinking>", re.DOTALL)
+
+def needs_analysis(message: str) -> bool:
+    """Whether a request is open-ended enough to deserve a separate planning call"""
+    text = fold_diacritics(message)
+    if len(text.split()) > ANALYZE_MIN_WORDS or text.count("?") > 1:
+        return True
+    return bool(_PLANNING_CUES.search(text))
+
+def split_thinking(content: Any) -> tuple:
+    """Inline <thinking> reasoning and the reply without it"""
+    if not isinstance(content, str):
+        return None, content
+    match = _THINKING_RE.search(content)
+    if not match:
+        return None, content
+    return match.group(1).strip(), (content[:match.start()] + content[match.end():]).strip()
+
 # Enhanced State that includes thinking
 class ReACTState(TypedDict):
     messages: Annotated[list[AnyMessage], add_messages]
@@ -27,35 +152,78 @@ class ReACTState(TypedDict):
     next_action: Optional[str]
 
 class ReACTChatBot:
-    def __init__(self, customer_id="CUST001"):
-        self.memory = MemorySaver()
-        self.llm = getLLm()
+    """Handle on one conversation with the shared ReACT graph.
+
+    The graph is compiled once per process with one checkpointer; a session
+    is only its thread_id and customer_id in the config, so creating one costs
+    next to nothing.
+    """
+
+    checkpointer = MemorySaver()
+    _graph = None
+    _graph_lock = threading.Lock()
+
+    def __init__(self, customer_id="CUST001", thread_id: Optional[str] = None):
+        # Clients are shared process-wide, so connections stay open across sessions
+        self.llm = get_shared_llm()
         self.config = {
             "configurable": {
                 "customer_id": customer_id,
-                "thread_id": f"thread_{customer_id}"
+                # Sessions of the same customer must not share a conversation
+                "thread_id": thread_id or f"thread_{customer_id}_{uuid.uuid4().hex}"
             }
         }
         
-        # Build category strings once
-        self.categories_str = ", ".join([f"'{cat}'" for cat in CATEGORIES])
-        self.materials_str = ", ".join([f"'{mat}'" for mat in MATERIALS])
+        self.categories_str = CATEGORIES_STR
+        self.materials_str = MATERIALS_STR
         
         # Get environment variables for features
         self.use_llm_selections = self._parse_bool_env("USE_LLM_SELECTIONS", False)
         debug_log(f"Using LLM for selection generation: {self.use_llm_selections}")
+        # LLM follow-up options for the latest answer, still being generated
+        self._selections_future: Optional[Future] = None
+        self.use_fast_path = self._parse_bool_env("USE_FAST_PATH", True)
+        debug_log(f"Answering fixed intents without the LLM: {self.use_fast_path}")
         
-        self.graph = self._build_graph()
+        self.graph = self.get_graph()
 
-    def _parse_bool_env(self, key: str, default: bool = False) -> bool:
+    @staticmethod
+    def _parse_bool_env(key: str, default: bool = False) -> bool:
         """Parse boolean environment variable safely"""
         value = os.getenv(key, str(default)).strip().lower()
         return value in ["1", "true", "yes", "on", "t"]
 
-    def _build_graph(self):
-        """Build the ReACT LangGraph with thinking step"""
+    @classmethod
+    def get_graph(cls):
+        """Compiled graph shared by every session, built on first use"""
+        if cls._graph is None:
+            with cls._graph_lock:
+                if cls._graph is None:
+                    cls._graph = cls._build_graph()
+        return cls._graph
+
+    def close(self):
+        """Drop this session's conversation from the shared checkpointer"""
+        self.checkpointer.delete_thread(self.config["configurable"]["thread_id"])
+
+    @classmethod
+    def _build_graph(cls, react_mode: Optional[str] = None, llm=None, tool_llm=None):
+        """Build the ReACT LangGraph with thinking step
+        
+        Nodes only use process-wide state; everything about the session comes
+        from the state and config they are called with. ``react_mode`` (one of
+        REACT_MODES, default REACT_MODE) decides when analyze_request runs;
+        ``llm`` and ``tool_llm`` default to the shared clients.
+        """
         debug_log("=== BUILDING ReACT GRAPH ===")
+        react_mode = react_mode or REACT_MODE
+        if react_mode not in REACT_MODES:
+            debug_log(f"Unknown REACT_MODE {react_mode}, using two_call", level="WARN")
+            react_mode = "two_call"
+        debug_log(f"ReACT mode: {react_mode}")
         builder = StateGraph(ReACTState)
+        llm = llm or get_shared_llm()
+        tool_llm = tool_llm or get_tool_llm()
 
         # 1. Initialize - Return static customer info
         def fetch_customer_info(state: ReACTState, config: RunnableConfig):
@@ -73,14 +241,30 @@ class ReACTChatBot:
                     "loyalty_points": 2500
                 }
                 debug_log("Static customer info created", user_info)
-                return {"user_info": user_info}
+                # Thinking belongs to one turn; clear the previous turn's
+                return {"user_info": user_info, "thinking": None}
             except Exception as e:
                 debug_log(f"Error creating customer info: {str(e)}", level="ERROR")
-                return {"user_info": {}}
+                return {"user_info": {}, "thinking": None}
+
+        def route_analysis(state: ReACTState):
+            """Run the separate analysis call, or let action reason inline"""
+            if react_mode == "two_call":
+                return "analyze_request"
+            if react_mode == "single_call":
+                return "action"
+            user_message = next(
+                (msg.content for msg in reversed(state["messages"]) if getattr(msg, "type", None) == "human"), ""
+            )
+            if isinstance(user_message, str) and needs_analysis(user_message):
+                debug_log("Complex request, analyzing before action")
+                return "analyze_request"
+            debug_log("Simple request, reasoning inline in action")
+            return "action"
 
         # 2. ANALYZE - Analyze the user's request and plan response
-        def analyze_request(state: ReACTState, config: RunnableConfig):
-            """ReACT Thinking step - analyze user request and plan response"""
+        def analysis_inputs(state: ReACTState) -> Optional[Dict[str, Any]]:
+            """Prompt inputs of the thinking step, or None without a user message"""
             debug_log("=== ANALYZE NODE ENTRY ===")
             
             # Get the last user message
@@ -92,79 +276,61 @@ class ReACTChatBot:
             
             if not user_message:
                 debug_log("No user message found for analysis")
+                return None
+            return {"user_message": user_message, "user_info": state.get("user_info", {})}
+
+        def analysis_update(result) -> Dict[str, Any]:
+            thinking_content = result.content
+            debug_log("Analysis process completed", {
+                "thinking_preview": thinking_content if thinking_content else "No thinking"
+            })
+            return {"thinking": thinking_content}
+
+        def analyze_request(state: ReACTState, config: RunnableConfig):
+            """ReACT Thinking step - analyze user request and plan response"""
+            inputs = analysis_inputs(state)
+            if inputs is None:
                 return {"thinking": "No user input to analyze"}
-            
-            thinking_prompt = ChatPromptTemplate.from_messages([
-                ("system",
-                 "You are analyzing a customer's request for a Vietnamese handicraft store. "
-                 "Think step by step about what the customer wants and how to help them best.\n"
-                 f"Store categories: {self.categories_str}\n"
-                 f"Store materials: {self.materials_str}\n"
-                 "Tools available: "
-                    f"{', '.join([tool.name for tool in safe_tools + sensitive_tools])}\n\n"
-                 "Customer info: {user_info}\n\n"
-                 "THINKING PROCESS:\n"
-                 "1. What is the customer asking for?\n"
-                 "2. What information do I need to gather? (vague question should collect more data instead of calling tool - like product recommend)\n"
-                 "3. What tools might I need to use?\n"
-                 "4. What would be the most helpful response?\n"
-                 "5. Are there any sales opportunities?\n\n"
-                 "Respond with your thinking process in Vietnamese, be concise but thorough. Dont use markdown formatting.\n"
-                ),
-                ("human", "Customer request: {user_message}")
-            ])
-            
             try:
-                chain = thinking_prompt | self.llm
-                result = chain.invoke({
-                    "user_message": user_message,
-                    "user_info": state.get("user_info", {})
-                })
-                
-                thinking_content = result.content
-                debug_log("Analysis process completed", {
-                    "thinking_preview": thinking_content if thinking_content else "No thinking"
-                })
-                
-                return {"thinking": thinking_content}
+                return analysis_update((THINKING_PROMPT | llm).invoke(inputs))
+            except Exception as e:
+                debug_log(f"Error in analysis: {str(e)}", level="ERROR")
+                return {"thinking": f"Lỗi trong quá trình suy nghĩ: {str(e)}"}
+
+        async def aanalyze_request(state: ReACTState, config: RunnableConfig):
+            """Async variant of analyze_request"""
+            inputs = analysis_inputs(state)
+            if inputs is None:
+                return {"thinking": "No user input to analyze"}
+            try:
+                return analysis_update(await (THINKING_PROMPT | llm).ainvoke(inputs))
             except Exception as e:
                 debug_log(f"Error in analysis: {str(e)}", level="ERROR")
                 return {"thinking": f"Lỗi trong quá trình suy nghĩ: {str(e)}"}
 
         # 3. ACTION - Main response generation based on thinking
-        def action(state: ReACTState, config: RunnableConfig):
-            """ReACT Action step - generate response based on thinking"""
+        def action_chain(state: ReACTState):
+            """Prompt chain and inputs of the action step"""
             debug_log("=== ACTION NODE ENTRY ===")
             log_state(state, "ACTION_INPUT")
             
-            action_prompt = ChatPromptTemplate.from_messages([
-                ("system",
-                 "You are a friendly customer support assistant for a Vietnamese handicraft store. "
-                 "Respond in Vietnamese if the user speaks Vietnamese, otherwise use English. "
-                 f"Store categories: {self.categories_str}. "
-                 f"Store materials: {self.materials_str}. "
-                 "\n\nYou have already thought about the customer's request: {thinking}"
-                 "\n\nNow take ACTION based on your thinking:"
-                 "\n- Use tools when necessary (view cart, add to cart, etc.)"
-                 "\n- Provide helpful information"
-                 "\n- Suggest products when appropriate"
-                 "\n- Keep responses helpful and concise"
-                 "\nCustomer info: {user_info}"
-                 "\nCurrent time: {time}"
-                ),
-                ("placeholder", "{messages}")
-            ]).partial(time=str(datetime.now()))
-            
-            debug_log("Binding tools to LLM for action")
-            
-            chain = action_prompt | self.llm.bind_tools(safe_tools + sensitive_tools)
+            # Without a prior analysis the model writes its reasoning inline
+            thinking = state.get("thinking")
+            chain = (ACTION_PROMPT if thinking else SINGLE_CALL_ACTION_PROMPT) | tool_llm
             debug_log("Invoking LLM chain for action")
-            
-            result = chain.invoke({
+            return chain, {
                 "messages": state["messages"],
-                "thinking": state.get("thinking", "Không có suy nghĩ trước đó"),
-                "user_info": state.get("user_info", {})
-            })
+                "thinking": thinking,
+                "user_info": state.get("user_info", {}),
+                "time": str(datetime.now())
+            }
+
+        def action_update(state: ReACTState, result) -> Dict[str, Any]:
+            update = {"messages": [result]}
+            if not state.get("thinking"):
+                inline_thinking, result.content = split_thinking(result.content)
+                if inline_thinking:
+                    update["thinking"] = inline_thinking
             
             debug_log("Action result received", {
                 "has_content": bool(result.content),
@@ -174,114 +340,73 @@ class ReACTChatBot:
             })
             
             debug_log("=== ACTION NODE EXIT ===")
-            return {"messages": [result]}
+            return update
 
-        # 4. Generate selections based on conversation context
+        def action(state: ReACTState, config: RunnableConfig):
+            """ReACT Action step - generate response based on thinking"""
+            chain, inputs = action_chain(state)
+            return action_update(state, chain.invoke(inputs))
+
+        async def aaction(state: ReACTState, config: RunnableConfig):
+            """Async variant of action"""
+            chain, inputs = action_chain(state)
+            return action_update(state, await chain.ainvoke(inputs))
+
+        # 4. Rule-based selections from the turn's tool results; LLM options are
+        # generated outside the graph, after the answer
         def generate_selections(state: ReACTState, config: RunnableConfig):
-            """Generate follow-up options based on the conversation"""
+            """Follow-up options without an LLM call, so the answer never waits for one"""
             debug_log("=== GENERATE SELECTIONS NODE ===")
-            
-            # Skip LLM selection generation if disabled
-            if not self.use_llm_selections:
-                debug_log("Using default selections (LLM selection generation disabled)")
-                return {"selections": self._default_selections()}
-            
-            if not state["messages"]:
-                debug_log("No messages found, using default selections")
-                return {"selections": self._default_selections()}
-            
-            # Get the last assistant message
-            last_assistant_msg = None
-            for msg in reversed(state["messages"]):
-                if isinstance(msg, AIMessage):
-                    last_assistant_msg = msg.content
-                    break
-            
-            if not last_assistant_msg:
-                debug_log("No assistant message found, using default selections")
-                return {"selections": self._default_selections()}
-
-            try:
-                debug_log("Generating selections using LLM")
-                selection_prompt = ChatPromptTemplate.from_messages([
-                    ("system",
-                     "Generate 2-4 helpful follow-up options for the user based on the conversation. "
-                     "Format as short phrases (3-5 words). Use Vietnamese unless user speaks English. "
-                     "Consider the thinking process: {thinking} "
-                     "If possible, try to aim for sales, always try to sell the product. "
-                     f"Categories: {self.categories_str}. Materials: {self.materials_str}. "
-                     "Return each option on a new line, no numbering or bullets."
-                    ),
-                    ("human", "Assistant response: {response}")
-                ])
-                
-                chain = selection_prompt | self.llm
-                result = chain.invoke({
-                    "response": last_assistant_msg,
-                    "thinking": state.get("thinking", "")
-                })
-                
-                debug_log("LLM selection result", {
-                    "content": result.content
-                })
-                
-                # Parse options
-                options = []
-                for line in result.content.split('\n'):
-                    line = line.strip()
-                    if line and not line.startswith(('Here', 'Option', 'Follow')):
-                        clean_option = line.strip('•-*"\'0123456789. ')
-                        if clean_option:
-                            options.append({"text": clean_option, "value": clean_option})
-                
-                debug_log(f"Generated {len(options)} options")
-                return {"selections": options if options else self._default_selections()}
-            except Exception as e:
-                debug_log(f"Error generating selections: {str(e)}", level="ERROR")
-                return {"selections": self._default_selections()}
+            selections = suggest_selections(state["messages"])
+            debug_log("Rule-based selections", selections)
+            return {"selections": selections or cls._default_selections()}
 
         # 5. Handle tool routing with enhanced debugging
         def route_tools(state: ReACTState):
-            """Route to appropriate tool node based on tool sensitivity"""
-            debug_log("=== ROUTING TOOLS ===")
+            """Route to appropriate tool node based on tool sensitivity
             
-            next_node = tools_condition(state)
-            if next_node == END:
-                debug_log("No tool call detected, routing to generate_selections")
-                return "generate_selections"
-            
-            if not state["messages"] or not hasattr(state["messages"][-1], "tool_calls"):
-                debug_log("No tool calls in last message, routing to generate_selections")
-                return "generate_selections"
+            Every pending call is considered, not just the first: safe calls run
+            first and only the sensitive ones wait for approval.
+            """
+            debug_log("=== ROUTING TOOLS ===")
             
-            ai_message = state["messages"][-1]
-            if not ai_message.tool_calls:
-                debug_log("Empty tool_calls list, routing to generate_selections")
+            next_node = next_tool_node(state["messages"], SENSITIVE_TOOL_NAMES)
+            if next_node is None:
+                debug_log("No pending tool calls, routing to generate_selections")
                 return "generate_selections"
             
-            first_tool_call = ai_message.tool_calls[0]
-            sensitive_tool_names = {t.name for t in sensitive_tools}
-            
-            tool_name = first_tool_call.get("name", "unknown")
-            
-            if tool_name in sensitive_tool_names:
-                debug_log(f"Routing sensitive tool: {tool_name} to sensitive_tools node")
+            debug_log(f"Routing pending tool calls to {next_node} node")
+            return next_node
+        
+        def route_after_safe_tools(state: ReACTState):
+            """Sensitive calls from the same step wait for approval; otherwise act on the results"""
+            next_node = next_tool_node(state["messages"], SENSITIVE_TOOL_NAMES)
+            if next_node == "sensitive_tools":
+                debug_log("Sensitive tool calls pending after safe tools, awaiting approval")
                 return "sensitive_tools"
-            
-            debug_log(f"Routing safe tool: {tool_name} to safe_tools node")
-            return "safe_tools"
+            return "action"
 
         # Add all nodes
         builder.add_node("fetch_user_info", fetch_customer_info)
-        builder.add_node("analyze_request", analyze_request)  # NEW: Analysis step
-        builder.add_node("action", action)                    # Renamed from "assistant"
-        builder.add_node("safe_tools", create_tool_node_with_fallback(safe_tools))
-        builder.add_node("sensitive_tools", create_tool_node_with_fallback(sensitive_tools))
+        # LLM steps await the model when the graph runs through astream/ainvoke
+        builder.add_node("analyze_request", RunnableLambda(analyze_request, afunc=aanalyze_request))
+        builder.add_node("action", RunnableLambda(action, afunc=aaction))
+        # Safe tools run concurrently, reuse cached results and also answer calls
+        # to unknown tools; sensitive tools run in the order the LLM asked for
+        # them and drop the customer's cached cart and orders
+        builder.add_node("safe_tools", create_tool_node_with_fallback(
+            safe_tools, handles=lambda name: name not in SENSITIVE_TOOL_NAMES, cache=tool_cache))
+        builder.add_node("sensitive_tools", create_tool_node_with_fallback(
+            sensitive_tools, parallel=False, cache=tool_cache, invalidates_cache=True))
         builder.add_node("generate_selections", generate_selections)
 
-        # Define the ReACT flow: Analyze -> Act -> Use Tools (if needed) -> Generate Selections
+        # Define the ReACT flow: Analyze (depending on mode) -> Act -> Use Tools (if needed) -> Generate Selections
         builder.add_edge(START, "fetch_user_info")
-        builder.add_edge("fetch_user_info", "analyze_request")  # NEW: Always analyze first
+        builder.add_conditional_edges(
+            "fetch_user_info",
+            route_analysis,
+            ["analyze_request", "action"]
+        )
         builder.add_edge("analyze_request", "action")           # Then act based on analysis
         
         # Route from action to tools or selections
@@ -291,8 +416,13 @@ class ReACTChatBot:
             ["safe_tools", "sensitive_tools", "generate_selections"]
         )
         
-        # Safe tools go back to action for final response, then generate selections
-        builder.add_edge("safe_tools", "action")
+        # Safe tools go back to action for final response, unless sensitive calls
+        # from the same step still wait for approval
+        builder.add_conditional_edges(
+            "safe_tools",
+            route_after_safe_tools,
+            ["sensitive_tools", "action"]
+        )
         
         # Sensitive tools go back to action for final response, then generate selections
         builder.add_edge("sensitive_tools", "action")
@@ -303,11 +433,12 @@ class ReACTChatBot:
         debug_log("ReACT Graph built successfully")
         
         return builder.compile(
-            checkpointer=self.memory,
+            checkpointer=cls.checkpointer,
             interrupt_before=["sensitive_tools"]
         )
 
-    def _default_selections(self):
+    @staticmethod
+    def _default_selections():
         """Default selection options"""
         return [
             {"text": "Tôi muốn xem sản phẩm", "value": "Tôi muốn xem sản phẩm"},
@@ -319,30 +450,67 @@ class ReACTChatBot:
         """
         Invoke the ReACT chatbot with enhanced debugging
         """
-        debug_log("=== INVOKE ReACT CHATBOT ===")
-        debug_log(f"User question: {question}")
-        
-        if verbose:
-            print(f"\nUser: {question}")
+        self._begin_turn(question, verbose)
+        fast_result = self._answer_fixed_intent(question)
+        if fast_result:
+            return fast_result
 
         # Stream through the graph with event logging
         debug_log("Streaming through ReACT graph")
-        events = self.graph.stream(
-            {"messages": [("user", question)]},
-            self.config,
-            stream_mode="values"
-        )
+        final_state, event_count = None, 0
+        for event in self.graph.stream(self._turn_input(question), self.config, stream_mode="values"):
+            event_count += 1
+            self._log_event(event, event_count, verbose)
+            final_state = event
+
+        debug_log(f"Stream complete, processed {event_count} events")
+        snapshot = self.graph.get_state(self.config) if final_state else None
+        return self._turn_result(final_state, snapshot)
+
+    async def ainvoke(self, question: str, verbose: bool = False) -> Dict[str, Any]:
+        """Async variant of invoke() for callers running on an event loop
         
-        final_state = None
-        event_count = 0
-        for event in events:
+        The graph runs through astream, so LLM calls and tools are awaited
+        instead of blocking the loop; the fast path runs in a worker thread.
+        """
+        self._begin_turn(question, verbose)
+        fast_result = await asyncio.to_thread(self._answer_fixed_intent, question)
+        if fast_result:
+            return fast_result
+
+        debug_log("Streaming through ReACT graph (async)")
+        final_state, event_count = None, 0
+        async for event in self.graph.astream(self._turn_input(question), self.config, stream_mode="values"):
             event_count += 1
-            debug_log(f"Event {event_count} received")
-            if verbose and event.get("thinking"):
-                print(f"💭 Analysis: {event['thinking']}")
+            self._log_event(event, event_count, verbose)
             final_state = event
 
         debug_log(f"Stream complete, processed {event_count} events")
+        snapshot = await self.graph.aget_state(self.config) if final_state else None
+        return self._turn_result(final_state, snapshot)
+
+    def _begin_turn(self, question: str, verbose: bool = False):
+        debug_log("=== INVOKE ReACT CHATBOT ===")
+        debug_log(f"User question: {question}")
+        
+        if verbose:
+            print(f"\nUser: {question}")
+
+        # Chips of the previous answer must not be served for this one
+        self._selections_future = None
+
+    @staticmethod
+    def _turn_input(question: str) -> Dict[str, Any]:
+        return {"messages": [("user", question)]}
+
+    @staticmethod
+    def _log_event(event: Dict[str, Any], event_count: int, verbose: bool = False):
+        debug_log(f"Event {event_count} received")
+        if verbose and event.get("thinking"):
+            print(f"💭 Analysis: {event['thinking']}")
+
+    def _turn_result(self, final_state: Optional[Dict[str, Any]], snapshot) -> Dict[str, Any]:
+        """Response of a graph turn: an approval request or the final answer"""
         if not final_state:
             debug_log("No final state returned", level="ERROR")
             return {
@@ -354,13 +522,12 @@ class ReACTChatBot:
 
         # Check if we're waiting for approval
         debug_log("Checking for approval state")
-        snapshot = self.graph.get_state(self.config)
         if snapshot.next and "sensitive_tools" in snapshot.next:
             debug_log("Sensitive tool detected, awaiting approval")
             
-            # Extract the tool call for approval
-            ai_message = final_state["messages"][-1]
-            if not ai_message.tool_calls:
+            # Extract the tool calls for approval
+            tool_calls = self._pending_sensitive_calls(final_state["messages"])
+            if not tool_calls:
                 debug_log("No tool calls found in AI message", level="WARN")
                 return {
                     "response": "Không có hành động nhạy cảm.",
@@ -369,20 +536,20 @@ class ReACTChatBot:
                     "thinking": final_state.get("thinking")
                 }
 
-            tool_call = ai_message.tool_calls[0]
-            debug_log("Tool awaiting approval", {
-                "tool_name": tool_call.get("name", "unknown"),
-                "tool_args": tool_call.get("args", {})
-            })
+            debug_log("Tools awaiting approval", [
+                {"tool_name": tool_call.get("name", "unknown"), "tool_args": tool_call.get("args", {})}
+                for tool_call in tool_calls
+            ])
             
-            # Generate approval message based on tool
-            response = self._generate_approval_message(tool_call)
+            # Generate approval message based on tools
+            response = "\n".join(self._generate_approval_message(tool_call) for tool_call in tool_calls)
             
             return {
                 "response": response,
                 "status": "waiting",
                 "waiting_for_approval": True,
-                "tool_call": tool_call,
+                "tool_call": tool_calls[0],
+                "tool_calls": tool_calls,
                 "thinking": final_state.get("thinking"),
                 "selections": [
                     {"text": "Đồng ý", "value": "approve"},
@@ -395,25 +562,58 @@ class ReACTChatBot:
         last_message = final_state.get("messages", [])[-1] if final_state.get("messages") else None
         response = last_message.content if last_message and hasattr(last_message, "content") else "Không có phản hồi."
         
-        # Generate selections for the response
-        if self.use_llm_selections:
-            debug_log("Generating selections for response")
-            try:
-                selections = self._generate_selections_for_response(response, final_state.get("thinking"))
-            except Exception as e:
-                debug_log(f"Error generating selections: {str(e)}", level="ERROR")
-                selections = self._default_selections()
-        else:
-            debug_log("Using default selections (LLM selections disabled)")
-            selections = self._default_selections()
+        # LLM selections follow asynchronously; the answer returns with the rule-based ones
+        selections_pending = self._schedule_selections(response, final_state.get("thinking"))
 
         return {
             "response": response,
             "status": "completed",
-            "selections": selections,
+            "selections": final_state.get("selections") or self._default_selections(),
+            "selections_pending": selections_pending,
             "thinking": final_state.get("thinking")  # Return thinking for debugging
         }
 
+    def _answer_fixed_intent(self, question: str) -> Optional[Dict[str, Any]]:
+        """Answer cart, policy and browse requests from templates, skipping the LLM
+        
+        The turn is still written to the conversation so later LLM turns see it.
+        Returns None when the message needs the graph.
+        """
+        if not self.use_fast_path:
+            return None
+        intent = route_intent(question)
+        if not intent:
+            return None
+        
+        # A turn in the middle of an approval belongs to the graph
+        if self.graph.get_state(self.config).next:
+            return None
+        
+        try:
+            answer = answer_intent(intent, db, self.config["configurable"]["customer_id"])
+        except Exception as e:
+            debug_log(f"Error answering fixed intent, falling back to LLM: {str(e)}", level="ERROR")
+            return None
+        if not answer:
+            return None
+        
+        debug_log("Answered fixed intent without LLM", intent)
+        self.graph.update_state(
+            self.config,
+            {"messages": [HumanMessage(content=question), AIMessage(content=answer["response"])]},
+            as_node="generate_selections"
+        )
+        return {
+            "response": answer["response"],
+            "status": "completed",
+            "selections": answer["selections"] or self._default_selections(),
+            "thinking": None
+        }
+
+    def _pending_sensitive_calls(self, messages) -> List[Dict[str, Any]]:
+        """Sensitive tool calls of the latest AI message still waiting for approval"""
+        return [call for call in pending_tool_calls(messages) if call["name"] in SENSITIVE_TOOL_NAMES]
+
     def _generate_approval_message(self, tool_call: Dict[str, Any]) -> str:
         """Generate approval message based on tool call"""
         debug_log("Generating approval message for tool")
@@ -449,131 +649,172 @@ class ReACTChatBot:
     def handle_approval(self, approved: bool, message: Optional[str] = None) -> Dict[str, Any]:
         """Handle approval with enhanced debugging"""
         debug_log(f"=== HANDLE APPROVAL === (approved: {approved})")
+        self._selections_future = None
         
         try:
-            snapshot = self.graph.get_state(self.config)
-            
-            if not snapshot.next or "sensitive_tools" not in snapshot.next:
-                debug_log("No sensitive tool waiting for approval", level="WARN")
-                return {
-                    "response": "Không có hành động đang chờ xác nhận.",
-                    "status": "completed",
-                    "selections": self._default_selections(),
-                    "thinking": None
-                }
+            tool_calls, error = self._calls_awaiting_approval(self.graph.get_state(self.config))
+            if error:
+                return error
 
-            # Get the tool call that needs approval
-            current_state = snapshot.values
-            ai_message = current_state["messages"][-1]
-            
-            if not ai_message.tool_calls:
-                debug_log("No tool calls found in message needing approval", level="ERROR")
-                return {
-                    "response": "Không thể tìm thấy hành động cần xác nhận.",
-                    "status": "error",
-                    "selections": self._default_selections(),
-                    "thinking": current_state.get("thinking")
-                }
+            if not approved:
+                # Update the graph with the rejection, as if the action step had answered,
+                # whether or not safe tools from the same step already ran
+                debug_log("Updating graph state with rejection message")
+                self.graph.update_state(self.config, self._rejection_update(tool_calls, message), as_node="action")
+            
+            # Continue the graph execution
+            debug_log(f"Continuing execution after {'approval' if approved else 'rejection'}")
+            final_state, event_count = None, 0
+            for event in self.graph.stream(None, self.config, stream_mode="values"):
+                event_count += 1
+                debug_log(f"Post-approval event {event_count}")
+                final_state = event
+            
+            debug_log(f"Approval stream complete, processed {event_count} events")
+            return self._approval_result(approved, final_state)
+                
+        except Exception as e:
+            return self._approval_error(e)
 
-            tool_call = ai_message.tool_calls[0]
-            debug_log("Found tool call awaiting approval", {
-                "name": tool_call.get("name"),
-                "args": tool_call.get("args")
-            })
+    async def ahandle_approval(self, approved: bool, message: Optional[str] = None) -> Dict[str, Any]:
+        """Async variant of handle_approval(), resuming the graph through astream"""
+        debug_log(f"=== HANDLE APPROVAL (async) === (approved: {approved})")
+        self._selections_future = None
+        
+        try:
+            tool_calls, error = self._calls_awaiting_approval(await self.graph.aget_state(self.config))
+            if error:
+                return error
 
-            if approved:
-                debug_log("Tool approved, continuing execution")
-                # Continue the graph execution
-                events = self.graph.stream(None, self.config, stream_mode="values")
-                final_state = None
-                event_count = 0
-                for event in events:
-                    event_count += 1
-                    debug_log(f"Post-approval event {event_count}")
-                    final_state = event
-                
-                debug_log(f"Approval stream complete, processed {event_count} events")
-                
-                response = "Hành động đã được thực hiện."
-                if final_state and final_state.get("messages"):
-                    last_message = final_state["messages"][-1]
-                    if hasattr(last_message, "content") and last_message.content:
-                        response = last_message.content
-                
-                # Generate selections for the response
-                if self.use_llm_selections:
-                    debug_log("Generating selections for post-approval response")
-                    try:
-                        selections = self._generate_selections_for_response(response, final_state.get("thinking"))
-                    except Exception as e:
-                        debug_log(f"Error generating selections: {str(e)}", level="ERROR")
-                        selections = self._default_selections()
-                else:
-                    debug_log("Using default selections (LLM selections disabled)")
-                    selections = self._default_selections()
-                
-                return {
-                    "response": response,
-                    "status": "completed",
-                    "selections": selections,
-                    "thinking": final_state.get("thinking")
-                }
-            else:
-                debug_log("Tool rejected, handling rejection")
-                # Handle rejection
-                reject_message = "Hành động bị từ chối bởi người dùng."
-                if message:
-                    reject_message += f" Lý do: {message}"
-                
-                debug_log(f"Rejection message: {reject_message}")
-                
-                tool_message = ToolMessage(
-                    tool_call_id=tool_call["id"],
-                    content=reject_message
-                )
-                
-                # Update the graph with the rejection
+            if not approved:
                 debug_log("Updating graph state with rejection message")
-                self.graph.update_state(
-                    self.config,
-                    {"messages": [tool_message]}
+                await self.graph.aupdate_state(
+                    self.config, self._rejection_update(tool_calls, message), as_node="action"
                 )
-                
-                # Continue execution after rejection
-                debug_log("Continuing execution after rejection")
-                events = self.graph.stream(None, self.config, stream_mode="values")
-                final_state = None
-                event_count = 0
-                for event in events:
-                    event_count += 1
-                    debug_log(f"Post-rejection event {event_count}")
-                    final_state = event
-                
-                debug_log(f"Rejection stream complete, processed {event_count} events")
-                    
-                response = "Hành động đã bị từ chối. Vui lòng cho biết bạn muốn làm gì tiếp theo."
-                if final_state and final_state.get("messages"):
-                    last_message = final_state["messages"][-1]
-                    if hasattr(last_message, "content") and last_message.content:
-                        response = last_message.content
-                
-                return {
-                    "response": response,
-                    "status": "completed",
-                    "selections": self._default_selections(),
-                    "thinking": final_state.get("thinking")
-                }
+            
+            debug_log(f"Continuing execution after {'approval' if approved else 'rejection'}")
+            final_state, event_count = None, 0
+            async for event in self.graph.astream(None, self.config, stream_mode="values"):
+                event_count += 1
+                debug_log(f"Post-approval event {event_count}")
+                final_state = event
+            
+            debug_log(f"Approval stream complete, processed {event_count} events")
+            return self._approval_result(approved, final_state)
                 
         except Exception as e:
-            debug_log(f"Error in handle_approval: {str(e)}", level="ERROR")
-            logger.error(f"Error in handle_approval: {str(e)}", exc_info=True)
-            return {
-                "response": f"Đã xảy ra lỗi khi xử lý xác nhận: {str(e)}",
-                "status": "error",
+            return self._approval_error(e)
+
+    def _calls_awaiting_approval(self, snapshot):
+        """Sensitive tool calls waiting at the interrupt, or an error response if there are none"""
+        if not snapshot.next or "sensitive_tools" not in snapshot.next:
+            debug_log("No sensitive tool waiting for approval", level="WARN")
+            return [], {
+                "response": "Không có hành động đang chờ xác nhận.",
+                "status": "completed",
                 "selections": self._default_selections(),
                 "thinking": None
             }
 
+        # Get the tool calls that need approval
+        current_state = snapshot.values
+        tool_calls = self._pending_sensitive_calls(current_state["messages"])
+        
+        if not tool_calls:
+            debug_log("No tool calls found in message needing approval", level="ERROR")
+            return [], {
+                "response": "Không thể tìm thấy hành động cần xác nhận.",
+                "status": "error",
+                "selections": self._default_selections(),
+                "thinking": current_state.get("thinking")
+            }
+
+        debug_log("Found tool calls awaiting approval", [
+            {"name": tool_call.get("name"), "args": tool_call.get("args")}
+            for tool_call in tool_calls
+        ])
+        return tool_calls, None
+
+    @staticmethod
+    def _rejection_update(tool_calls: List[Dict[str, Any]], message: Optional[str] = None) -> Dict[str, Any]:
+        """ToolMessages answering every rejected call"""
+        reject_message = "Hành động bị từ chối bởi người dùng."
+        if message:
+            reject_message += f" Lý do: {message}"
+        
+        debug_log(f"Rejection message: {reject_message}")
+        return {"messages": [
+            ToolMessage(tool_call_id=tool_call["id"], content=reject_message)
+            for tool_call in tool_calls
+        ]}
+
+    def _approval_result(self, approved: bool, final_state: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Response after the graph resumed from an approval or rejection"""
+        if approved:
+            response = "Hành động đã được thực hiện."
+        else:
+            response = "Hành động đã bị từ chối. Vui lòng cho biết bạn muốn làm gì tiếp theo."
+        if final_state and final_state.get("messages"):
+            last_message = final_state["messages"][-1]
+            if hasattr(last_message, "content") and last_message.content:
+                response = last_message.content
+        final_state = final_state or {}
+        
+        if not approved:
+            return {
+                "response": response,
+                "status": "completed",
+                "selections": self._default_selections(),
+                "thinking": final_state.get("thinking")
+            }
+        
+        # LLM selections follow asynchronously; the answer returns with the rule-based ones
+        selections_pending = self._schedule_selections(response, final_state.get("thinking"))
+        
+        return {
+            "response": response,
+            "status": "completed",
+            "selections": final_state.get("selections") or self._default_selections(),
+            "selections_pending": selections_pending,
+            "thinking": final_state.get("thinking")
+        }
+
+    def _approval_error(self, e: Exception) -> Dict[str, Any]:
+        debug_log(f"Error in handle_approval: {str(e)}", level="ERROR")
+        logger.error(f"Error in handle_approval: {str(e)}", exc_info=True)
+        return {
+            "response": f"Đã xảy ra lỗi khi xử lý xác nhận: {str(e)}",
+            "status": "error",
+            "selections": self._default_selections(),
+            "thinking": None
+        }
+
+    def _schedule_selections(self, response: str, thinking: Optional[str] = None) -> bool:
+        """Start generating LLM selections for an answer in the background
+        
+        Returns True if selections are on their way; fetch them with get_selections.
+        """
+        self._selections_future = None
+        if not self.use_llm_selections:
+            return False
+        debug_log("Scheduling selection generation for response")
+        self._selections_future = _selection_pool.submit(self._generate_selections_for_response, response, thinking)
+        return True
+
+    def get_selections(self, timeout: Optional[float] = None) -> Optional[List[Dict[str, str]]]:
+        """LLM selections for the latest answer, waiting up to timeout seconds
+        
+        Returns None if none were scheduled or they are not ready in time.
+        """
+        future = self._selections_future
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=timeout)
+        except Exception as e:
+            debug_log(f"Selections not available: {str(e) or type(e).__name__}", level="WARN")
+            return None
+
     def _generate_selections_for_response(self, response: str, thinking: Optional[str] = None) -> List[Dict[str, str]]:
         """Generate selections based on a response and thinking"""
         debug_log("Generating selections from response and thinking")
@@ -583,19 +824,7 @@ class ReACTChatBot:
             return self._default_selections()
             
         try:
-            selection_prompt = ChatPromptTemplate.from_messages([
-                ("system",
-                 "Generate 2-3 helpful follow-up options for the user based on the conversation. "
-                 "Format as short phrases (3-5 words). Use Vietnamese unless user speaks English. "
-                 "Consider the thinking process: {thinking} "
-                 "If possible, try to aim for sales, always try to sell the product. "
-                 f"Categories: {self.categories_str}. Materials: {self.materials_str}. "
-                 "Return each option on a new line, no numbering or bullets."
-                ),
-                ("human", "Assistant response: {response}")
-            ])
-            
-            chain = selection_prompt | self.llm
+            chain = SELECTION_PROMPT | self.llm
             result = chain.invoke({
                 "response": response,
                 "thinking": thinking or "Không có thông tin suy nghĩ"
@@ -0,0 +1,82 @@
+"""Bounded LRU cache for product search results."""
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a query: NFC, lowercase, single spaces."""
+    return " ".join(unicodedata.normalize("NFC", query).lower().split())
+
+class SearchCache:
+    """Thread-safe LRU cache of search results tied to one index generation.
+
+    Entries are dropped wholesale whenever the caller presents a new index
+    generation, so results never outlive the index they were computed from.
+    Cached result lists are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, List[Dict[str, Any]]]" = OrderedDict()
+        self._generation = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query: str, top_k: int, filters: Optional[Dict[str, Any]],
+                 search_type: str, semantic_weight: float) -> Tuple:
+        """Build the cache key for one search request."""
+        filter_key = tuple(sorted((filters or {}).items()))
+        return (normalize_query(query), search_type, round(semantic_weight, 4), top_k, filter_key)
+
+    def _check_generation(self, generation: int):
+        if generation != self._generation:
+            self._entries.clear()
+            self._generation = generation
+
+    def get(self, key: Hashable, generation: int) -> Optional[List[Dict[str, Any]]]:
+        """Return cached results for the key, or None on a miss."""
+        if self.max_size <= 0:
+            return None
+        with self._lock:
+            self._check_generation(generation)
+            results = self._entries.get(key)
+            if results is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(results)
+
+    def put(self, key: Hashable, generation: int, results: List[Dict[str, Any]]):
+        """Store results computed against the given index generation."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._check_generation(generation)
+            self._entries[key] = list(results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "generation": self._generation,
+            }
@@ -0,0 +1,146 @@
+"""Rule-based follow-up chips derived from the tool results of a turn.
+
+After a search the natural next steps are adding the top product to the
+cart or looking at similar ones; after a cart view, placing the order; after
+an order, checking it. These chips are built from the ToolMessages already
+in the conversation (pipe tables with product_id first, or JSON) and the
+product snapshot, so they cost no LLM call and add no latency.
+"""
+import json
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.messages import AnyMessage, HumanMessage, ToolMessage
+
+from constants import EMPTY_CART_MESSAGE
+
+logger = logging.getLogger(__name__)
+
+# Tools whose result lists products, best match first
+PRODUCT_TOOLS = frozenset({
+    "semantic_product_search",
+    "multi_product_search",
+    "search_products",
+    "get_similar_products",
+    "get_product_details",
+    "get_product_cultural_context",
+})
+
+# Longest product name shown on a chip
+CHIP_NAME_CHARS = 28
+
+VIEW_CART = {"text": "Xem giỏ hàng", "value": "Tôi muốn xem giỏ hàng"}
+PLACE_ORDER = {"text": "Đặt hàng", "value": "Tôi muốn đặt hàng"}
+VIEW_ORDERS = {"text": "Xem đơn hàng", "value": "Tôi muốn xem đơn hàng của tôi"}
+KEEP_SHOPPING = {"text": "Tiếp tục mua sắm", "value": "Tôi muốn xem sản phẩm"}
+OTHER_POLICIES = {"text": "Xem chính sách khác", "value": "Tôi muốn xem chính sách"}
+
+def _rows_from_data(data: Any) -> List[Dict[str, Any]]:
+    if isinstance(data, list):
+        return [row for row in data if isinstance(row, dict) and "product_id" in row]
+    if isinstance(data, dict):
+        if "product_id" in data:
+            return [data]
+        if isinstance(data.get("products"), list):
+            return _rows_from_data(data["products"])
+        # multi_product_search in JSON format: {query: [products]}
+        return [row for value in data.values() if isinstance(value, list) for row in _rows_from_data(value)]
+    return []
+
+def product_rows(content: Any) -> List[Dict[str, Any]]:
+    """Products in a tool result, in rank order, from table or JSON output."""
+    if not isinstance(content, str):
+        return _rows_from_data(content)
+    text = content.strip()
+    if text.startswith(("[", "{")):
+        try:
+            return _rows_from_data(json.loads(text))
+        except ValueError:
+            return []
+
+    rows = []
+    header = None
+    for line in text.split("\n"):
+        cells = line.split("|")
+        if cells[0] == "product_id":
+            header = cells
+        elif header and len(cells) == len(header) and cells[0].strip().isdigit():
+            rows.append(dict(zip(header, cells)))
+        else:
+            # Notes, facets and per-query headings end a table
+            header = None
+    return rows
+
+def _snapshot_name(product_id: int) -> Optional[str]:
+    """Product name from the loaded search snapshot, without touching the database."""
+    try:
+        from rag_search import get_product_rag
+        rag = get_product_rag()
+        if not rag.initialized:
+            return None
+        row = rag.store.row_of(product_id)
+        return rag.store.get("name", row) if row is not None else None
+    except Exception as e:
+        logger.warning(f"Product name lookup failed for {product_id}: {str(e)}")
+        return None
+
+def _in_stock(row: Dict[str, Any]) -> bool:
+    stock = row.get("stock_quantity")
+    try:
+        return stock is None or stock == "" or int(stock) > 0
+    except (TypeError, ValueError):
+        return True
+
+def _short(name: str) -> str:
+    return name if len(name) <= CHIP_NAME_CHARS else name[:CHIP_NAME_CHARS - 1].rstrip() + "…"
+
+def _product_selections(tool_name: str, content: Any) -> Optional[List[Dict[str, str]]]:
+    rows = product_rows(content)
+    top = next((row for row in rows if _in_stock(row)), None)
+    if top is None:
+        return None
+    product_id = int(top["product_id"])
+    name = top.get("name") or _snapshot_name(product_id)
+    label = f"sản phẩm {product_id} ({name})" if name else f"sản phẩm {product_id}"
+
+    selections = [{
+        "text": f"Thêm {_short(name)} vào giỏ" if name else f"Thêm sản phẩm {product_id} vào giỏ",
+        "value": f"Thêm {label} vào giỏ hàng",
+    }]
+    if tool_name != "get_similar_products":
+        selections.append({"text": "Xem sản phẩm tương tự", "value": f"Xem sản phẩm tương tự {label}"})
+    if tool_name != "get_product_cultural_context":
+        selections.append({"text": "Tìm hiểu nguồn gốc", "value": f"Kể cho tôi về nguồn gốc và ý nghĩa của {label}"})
+    selections.append(VIEW_CART)
+    return selections
+
+def tool_selections(tool_name: str, content: Any) -> Optional[List[Dict[str, str]]]:
+    """Follow-up chips for one tool result, or None if the result suggests nothing."""
+    if tool_name in PRODUCT_TOOLS:
+        return _product_selections(tool_name, content)
+    if tool_name == "view_cart":
+        if isinstance(content, str) and content.strip() == EMPTY_CART_MESSAGE:
+            return [KEEP_SHOPPING, OTHER_POLICIES]
+        return [PLACE_ORDER, KEEP_SHOPPING]
+    if tool_name in ("add_to_cart", "update_cart_item"):
+        return [VIEW_CART, PLACE_ORDER, KEEP_SHOPPING]
+    if tool_name in ("place_order", "cancel_order"):
+        return [VIEW_ORDERS, KEEP_SHOPPING]
+    if tool_name == "clear_cart":
+        return [KEEP_SHOPPING]
+    if tool_name == "fetch_user_order_information":
+        return [KEEP_SHOPPING, VIEW_CART]
+    if tool_name == "lookup_store_policy":
+        return [OTHER_POLICIES, KEEP_SHOPPING]
+    return None
+
+def suggest_selections(messages: Sequence[AnyMessage]) -> Optional[List[Dict[str, str]]]:
+    """Chips from the latest useful tool result of the current turn, or None."""
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            break
+        if isinstance(message, ToolMessage) and message.status != "error":
+            selections = tool_selections(message.name, message.content)
+            if selections:
+                return selections
+    return None
@@ -0,0 +1,120 @@
+"""Memoized results of read-only tool calls.
+
+Within a conversation the agent asks for the same cart, order history,
+policy or cultural context again and again. Results are cached per tool,
+arguments and, for customer data, customer. Static data lives for hours.
+Cart and order results are dropped as soon as a sensitive tool (add_to_cart,
+place_order, cancel_order, ...) completes for that customer.
+
+tool_cache is a per-process singleton and invalidation only reaches the
+process that ran the write. With several uvicorn workers, another worker
+can serve cart and order results up to CUSTOMER_TOOL_TTL old; lower that
+TTL (or set TOOL_CACHE_SIZE=0) when a session may hop between workers.
+Error results such as {"error": "Không tìm thấy sản phẩm..."} are never
+cached, so a lookup that failed is retried on the next call.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+# Lifetime of results that only change when the catalog or policies are edited
+STATIC_TOOL_TTL = float(os.getenv("STATIC_TOOL_TTL", "21600"))
+# Upper bound for cart and order results, which are also invalidated on every change
+CUSTOMER_TOOL_TTL = float(os.getenv("CUSTOMER_TOOL_TTL", "300"))
+
+# Cached tools and their TTL in seconds. Search and product detail tools are
+# left out: they carry live price and stock, and search has its own cache.
+TOOL_TTLS = {
+    "lookup_store_policy": STATIC_TOOL_TTL,
+    "get_product_cultural_context": STATIC_TOOL_TTL,
+    "view_cart": CUSTOMER_TOOL_TTL,
+    "fetch_user_order_information": CUSTOMER_TOOL_TTL,
+}
+
+# Tools whose result depends on the customer's cart and orders
+CUSTOMER_TOOLS = frozenset({"view_cart", "fetch_user_order_information"})
+
+def is_error_result(content: Any) -> bool:
+    """Whether a tool message content is an {"error": ...} object rather than data."""
+    if isinstance(content, dict):
+        return "error" in content
+    if isinstance(content, str) and content.lstrip().startswith("{"):
+        try:
+            data = json.loads(content)
+        except ValueError:
+            return False
+        return isinstance(data, dict) and "error" in data
+    return False
+
+class ToolResultCache:
+    """Thread-safe LRU cache of tool message contents with per-tool TTLs."""
+
+    def __init__(self, max_size: int = 2048):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # Key -> (expiry time, content)
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(tool_name: str, args: Dict[str, Any], customer_id: Optional[str]) -> Optional[Tuple]:
+        """Cache key of a call, or None if the tool is not cached."""
+        if tool_name not in TOOL_TTLS:
+            return None
+        scope = customer_id if tool_name in CUSTOMER_TOOLS else None
+        return (scope, tool_name, json.dumps(args, sort_keys=True, ensure_ascii=False, default=str))
+
+    def get(self, key: Optional[Tuple]) -> Optional[Any]:
+        """Cached content for the key, or None on a miss or after expiry."""
+        if key is None or self.max_size <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Optional[Tuple], content: Any):
+        if key is None or self.max_size <= 0 or is_error_result(content):
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + TOOL_TTLS[key[1]], content)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_customer(self, customer_id: Optional[str]):
+        """Drop the cart and order results of one customer."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == customer_id and key[1] in CUSTOMER_TOOLS]:
+                del self._entries[key]
+
+    def clear(self):
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+            }
+
+tool_cache = ToolResultCache(int(os.getenv("TOOL_CACHE_SIZE", "2048")))
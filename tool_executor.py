@@ -0,0 +1,164 @@
+"""Concurrent execution of the tool calls in one agent step.
+
+The LLM may request several tools in one AIMessage, e.g. view_cart plus
+semantic_product_search plus get_product_cultural_context. Each tool node
+runs only the calls that belong to its tool set and are still unanswered, so
+a mixed batch is split: the safe calls run right away and only the sensitive
+ones wait for the user's approval.
+"""
+import asyncio
+import logging
+import os
+from typing import AbstractSet, Any, Callable, Dict, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, AnyMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+from langchain_core.tools import BaseTool
+
+from tool_cache import ToolResultCache
+
+logger = logging.getLogger(__name__)
+
+# Threads shared by all sessions for running independent tool calls concurrently
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "8"))
+
+_tool_pool = ContextThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+
+def pending_tool_calls(messages: Sequence[AnyMessage]) -> List[Dict[str, Any]]:
+    """Tool calls of the latest AI message that have no ToolMessage answer yet."""
+    answered = set()
+    for message in reversed(messages):
+        if isinstance(message, ToolMessage):
+            answered.add(message.tool_call_id)
+        elif isinstance(message, AIMessage):
+            return [call for call in message.tool_calls if call["id"] not in answered]
+        else:
+            break
+    return []
+
+def next_tool_node(messages: Sequence[AnyMessage], sensitive_tool_names: AbstractSet[str]) -> Optional[str]:
+    """Tool node to run next for the latest AI message, or None once every call is answered.
+    
+    Safe calls go first, so in a mixed batch only the sensitive calls are left
+    waiting for approval.
+    """
+    pending = pending_tool_calls(messages)
+    if any(call["name"] not in sensitive_tool_names for call in pending):
+        return "safe_tools"
+    if pending:
+        return "sensitive_tools"
+    return None
+
+def tool_error_message(tool_call: Dict[str, Any], error: BaseException) -> ToolMessage:
+    """ToolMessage reporting a failed call back to the LLM."""
+    return ToolMessage(
+        content=f"Error: {repr(error)}\n please fix your mistakes.",
+        tool_call_id=tool_call["id"],
+        name=tool_call.get("name"),
+        status="error",
+    )
+
+class ToolExecutor:
+    """Graph node running the pending calls for one tool set.
+
+    With ``parallel`` the calls run concurrently, on the shared thread pool or
+    as async tasks, so a multi-tool step takes as long as its slowest tool.
+    Without it they run one after another in the order the LLM gave, which
+    matters for tools with side effects (add_to_cart then place_order).
+    ToolMessages are always returned in tool-call order, and a failing call
+    only turns its own result into an error.
+
+    With a ``cache``, read tools are answered from it when possible; a node
+    that ``invalidates_cache`` (the sensitive tools) instead drops the
+    customer's cart and order results after each of its calls.
+    """
+
+    def __init__(self, tools: Sequence[BaseTool], parallel: bool = True,
+                 handles: Optional[Callable[[str], bool]] = None,
+                 cache: Optional[ToolResultCache] = None, invalidates_cache: bool = False):
+        self.tools_by_name = {tool.name: tool for tool in tools}
+        self.parallel = parallel
+        # Which tool names this node answers; calls to unknown tools get an error message
+        self.handles = handles or (lambda name: name in self.tools_by_name)
+        self.cache = cache
+        self.invalidates_cache = invalidates_cache
+
+    def pending_calls(self, state: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Unanswered calls of the latest AI message that this node answers."""
+        return [call for call in pending_tool_calls(state["messages"]) if self.handles(call["name"])]
+
+    def _tool(self, tool_call: Dict[str, Any]) -> BaseTool:
+        tool = self.tools_by_name.get(tool_call["name"])
+        if tool is None:
+            raise ValueError(f"{tool_call['name']} is not a valid tool, try one of {list(self.tools_by_name)}")
+        return tool
+
+    def _cache_key(self, tool_call: Dict[str, Any], config: RunnableConfig):
+        if self.cache is None or self.invalidates_cache:
+            return None
+        customer_id = config.get("configurable", {}).get("customer_id")
+        return self.cache.make_key(tool_call["name"], tool_call.get("args", {}), customer_id)
+
+    def _cached(self, tool_call: Dict[str, Any], key) -> Optional[ToolMessage]:
+        content = self.cache.get(key) if key is not None else None
+        if content is None:
+            return None
+        return ToolMessage(content=content, tool_call_id=tool_call["id"], name=tool_call["name"])
+
+    def _after_call(self, key, message: Optional[ToolMessage], config: RunnableConfig):
+        """Remember a successful read, or forget the customer's data after a write."""
+        if self.cache is None:
+            return
+        if self.invalidates_cache:
+            # Also after a failure: the write may have been partly applied
+            self.cache.invalidate_customer(config.get("configurable", {}).get("customer_id"))
+        elif key is not None and message is not None and message.status != "error":
+            self.cache.put(key, message.content)
+
+    def _run_one(self, tool_call: Dict[str, Any], config: RunnableConfig) -> ToolMessage:
+        key = self._cache_key(tool_call, config)
+        cached = self._cached(tool_call, key)
+        if cached is not None:
+            return cached
+        message = None
+        try:
+            message = self._tool(tool_call).invoke({**tool_call, "type": "tool_call"}, config)
+            return message
+        except Exception as e:
+            logger.error(f"Tool {tool_call['name']} failed: {str(e)}")
+            return tool_error_message(tool_call, e)
+        finally:
+            self._after_call(key, message, config)
+
+    async def _arun_one(self, tool_call: Dict[str, Any], config: RunnableConfig) -> ToolMessage:
+        key = self._cache_key(tool_call, config)
+        cached = self._cached(tool_call, key)
+        if cached is not None:
+            return cached
+        message = None
+        try:
+            message = await self._tool(tool_call).ainvoke({**tool_call, "type": "tool_call"}, config)
+            return message
+        except Exception as e:
+            logger.error(f"Tool {tool_call['name']} failed: {str(e)}")
+            return tool_error_message(tool_call, e)
+        finally:
+            self._after_call(key, message, config)
+
+    def run(self, state: Dict[str, Any], config: RunnableConfig) -> Dict[str, List[ToolMessage]]:
+        calls = self.pending_calls(state)
+        if self.parallel and len(calls) > 1:
+            # map() yields results in submission order, whatever order the calls finish in
+            messages = list(_tool_pool.map(lambda call: self._run_one(call, config), calls))
+        else:
+            messages = [self._run_one(call, config) for call in calls]
+        return {"messages": messages}
+
+    async def arun(self, state: Dict[str, Any], config: RunnableConfig) -> Dict[str, List[ToolMessage]]:
+        calls = self.pending_calls(state)
+        if self.parallel:
+            messages = list(await asyncio.gather(*(self._arun_one(call, config) for call in calls)))
+        else:
+            messages = [await self._arun_one(call, config) for call in calls]
+        return {"messages": messages}
@@ -0,0 +1,117 @@
+"""Compact, token-budgeted serialization of product lists returned by tools.
+
+Every tool result is added to the conversation as a ToolMessage and resent to
+the LLM on each later turn, so product lists are projected to the fields the
+caller asked for, written as a pipe-separated table instead of repeating the
+keys of every dict, and trimmed to a token budget.
+"""
+import json
+import os
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+# Fields a tool caller can project product results onto; product_id is always included
+PRODUCT_FIELDS = (
+    "product_id",
+    "name",
+    "category",
+    "material",
+    "price",
+    "stock_quantity",
+    "origin_location",
+    "description",
+)
+
+# "table" (compact) or "json" (one dict per product)
+TOOL_OUTPUT_FORMAT = os.getenv("TOOL_OUTPUT_FORMAT", "table")
+
+# Rough characters per token; Vietnamese with diacritics tokenizes denser than English
+CHARS_PER_TOKEN = 3
+
+# Description lengths tried, longest first, before dropping results to fit a budget
+DESCRIPTION_LENGTHS = (100, 40, 0)
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate for budgeting; no tokenizer round trip."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def resolve_fields(fields: Optional[Sequence[str]]) -> Tuple[str, ...]:
+    """Validated projection, in canonical order, always starting with product_id."""
+    if not fields:
+        return PRODUCT_FIELDS
+    unknown = [field for field in fields if field not in PRODUCT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields {unknown}. Must be among: {', '.join(PRODUCT_FIELDS)}")
+    return tuple(field for field in PRODUCT_FIELDS if field == "product_id" or field in fields)
+
+def project(product: Mapping[str, Any], fields: Sequence[str], score_key: Optional[str] = None,
+            description_chars: int = DESCRIPTION_LENGTHS[0]) -> Dict[str, Any]:
+    """One product reduced to the given fields, with its description shortened."""
+    row = {}
+    for field in fields:
+        if field == "description":
+            if description_chars:
+                description = product["description"] or ""
+                row[field] = description if len(description) <= description_chars \
+                    else description[:description_chars] + "..."
+        else:
+            row[field] = product[field]
+    if score_key and product.get("similarity") is not None:
+        row[score_key] = f"{product['similarity']:.2f}"
+    return row
+
+def _cell(value: Any) -> str:
+    return "" if value is None else str(value).replace("|", "/").replace("\n", " ")
+
+def to_table(rows: List[Dict[str, Any]]) -> str:
+    """Rows as a header line plus one pipe-separated line per row."""
+    if not rows:
+        return "(no results)"
+    columns = list(rows[0])
+    lines = ["|".join(columns)]
+    lines.extend("|".join(_cell(row.get(column)) for column in columns) for row in rows)
+    return "\n".join(lines)
+
+def _serialize(rows: List[Dict[str, Any]], output_format: str) -> str:
+    if output_format == "table":
+        return to_table(rows)
+    return json.dumps(rows, ensure_ascii=False)
+
+def format_products(products: Sequence[Mapping[str, Any]], fields: Optional[Sequence[str]] = None,
+                    score_key: Optional[str] = None, token_budget: Optional[int] = None,
+                    output_format: Optional[str] = None) -> Union[str, List[Dict[str, Any]]]:
+    """Project, serialize and trim a ranked product list to a token budget.
+
+    Descriptions are shortened, then dropped, before the lowest-ranked
+    products are; at least one product is always kept. In table format the
+    result is a string noting how many results were left out.
+    """
+    output_format = output_format or TOOL_OUTPUT_FORMAT
+    fields = resolve_fields(fields)
+
+    def fits(rows):
+        return token_budget is None or estimate_tokens(_serialize(rows, output_format)) <= token_budget
+
+    lengths = DESCRIPTION_LENGTHS if "description" in fields else DESCRIPTION_LENGTHS[:1]
+    for description_chars in lengths:
+        rows = [project(product, fields, score_key, description_chars) for product in products]
+        if fits(rows):
+            break
+
+    kept = len(rows)
+    while kept > 1 and not fits(rows[:kept]):
+        kept -= 1
+    rows = rows[:kept]
+
+    if output_format != "table":
+        return rows
+    omitted = len(products) - kept
+    table = to_table(rows)
+    return table + f"\n(+{omitted} more results omitted to fit the response size)" if omitted else table
+
+def format_facets(facets: Mapping[str, Any]) -> str:
+    """Facet counts as one compact line per facet."""
+    lines = [f"total: {facets['total']}"]
+    for facet, counts in facets.items():
+        if facet != "total":
+            lines.append(f"{facet}: " + ", ".join(f"{value} ({count})" for value, count in counts.items()))
+    return "\n".join(lines)
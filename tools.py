@@ -1,6 +1,6 @@
 import os
 import sqlite3
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Any, Union
 from dotenv import load_dotenv
 import logging
 from langchain_core.tools import tool
@@ -67,7 +67,8 @@ def search_products(
     min_stock: Optional[int] = None,
     sort_by_price: Optional[str] = None,
     limit: int = 20,
-) -> List[Dict]:
+    include_facets: bool = False,
+) -> Union[List[Dict], Dict[str, Any]]:
     """
     Searches for handicraft products based on various filters like query, category, material, price range, and stock.
 
@@ -75,7 +76,8 @@ def search_products(
     Example: "Find me bamboo baskets under 500,000 VND" or "Show me all wooden statues available."
 
     Args:
-        query: A free-text search term to match product names or descriptions (e.g., "basket" or "handmade").
+        query: A free-text search term matched against product names, tags and categories, with or without
+            Vietnamese diacritics and tolerating small typos (e.g., "nón lá", "non la" or "gio tre").
         category: The product category to filter by. Must be one of: {', '.join(CATEGORIES)}.
         material: The material type to filter by. Must be one of: {', '.join(MATERIALS)}.
         min_price: The minimum price in VND (e.g., 100000 for 100,000 VND).
@@ -83,9 +85,13 @@ def search_products(
         min_stock: The minimum stock quantity available (e.g., 1 to show only in-stock items).
         sort_by_price: Sort order for price, either 'asc' (cheapest first) or 'desc' (most expensive first).
         limit: Maximum number of results to return (default is 20).
+        include_facets: Also count all matching products per category, material and price range
+            (e.g., for "what materials do you have in Tranh under 300k?") instead of calling this tool
+            again with different filters.
 
     Returns:
         A list of dictionaries containing details of matching products, including name, price, category, material, and stock.
+        With include_facets, a dictionary with "products" (that list) and "facets" (the counts).
 
     Raises:
         ValueError: If category or material is not in the allowed list.
@@ -100,7 +106,7 @@ def search_products(
     if material and material not in MATERIALS:
         raise ValueError(f"Material must be one of: {', '.join(MATERIALS)}")
 
-    return db.search_products(
+    products = db.search_products(
         query=query,
         category=category,
         material=material,
@@ -111,6 +117,18 @@ def search_products(
         limit=limit
     )
 
+    if include_facets:
+        facets = db.get_product_facets(
+            query=query,
+            category=category,
+            material=material,
+            min_price=min_price,
+            max_price=max_price,
+            min_stock=min_stock
+        )
+        return {"products": products, "facets": facets}
+    return products
+
 @tool
 def lookup_store_policy(query: str) -> str:
     """
@@ -1,10 +1,11 @@
 from langchain_core.messages import ToolMessage, AIMessage, HumanMessage
 from langchain_core.runnables import RunnableLambda
-from langgraph.prebuilt import ToolNode
 import json
 from datetime import datetime
 import logging
 
+from tool_executor import ToolExecutor, pending_tool_calls, tool_error_message
+
 logger = logging.getLogger(__name__)
 
 def debug_log(message, data=None, level="INFO"):
@@ -74,35 +75,34 @@ def log_state(state, step_name="UNKNOWN"):
     
     debug_log("=== END STATE ===")
 
-def handle_tool_error(state) -> dict:
+def handle_tool_error(state, tool_calls=None) -> dict:
     """Enhanced tool error handling with detailed logging"""
     error = state.get("error")
-    tool_calls = state["messages"][-1].tool_calls
+    if tool_calls is None:
+        tool_calls = pending_tool_calls(state["messages"])
     
     debug_log("TOOL ERROR occurred", {
         "error": str(error),
         "tool_calls": tool_calls
     }, "ERROR")
     
-    return {
-        "messages": [
-            ToolMessage(
-                content=f"Error: {repr(error)}\n please fix your mistakes.",
-                tool_call_id=tc["id"],
-            )
-            for tc in tool_calls
-        ]
-    }
+    return {"messages": [tool_error_message(tc, error) for tc in tool_calls]}
 
-def create_tool_node_with_fallback(tools: list) -> dict:
-    """Create tool node with enhanced error handling and logging"""
+def create_tool_node_with_fallback(tools: list, parallel: bool = True, handles=None,
+                                   cache=None, invalidates_cache: bool = False) -> dict:
+    """Create tool node with enhanced error handling and logging
+    
+    The node runs only the pending calls it ``handles`` (by default the calls
+    to ``tools``), concurrently unless ``parallel`` is False, and reads from or
+    invalidates the tool result ``cache``; see tool_executor.ToolExecutor.
+    """
     def log_before_tools(state):
         debug_log("=== BEFORE TOOL EXECUTION ===")
         log_state(state, "TOOL_INPUT")
         
         # Log tool calls details
-        if state.get("messages") and state["messages"][-1].tool_calls:
-            for i, tool_call in enumerate(state["messages"][-1].tool_calls):
+        if state.get("messages"):
+            for i, tool_call in enumerate(executor.pending_calls(state)):
                 debug_log(f"Tool Call {i+1}", {
                     "name": tool_call.get("name"),
                     "args": tool_call.get("args"),
@@ -115,8 +115,13 @@ def create_tool_node_with_fallback(tools: list) -> dict:
         log_state(state, "TOOL_OUTPUT")
         return state
     
+    def handle_error(state):
+        return handle_tool_error(state, executor.pending_calls(state))
+    
     # Create the tool node with logging
-    base_node = ToolNode(tools)
+    executor = ToolExecutor(tools, parallel=parallel, handles=handles,
+                            cache=cache, invalidates_cache=invalidates_cache)
+    base_node = RunnableLambda(executor.run, afunc=executor.arun, name="tools")
     
     # Wrap with logging
     logged_node = (
@@ -126,7 +131,7 @@ def create_tool_node_with_fallback(tools: list) -> dict:
     )
     
     return logged_node.with_fallbacks(
-        [RunnableLambda(handle_tool_error)], exception_key="error"
+        [RunnableLambda(handle_error)], exception_key="error"
     )
 
 def clean_deepseek_response(content: str) -> str:
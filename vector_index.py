@@ -0,0 +1,137 @@
+"""FAISS index construction for the product vector store.
+
+All index types store L2-normalized vectors and use inner product, so scores
+are cosine similarities regardless of whether the index is exact or approximate.
+Compressed types (fp16, sq8, pq, ivf_pq, optionally after PCA) only approximate
+those scores; callers re-rank their final candidates with full-precision vectors.
+"""
+import os
+import logging
+from typing import Optional
+
+import numpy as np
+import faiss
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq", "fp16", "sq8", "pq")
+
+# Tuning knobs, all overridable from the environment
+HNSW_M = int(os.getenv("VECTOR_INDEX_HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("VECTOR_INDEX_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("VECTOR_INDEX_EF_SEARCH", "64"))
+IVF_NLIST = int(os.getenv("VECTOR_INDEX_NLIST", "1024"))
+IVF_NPROBE = int(os.getenv("VECTOR_INDEX_NPROBE", "16"))
+PQ_M = int(os.getenv("VECTOR_INDEX_PQ_M", "64"))
+PQ_NBITS = int(os.getenv("VECTOR_INDEX_PQ_NBITS", "8"))
+# Reduce vectors to this many dimensions with PCA before indexing (0 keeps the full dimension)
+PCA_DIM = int(os.getenv("VECTOR_INDEX_PCA_DIM", "0"))
+
+def normalize(vectors) -> np.ndarray:
+    """Return a contiguous float32 copy of the vectors with unit L2 norm."""
+    matrix = np.array(vectors, dtype="float32", copy=True, ndmin=2)
+    faiss.normalize_L2(matrix)
+    return matrix
+
+def _ivf_nlist(n: int, nlist: int) -> int:
+    """Clamp the number of IVF lists so each centroid gets enough training points."""
+    return max(1, min(nlist, n // 39))
+
+def _pq_m(dim: int, m: int) -> int:
+    """Largest sub-quantizer count <= m that divides the vector dimension."""
+    m = min(m, dim)
+    while dim % m:
+        m -= 1
+    return m
+
+def _pq_nbits(n: int, nbits: int) -> int:
+    """Reduce bits per code so each of the 2**nbits centroids gets ~39 training points."""
+    return max(1, min(nbits, int(np.log2(max(n // 39, 2)))))
+
+def _make_index(n: int, dim: int, index_type: str, hnsw_m: int, ef_construction: int,
+                nlist: int, pq_m: int, pq_nbits: int) -> faiss.Index:
+    """Create an empty inner-product index of the given type."""
+    metric = faiss.METRIC_INNER_PRODUCT
+
+    if index_type == "flat":
+        return faiss.IndexFlatIP(dim)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m, metric)
+        index.hnsw.efConstruction = ef_construction
+        return index
+    if index_type == "fp16":
+        return faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, metric)
+    if index_type == "sq8":
+        return faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, metric)
+    if index_type == "pq":
+        return faiss.IndexPQ(dim, _pq_m(dim, pq_m), _pq_nbits(n, pq_nbits), metric)
+
+    nlist = _ivf_nlist(n, nlist)
+    quantizer = faiss.IndexFlatIP(dim)
+    if index_type == "ivf_flat":
+        return faiss.IndexIVFFlat(quantizer, dim, nlist, metric)
+    return faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_m(dim, pq_m), _pq_nbits(n, pq_nbits), metric)
+
+def build_index(
+    vectors: np.ndarray,
+    index_type: str = "flat",
+    hnsw_m: int = HNSW_M,
+    ef_construction: int = HNSW_EF_CONSTRUCTION,
+    nlist: int = IVF_NLIST,
+    pq_m: int = PQ_M,
+    pq_nbits: int = PQ_NBITS,
+    pca_dim: int = PCA_DIM,
+) -> faiss.Index:
+    """Build and populate a FAISS index over already-normalized vectors.
+
+    Args:
+        vectors: float32 matrix of shape (n, dim), rows L2-normalized
+        index_type: One of INDEX_TYPES
+        hnsw_m: Graph degree for HNSW
+        ef_construction: HNSW build-time beam width
+        nlist: Number of IVF inverted lists (clamped to the catalog size)
+        pq_m: Number of PQ sub-quantizers (adjusted to divide the dimension)
+        pq_nbits: Bits per PQ code (reduced for small catalogs)
+        pca_dim: Reduce vectors to this many dimensions first (0 disables PCA)
+
+    Returns:
+        A trained FAISS index containing all vectors, using inner product
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Index type must be one of: {', '.join(INDEX_TYPES)}")
+
+    n, dim = vectors.shape
+    reduced_dim = pca_dim if 0 < pca_dim < dim else dim
+    index = _make_index(n, reduced_dim, index_type, hnsw_m, ef_construction, nlist, pq_m, pq_nbits)
+
+    if reduced_dim < dim:
+        index = faiss.IndexPreTransform(faiss.PCAMatrix(dim, reduced_dim), index)
+
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    set_search_params(index)
+    logger.info(f"Built {index_type} index with {index.ntotal} vectors (dim={dim}, indexed dim={reduced_dim})")
+    return index
+
+def set_search_params(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """Apply query-time accuracy/speed knobs to an index (no-op for flat indexes)."""
+    inner = faiss.downcast_index(index)
+    if isinstance(inner, faiss.IndexPreTransform):
+        inner = faiss.downcast_index(inner.index)
+    if isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = ef_search or HNSW_EF_SEARCH
+    elif isinstance(inner, faiss.IndexIVF):
+        inner.nprobe = min(nprobe or IVF_NPROBE, inner.nlist)
+
+def is_cosine(index: faiss.Index) -> bool:
+    """Whether scores from this index are inner products (cosine on normalized data)."""
+    return index.metric_type == faiss.METRIC_INNER_PRODUCT
+
+def is_exact(index: faiss.Index) -> bool:
+    """Whether the index stores uncompressed vectors and searches them exhaustively."""
+    return isinstance(faiss.downcast_index(index), faiss.IndexFlat)
+
+def index_size_bytes(index: faiss.Index) -> int:
+    """Serialized size of an index, a close proxy for its resident memory."""
+    return int(faiss.serialize_index(index).nbytes)